@@ -0,0 +1,299 @@
+"""
+EaseMind Audio Processing - Normalização do áudio antes do STT
+Converte o que o cliente gravou (qualquer container/bitrate, muitas vezes estéreo) em
+mono 16 kHz, sem silêncio no início e no fim, recodificado em Opus de baixo bitrate.
+Roda no ffmpeg em subprocessos (fora do event loop), com concorrência limitada, sobre os
+arquivos do diretório de trabalho da requisição (m4a/mp4 não são legíveis por pipe); qualquer
+falha devolve o áudio original, então a transcrição nunca depende disso — as falhas são
+contadas por formato.
+
+Gravações longas são cortadas nos silêncios em segmentos de tamanho limitado,
+transcritas em paralelo e costuradas na ordem, com o idioma conciliado entre segmentos.
+"""
+
+import os
+import re
+import time
+import uuid
+import asyncio
+import logging
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from audio_upload import AudioUpload, probe_duration, progress_duration
+
+logger = logging.getLogger(__name__)
+
+AUDIO_NORMALIZE_ENABLED = os.getenv("AUDIO_NORMALIZE_ENABLED", "true").lower() in ("1", "true", "yes")
+AUDIO_NORMALIZE_CONCURRENCY = int(os.getenv("AUDIO_NORMALIZE_CONCURRENCY", str(os.cpu_count() or 2)))
+AUDIO_NORMALIZE_TIMEOUT = float(os.getenv("AUDIO_NORMALIZE_TIMEOUT", "30"))
+AUDIO_SAMPLE_RATE = int(os.getenv("AUDIO_SAMPLE_RATE", "16000"))
+AUDIO_OPUS_BITRATE = os.getenv("AUDIO_OPUS_BITRATE", "24k")
+# Silêncio: abaixo do limiar por pelo menos a duração mínima
+AUDIO_SILENCE_THRESHOLD_DB = os.getenv("AUDIO_SILENCE_THRESHOLD_DB", "-45dB")
+AUDIO_SILENCE_MIN_SECONDS = float(os.getenv("AUDIO_SILENCE_MIN_SECONDS", "0.3"))
+
+# Modo longo: acima do limiar, corta nos silêncios em segmentos de até MAX_SEGMENT
+LONG_AUDIO_THRESHOLD_SECONDS = float(os.getenv("LONG_AUDIO_THRESHOLD_SECONDS", "90"))
+LONG_AUDIO_MAX_SEGMENT_SECONDS = float(os.getenv("LONG_AUDIO_MAX_SEGMENT_SECONDS", "60"))
+LONG_AUDIO_MIN_SEGMENT_SECONDS = float(os.getenv("LONG_AUDIO_MIN_SEGMENT_SECONDS", "15"))
+LONG_AUDIO_CONCURRENCY = int(os.getenv("LONG_AUDIO_CONCURRENCY", "4"))
+LONG_AUDIO_SILENCE_DB = os.getenv("LONG_AUDIO_SILENCE_DB", "-40dB")
+LONG_AUDIO_SILENCE_SECONDS = float(os.getenv("LONG_AUDIO_SILENCE_SECONDS", "0.5"))
+
+# verbose_json devolve o nome do idioma; o parâmetro language da requisição espera ISO-639-1
+WHISPER_LANGUAGE_CODES = {
+    "portuguese": "pt", "english": "en", "spanish": "es", "french": "fr",
+    "italian": "it", "german": "de", "catalan": "ca", "galician": "gl"
+}
+
+_SILENCE_START = re.compile(r"silence_start: (-?[\d.]+)")
+_SILENCE_END = re.compile(r"silence_end: (-?[\d.]+)")
+
+# Corta o silêncio do início; invertendo o áudio, o mesmo filtro corta o do fim
+_TRIM_FILTER = (
+    f"silenceremove=start_periods=1:start_duration={AUDIO_SILENCE_MIN_SECONDS}:start_threshold={AUDIO_SILENCE_THRESHOLD_DB},"
+    "areverse,"
+    f"silenceremove=start_periods=1:start_duration={AUDIO_SILENCE_MIN_SECONDS}:start_threshold={AUDIO_SILENCE_THRESHOLD_DB},"
+    "areverse"
+)
+
+
+class AudioNormalizer:
+    """Pool limitado de processos ffmpeg com métricas de bytes economizados"""
+
+    def __init__(self, concurrency: int = AUDIO_NORMALIZE_CONCURRENCY, enabled: bool = AUDIO_NORMALIZE_ENABLED):
+        self.concurrency = concurrency
+        self.enabled = enabled
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._stats = {"normalized": 0, "skipped": 0, "failed": 0,
+                       "bytes_in": 0, "bytes_out": 0, "total_ms": 0.0}
+        # Formato de entrada → normalizações que falharam e seguiram com o áudio original
+        self._failed_formats: Dict[str, int] = {}
+
+    async def run_ffmpeg(self, source: Path, *args: str, loglevel: str = "error") -> Optional[bytes]:
+        """
+        Executa ffmpeg lendo do arquivo source e escrevendo em stdout
+
+        Returns:
+            Saída do ffmpeg ou None (ffmpeg ausente, erro ou prazo esgotado)
+        """
+        result = await self._exec(source, args, loglevel)
+        return result[0] if result else None
+
+    async def _exec(self, source: Path, args: Tuple[str, ...], loglevel: str) -> Optional[Tuple[bytes, bytes]]:
+        """(stdout, stderr) do ffmpeg, ou None em falha"""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.concurrency)
+        async with self._slots:
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    "ffmpeg", "-hide_banner", "-loglevel", loglevel, "-nostdin", "-y", "-i", str(source), *args,
+                    stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+                )
+            except FileNotFoundError:
+                logger.warning("ffmpeg not installed, audio normalization disabled")
+                self.enabled = False
+                return None
+            try:
+                stdout, stderr = await asyncio.wait_for(process.communicate(), AUDIO_NORMALIZE_TIMEOUT)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                if process.returncode is None:
+                    process.kill()
+                    await process.wait()
+                raise
+            if process.returncode != 0:
+                logger.warning(f"ffmpeg failed ({process.returncode}): {stderr.decode(errors='replace')[-300:]}")
+                return None
+            return stdout, stderr
+
+    async def normalize(self, upload: AudioUpload, workspace: Path, measure: bool = False) -> AudioUpload:
+        """
+        Mono, 16 kHz, sem silêncio nas pontas, Opus/Ogg
+
+        Args:
+            workspace: diretório de trabalho da requisição (entrada e saída do ffmpeg)
+            measure: mede a duração do Ogg gerado (sem o silêncio cortado) com ffprobe
+        Returns:
+            O áudio normalizado, ou o original se a normalização falhar ou não reduzir o tamanho
+        """
+        if not self.enabled:
+            self._stats["skipped"] += 1
+            return upload
+        started = time.monotonic()
+        output_path = workspace / f"normalized-{uuid.uuid4().hex}.ogg"
+        output = None
+        try:
+            result = await self._exec(await upload.spool(workspace), (
+                "-vn", "-ac", "1", "-ar", str(AUDIO_SAMPLE_RATE),
+                "-af", _TRIM_FILTER,
+                "-c:a", "libopus", "-b:a", AUDIO_OPUS_BITRATE, "-application", "voip",
+                "-f", "ogg", str(output_path)
+            ), "error")
+            if result is not None:
+                output = await asyncio.to_thread(output_path.read_bytes)
+        except asyncio.TimeoutError:
+            logger.warning(f"Audio normalization timed out after {AUDIO_NORMALIZE_TIMEOUT}s")
+            output = None
+        elapsed_ms = (time.monotonic() - started) * 1000
+
+        if not output:
+            if not self.enabled:
+                # ffmpeg não está instalado (detectado agora)
+                self._stats["skipped"] += 1
+                return upload
+            self._stats["failed"] += 1
+            self._failed_formats[upload.suffix] = self._failed_formats.get(upload.suffix, 0) + 1
+            logger.warning(f"Audio normalization failed, transcribing the original {upload.suffix} ({upload.size} bytes)")
+            return upload
+        if len(output) >= upload.size:
+            self._stats["skipped"] += 1
+            return upload
+
+        self._stats["normalized"] += 1
+        self._stats["bytes_in"] += upload.size
+        self._stats["bytes_out"] += len(output)
+        self._stats["total_ms"] += elapsed_ms
+        logger.info(f"Audio normalized: {upload.size} -> {len(output)} bytes in {elapsed_ms:.0f}ms")
+
+        normalized = AudioUpload(f"{os.path.splitext(upload.filename)[0] or 'audio'}.ogg", "audio/ogg", output)
+        normalized.path = output_path
+        normalized.duration = upload.duration
+        if measure:
+            normalized.duration = await probe_duration(output_path) or upload.duration
+        return normalized
+
+    async def analyze_silences(self, audio: AudioUpload) -> Tuple[Optional[float], List[Tuple[float, float]]]:
+        """
+        Duração total e intervalos de silêncio (silencedetect) do áudio já gravado no diretório de trabalho
+
+        Returns:
+            (duração em segundos ou None, [(início, fim)] dos silêncios)
+        """
+        try:
+            result = await self._exec(audio.path, (
+                "-af", f"silencedetect=noise={LONG_AUDIO_SILENCE_DB}:d={LONG_AUDIO_SILENCE_SECONDS}",
+                "-f", "null", "-"
+            ), loglevel="info")
+        except asyncio.TimeoutError:
+            return None, []
+        if not result:
+            return None, []
+        log = result[1].decode(errors="replace")
+        duration = progress_duration(log)
+        starts = [max(0.0, float(v)) for v in _SILENCE_START.findall(log)]
+        ends = [float(v) for v in _SILENCE_END.findall(log)]
+        # Silêncio até o fim do áudio não tem silence_end
+        if duration is not None and len(ends) < len(starts):
+            ends.append(duration)
+        return duration, list(zip(starts, ends))
+
+    async def extract_segment(self, source: Path, start: float, end: float) -> Optional[bytes]:
+        return await self.run_ffmpeg(
+            source,
+            "-ss", f"{start:.3f}", "-to", f"{end:.3f}",
+            "-vn", "-ac", "1", "-ar", str(AUDIO_SAMPLE_RATE),
+            "-c:a", "libopus", "-b:a", AUDIO_OPUS_BITRATE, "-application", "voip",
+            "-f", "ogg", "pipe:1"
+        )
+
+    def stats(self) -> Dict:
+        stats = self._stats
+        return {
+            "enabled": self.enabled,
+            "normalized": stats["normalized"],
+            "skipped": stats["skipped"],
+            "failed": stats["failed"],
+            "failed_formats": dict(self._failed_formats),
+            "bytes_in": stats["bytes_in"],
+            "bytes_out": stats["bytes_out"],
+            "bytes_saved": stats["bytes_in"] - stats["bytes_out"],
+            "saved_ratio": round(1 - stats["bytes_out"] / stats["bytes_in"], 3) if stats["bytes_in"] else 0,
+            "avg_ms": round(stats["total_ms"] / stats["normalized"]) if stats["normalized"] else 0
+        }
+
+
+audio_normalizer = AudioNormalizer()
+
+
+def plan_segments(duration: float, silences: List[Tuple[float, float]],
+                  max_seconds: float = LONG_AUDIO_MAX_SEGMENT_SECONDS,
+                  min_seconds: float = LONG_AUDIO_MIN_SEGMENT_SECONDS) -> List[Tuple[float, float]]:
+    """
+    Cortes em segmentos de até max_seconds, no último silêncio da janela
+    (corte seco em max_seconds se a janela não tiver silêncio)
+    """
+    segments = []
+    start = 0.0
+    while duration - start > max_seconds:
+        window_end = start + max_seconds
+        pauses = [
+            (silence_start + silence_end) / 2 for silence_start, silence_end in silences
+            if start + min_seconds <= (silence_start + silence_end) / 2 <= window_end
+        ]
+        cut = max(pauses) if pauses else window_end
+        segments.append((start, cut))
+        start = cut
+    segments.append((start, duration))
+    return segments
+
+
+async def transcribe_long(audio: AudioUpload, duration: float, silences: List[Tuple[float, float]],
+                          transcribe: Callable[[AudioUpload, Optional[str]], Awaitable],
+                          concurrency: int = LONG_AUDIO_CONCURRENCY) -> Dict:
+    """
+    Transcreve uma gravação longa em segmentos paralelos, cortados do arquivo audio.path
+
+    Args:
+        transcribe: chamada ao STT (áudio, idioma ISO opcional) → resposta verbose_json
+    Returns:
+        {text, language, segments, duration, retranscribed}
+    """
+    plan = plan_segments(duration, silences)
+    slots = asyncio.Semaphore(concurrency)
+
+    async def run(index: int, language: Optional[str] = None):
+        async with slots:
+            start, end = plan[index]
+            segment = await audio_normalizer.extract_segment(audio.path, start, end)
+            if segment is None:
+                raise RuntimeError(f"Could not extract audio segment {index} ({start:.1f}-{end:.1f}s)")
+            return await transcribe(AudioUpload(f"segment-{index}.ogg", "audio/ogg", segment), language)
+
+    async def run_all(indexes: List[int], language: Optional[str] = None) -> list:
+        tasks = [asyncio.ensure_future(run(i, language)) for i in indexes]
+        try:
+            return await asyncio.gather(*tasks)
+        except BaseException:
+            # Um segmento falhou (ou a requisição foi cancelada): não deixa os outros rodando
+            for task in tasks:
+                task.cancel()
+            raise
+
+    results = list(await run_all(list(range(len(plan)))))
+
+    # Idioma conciliado: o que cobre mais tempo de fala vence; segmentos divergentes são refeitos com a dica
+    weights: Dict[str, float] = {}
+    for (start, end), result in zip(plan, results):
+        language = (getattr(result, "language", None) or "").lower()
+        if language and (result.text or "").strip():
+            weights[language] = weights.get(language, 0.0) + (end - start)
+    language = max(weights, key=weights.get) if weights else None
+    divergent = [
+        i for i, result in enumerate(results)
+        if language and (getattr(result, "language", None) or "").lower() not in ("", language)
+    ]
+    code = WHISPER_LANGUAGE_CODES.get(language or "")
+    if divergent and code:
+        for i, result in zip(divergent, await run_all(divergent, code)):
+            results[i] = result
+
+    text = " ".join((result.text or "").strip() for result in results if (result.text or "").strip())
+    logger.info(f"Long audio transcribed: {duration:.0f}s in {len(plan)} segments, language {language}, {len(divergent)} re-transcribed")
+    return {
+        "text": text,
+        "language": language or "unknown",
+        "segments": len(plan),
+        "duration": round(duration, 1),
+        "retranscribed": len(divergent) if code else 0
+    }
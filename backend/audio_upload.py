@@ -0,0 +1,254 @@
+"""
+EaseMind Audio Upload - Recebimento de áudio em streaming, limitado e sem arquivo temporário
+Lê o corpo multipart da requisição em blocos direto para um buffer em memória,
+rejeitando cedo (Content-Length ou bytes já recebidos) o que passar do limite,
+e verifica a duração antes de qualquer chamada ao STT. Containers sem duração no
+cabeçalho (WebM do MediaRecorder) são medidos lendo os pacotes até o fim, sem decodificar.
+
+ffprobe/ffmpeg leem o áudio de um arquivo (containers como m4a/mp4 guardam o índice
+no fim e não são legíveis por um pipe): cada requisição grava uma única cópia num
+diretório de trabalho em tmpfs, usado por sonda, normalização e cortes e removido no fim.
+"""
+
+import os
+import re
+import shutil
+import asyncio
+import logging
+import tempfile
+import contextlib
+from pathlib import Path
+from typing import AsyncIterator, Optional
+
+from fastapi import HTTPException, Request
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+logger = logging.getLogger(__name__)
+
+TRANSCRIBE_MAX_BYTES = int(os.getenv("TRANSCRIBE_MAX_BYTES", str(25 * 1024 * 1024)))  # Limite do Whisper
+TRANSCRIBE_MAX_SECONDS = float(os.getenv("TRANSCRIBE_MAX_SECONDS", "600"))
+TRANSCRIBE_PROBE_TIMEOUT = float(os.getenv("TRANSCRIBE_PROBE_TIMEOUT", "5"))
+# Recusar (400) áudio de duração ilegível; desligado, vale só o limite de bytes
+TRANSCRIBE_REQUIRE_DURATION = os.getenv("TRANSCRIBE_REQUIRE_DURATION", "false").lower() in ("1", "true", "yes")
+FFPROBE_AVAILABLE = shutil.which("ffprobe") is not None
+# /dev/shm é tmpfs (memória) no Linux: o arquivo temporário não chega ao disco
+AUDIO_TMP_DIR = os.getenv("AUDIO_TMP_DIR") or ("/dev/shm" if os.path.isdir("/dev/shm") else None)
+# Folga para boundaries e cabeçalhos das partes no Content-Length
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+_PROGRESS_TIME = re.compile(r"time=(\d+):(\d+):(\d+(?:\.\d+)?)")
+
+
+class AudioUpload:
+    """Arquivo de áudio recebido: nome, tipo e conteúdo em memória"""
+
+    def __init__(self, filename: str, content_type: str, data: bytes):
+        self.filename = filename
+        self.content_type = content_type
+        self.data = data
+        self.duration: Optional[float] = None
+        self.path: Optional[Path] = None  # Cópia em disco (spool), para ffprobe/ffmpeg
+
+    @property
+    def size(self) -> int:
+        return len(self.data)
+
+    @property
+    def suffix(self) -> str:
+        return os.path.splitext(self.filename)[1].lstrip(".").lower() or "webm"
+
+    def as_file(self):
+        """Formato (nome, bytes, tipo) aceito diretamente pelo cliente OpenAI"""
+        return (self.filename, self.data, self.content_type)
+
+    async def spool(self, workspace: Path) -> Path:
+        """Grava o áudio no diretório de trabalho (uma vez) e devolve o caminho"""
+        if self.path is None:
+            self.path = await asyncio.to_thread(_write_temp, self.data, self.suffix, workspace)
+        return self.path
+
+
+async def read_audio_upload(request: Request, field: str = "file", max_bytes: int = TRANSCRIBE_MAX_BYTES) -> AudioUpload:
+    """
+    Lê o campo de arquivo do multipart em streaming
+
+    Raises:
+        HTTPException 413 (acima do limite), 400 (corpo inválido ou sem arquivo)
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes + MULTIPART_OVERHEAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"Audio exceeds {max_bytes} bytes")
+
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise HTTPException(status_code=400, detail="Expected multipart/form-data with an audio file")
+
+    state = {"header_field": b"", "header_value": b"", "headers": {}, "target": False,
+             "filename": None, "content_type": "application/octet-stream", "size": 0, "done": False}
+    buffer = bytearray()
+
+    def on_part_begin():
+        state["headers"] = {}
+
+    def on_header_field(data, start, end):
+        state["header_field"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        state["header_value"] += data[start:end]
+
+    def on_header_end():
+        state["headers"][state["header_field"].lower()] = state["header_value"]
+        state["header_field"] = b""
+        state["header_value"] = b""
+
+    def on_headers_finished():
+        _, disposition = parse_options_header(state["headers"].get(b"content-disposition", b""))
+        is_target = disposition.get(b"name") == field.encode() and b"filename" in disposition and not state["done"]
+        state["target"] = is_target
+        if is_target:
+            state["filename"] = disposition[b"filename"].decode("utf-8", "replace") or "audio.webm"
+            part_type = state["headers"].get(b"content-type")
+            if part_type:
+                state["content_type"] = part_type.decode("latin-1")
+
+    def on_part_data(data, start, end):
+        if state["target"]:
+            state["size"] += end - start
+            if state["size"] <= max_bytes:
+                buffer.extend(data[start:end])
+
+    def on_part_end():
+        if state["target"]:
+            state["target"] = False
+            state["done"] = True
+
+    parser = MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end
+    })
+
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            if state["size"] > max_bytes:
+                # Para de ler: o restante do corpo não chega a ser bufferizado
+                raise HTTPException(status_code=413, detail=f"Audio exceeds {max_bytes} bytes")
+        parser.finalize()
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Malformed multipart body: {e}")
+
+    if not state["done"] or not buffer:
+        raise HTTPException(status_code=400, detail=f"Missing audio file field '{field}'")
+    return AudioUpload(state["filename"], state["content_type"], bytes(buffer))
+
+
+def _write_temp(data: bytes, suffix: str, directory: Path) -> Path:
+    fd, path = tempfile.mkstemp(dir=directory, prefix="audio-", suffix=f".{suffix}")
+    with os.fdopen(fd, "wb") as handle:
+        handle.write(data)
+    return Path(path)
+
+
+@contextlib.asynccontextmanager
+async def audio_workspace() -> AsyncIterator[Path]:
+    """Diretório temporário da requisição (em tmpfs quando disponível), removido na saída do bloco"""
+    workspace = Path(await asyncio.to_thread(tempfile.mkdtemp, prefix="easemind-audio-", dir=AUDIO_TMP_DIR))
+    try:
+        yield workspace
+    finally:
+        await asyncio.to_thread(shutil.rmtree, workspace, True)
+
+
+def progress_duration(log: str) -> Optional[float]:
+    """Último time= do progresso do ffmpeg, em segundos"""
+    progress = _PROGRESS_TIME.findall(log)
+    if not progress:
+        return None
+    hours, minutes, seconds = progress[-1]
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+async def measure_duration(path: Path) -> Optional[float]:
+    """
+    Duração lida dos pacotes de áudio até o fim do arquivo (cópia para o muxer null, sem decodificar)
+
+    Returns:
+        None se o ffmpeg não estiver instalado ou não conseguir ler o arquivo
+    """
+    try:
+        process = await asyncio.create_subprocess_exec(
+            "ffmpeg", "-hide_banner", "-nostdin", "-i", str(path),
+            "-map", "0:a:0", "-c", "copy", "-f", "null", "-",
+            stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE
+        )
+    except FileNotFoundError:
+        return None
+    try:
+        _, stderr = await asyncio.wait_for(process.communicate(), TRANSCRIBE_PROBE_TIMEOUT)
+    except asyncio.TimeoutError:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        return None
+    if process.returncode != 0:
+        return None
+    return progress_duration(stderr.decode(errors="replace"))
+
+
+async def probe_duration(path: Path) -> Optional[float]:
+    """
+    Duração do áudio em segundos via ffprobe (cabeçalho do container)
+
+    Returns:
+        None se o ffprobe não estiver instalado ou não conseguir ler o container
+    """
+    if not FFPROBE_AVAILABLE:
+        return None
+    try:
+        process = await asyncio.create_subprocess_exec(
+            "ffprobe", "-v", "error", "-i", str(path),
+            "-show_entries", "format=duration", "-of", "default=noprint_wrappers=1:nokey=1",
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
+        )
+    except FileNotFoundError:
+        return None
+    try:
+        stdout, _ = await asyncio.wait_for(process.communicate(), TRANSCRIBE_PROBE_TIMEOUT)
+    except asyncio.TimeoutError:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        return None
+    try:
+        return float(stdout.decode().strip())
+    except ValueError:
+        return None
+
+
+async def enforce_duration(upload: AudioUpload, max_seconds: float = TRANSCRIBE_MAX_SECONDS,
+                           required: bool = TRANSCRIBE_REQUIRE_DURATION):
+    """
+    Rejeita áudio mais longo que o limite antes da chamada ao STT (upload já gravado com spool)
+
+    Raises:
+        HTTPException 413 (acima do limite), 400 (duração ilegível com ffprobe disponível e required)
+    """
+    upload.duration = await probe_duration(upload.path)
+    if upload.duration is None and FFPROBE_AVAILABLE:
+        # Sem duração no cabeçalho (ex.: WebM gravado pelo navegador): mede pelos pacotes
+        upload.duration = await measure_duration(upload.path)
+    if upload.duration is None:
+        if required and FFPROBE_AVAILABLE:
+            raise HTTPException(status_code=400, detail="Could not read the audio duration")
+        logger.warning(f"Audio duration unknown ({upload.suffix}, {upload.size} bytes): duration limit not applied")
+        return
+    if upload.duration > max_seconds:
+        raise HTTPException(status_code=413, detail=f"Audio longer than {int(max_seconds)} seconds")
@@ -0,0 +1,152 @@
+"""
+EaseMind Background Jobs - Fila de pós-processamento em processo
+Executa trabalho que não precisa bloquear a resposta ao usuário
+(resumo da conversa, memórias, histórico) com concorrência limitada,
+retentativas e drenagem graciosa no shutdown.
+"""
+
+import os
+import time
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+POSTPROC_CONCURRENCY = int(os.getenv("POSTPROC_CONCURRENCY", "4"))
+POSTPROC_MAX_QUEUE = int(os.getenv("POSTPROC_MAX_QUEUE", "1000"))
+POSTPROC_MAX_RETRIES = int(os.getenv("POSTPROC_MAX_RETRIES", "3"))
+POSTPROC_RETRY_BACKOFF = float(os.getenv("POSTPROC_RETRY_BACKOFF", "0.5"))
+POSTPROC_DRAIN_TIMEOUT = float(os.getenv("POSTPROC_DRAIN_TIMEOUT", "30"))
+
+
+@dataclass
+class Job:
+    name: str
+    fn: Callable
+    args: tuple = ()
+    kwargs: dict = field(default_factory=dict)
+    enqueued_at: float = field(default_factory=time.monotonic)
+    attempts: int = 0
+
+
+class JobQueue:
+    """Fila assíncrona com N workers, retentativas com backoff e métricas de profundidade/atraso"""
+
+    def __init__(self, name: str, concurrency: int = POSTPROC_CONCURRENCY, max_size: int = POSTPROC_MAX_QUEUE,
+                 max_retries: int = POSTPROC_MAX_RETRIES, retry_backoff: float = POSTPROC_RETRY_BACKOFF):
+        self.name = name
+        self.concurrency = concurrency
+        self.max_size = max_size
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._accepting = False
+        # Drenada no shutdown: submits atrasados rodam inline em vez de reabrir a fila
+        self._closed = False
+        self._in_flight = 0
+        self._processed = 0
+        self._failed = 0
+        self._retried = 0
+        self._last_lag = 0.0
+        self._max_lag = 0.0
+
+    async def start(self):
+        """Inicia os workers (idempotente)"""
+        if self._workers:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._accepting = True
+        self._closed = False
+        self._workers = [
+            asyncio.create_task(self._worker(i), name=f"{self.name}-worker-{i}")
+            for i in range(self.concurrency)
+        ]
+        logger.info(f"Job queue '{self.name}' started ({self.concurrency} workers, max {self.max_size} jobs)")
+
+    async def submit(self, name: str, fn: Callable, *args, **kwargs):
+        """
+        Enfileira um job. Funções síncronas rodam em thread para não bloquear o event loop.
+        Se a fila estiver cheia, aguarda espaço (backpressure) em vez de descartar.
+        """
+        if not self._workers and not self._closed:
+            await self.start()
+        if not self._accepting:
+            # Em drenagem: executa inline para não perder a escrita
+            logger.warning(f"Job queue '{self.name}' draining, running '{name}' inline")
+            await self._run(Job(name, fn, args, kwargs))
+            return
+        await self._queue.put(Job(name, fn, args, kwargs))
+
+    async def _run(self, job: Job):
+        if asyncio.iscoroutinefunction(job.fn):
+            await job.fn(*job.args, **job.kwargs)
+        else:
+            await asyncio.to_thread(job.fn, *job.args, **job.kwargs)
+
+    async def _worker(self, index: int):
+        while True:
+            job = await self._queue.get()
+            self._in_flight += 1
+            try:
+                if job.attempts == 0:
+                    self._last_lag = time.monotonic() - job.enqueued_at
+                    self._max_lag = max(self._max_lag, self._last_lag)
+                while True:
+                    job.attempts += 1
+                    try:
+                        await self._run(job)
+                        self._processed += 1
+                        break
+                    except asyncio.CancelledError:
+                        raise
+                    except Exception as e:
+                        if job.attempts > self.max_retries:
+                            self._failed += 1
+                            logger.error(f"Job '{job.name}' failed after {job.attempts} attempts: {e}", exc_info=True)
+                            break
+                        self._retried += 1
+                        delay = self.retry_backoff * (2 ** (job.attempts - 1))
+                        logger.warning(f"Job '{job.name}' failed (attempt {job.attempts}), retrying in {delay:.1f}s: {e}")
+                        await asyncio.sleep(delay)
+            finally:
+                self._in_flight -= 1
+                self._queue.task_done()
+
+    async def drain(self, timeout: float = POSTPROC_DRAIN_TIMEOUT):
+        """Para de aceitar jobs, aguarda os pendentes (até timeout) e encerra os workers"""
+        self._closed = True
+        if not self._workers:
+            return
+        self._accepting = False
+        pending = self._queue.qsize() + self._in_flight
+        logger.info(f"Draining job queue '{self.name}' ({pending} pending)")
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Job queue '{self.name}' drain timed out, {self._queue.qsize() + self._in_flight} jobs lost")
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def stats(self) -> Dict:
+        """Profundidade, atraso e contadores da fila"""
+        depth = self._queue.qsize() if self._queue else 0
+        return {
+            "depth": depth,
+            "in_flight": self._in_flight,
+            "processed": self._processed,
+            "failed": self._failed,
+            "retried": self._retried,
+            "last_lag_ms": round(self._last_lag * 1000, 1),
+            "max_lag_ms": round(self._max_lag * 1000, 1),
+            "concurrency": self.concurrency,
+            "running": bool(self._workers)
+        }
+
+
+# Fila usada pelo /api/chat para resumo, memória e histórico
+post_processing = JobQueue("post_processing")
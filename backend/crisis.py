@@ -0,0 +1,109 @@
+"""
+EaseMind Crisis - Caminho rápido para mensagens de risco crítico
+A resposta de segurança é pré-renderizada por idioma (prompts/crisis.*.txt) e
+devolvida sem depender do LLM nem do Mongo. O acompanhamento personalizado é
+gerado em background e guardado aqui em memória, para ser entregue por polling
+(/api/chat/followup/{id}) ou no próprio stream SSE.
+"""
+
+import os
+import time
+import asyncio
+import logging
+from typing import Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Nível de risco a partir do qual a resposta de segurança sai antes do LLM
+CRISIS_FAST_PATH_LEVEL = int(os.getenv("CRISIS_FAST_PATH_LEVEL", "4"))
+CRISIS_FOLLOWUP_TTL_SECONDS = float(os.getenv("CRISIS_FOLLOWUP_TTL_SECONDS", "900"))
+CRISIS_FOLLOWUP_MAX_TOKENS = int(os.getenv("CRISIS_FOLLOWUP_MAX_TOKENS", "300"))
+
+# Instrução adicionada depois da resposta de segurança já enviada ao usuário
+CRISIS_FOLLOWUP_INSTRUCTION = (
+    "The user has already received the safety message above, with crisis lines and the SOS button. "
+    "Write a short, warm, personalized follow-up in the user's language: acknowledge what they shared, "
+    "stay present and gently encourage them to reach out to the resources or someone they trust now. "
+    "Do not repeat the phone numbers."
+)
+
+
+class FollowupStore:
+    """Acompanhamentos pendentes/prontos por id (correlation_id da requisição), com TTL"""
+
+    def __init__(self, ttl: float = CRISIS_FOLLOWUP_TTL_SECONDS):
+        self.ttl = ttl
+        self._entries: Dict[str, Dict] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._stats = {"fast_path": 0, "ready": 0, "failed": 0, "total_ms": 0.0}
+
+    def _prune(self):
+        now = time.monotonic()
+        expired = [key for key, entry in self._entries.items() if now - entry["created"] > self.ttl]
+        for key in expired:
+            del self._entries[key]
+
+    def create(self, followup_id: str, user_id: str):
+        self._prune()
+        self._entries[followup_id] = {
+            "user_id": user_id,
+            "status": "pending",
+            "response": None,
+            "created": time.monotonic(),
+            "event": asyncio.Event()
+        }
+        self._stats["fast_path"] += 1
+
+    def resolve(self, followup_id: str, response: Optional[str]):
+        """Marca como pronto (ou falho se não houver resposta) e acorda quem está esperando"""
+        entry = self._entries.get(followup_id)
+        if entry is None:
+            return
+        entry["status"] = "ready" if response else "failed"
+        entry["response"] = response
+        entry["event"].set()
+        self._stats["ready" if response else "failed"] += 1
+        self._stats["total_ms"] += (time.monotonic() - entry["created"]) * 1000
+
+    def spawn(self, coro) -> asyncio.Task:
+        """Roda a corrotina fora da requisição, mantendo a referência até terminar"""
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def drain(self, timeout: float = 10.0):
+        """Aguarda os acompanhamentos em andamento no shutdown (eles também salvam o turno)"""
+        if self._tasks:
+            await asyncio.wait(set(self._tasks), timeout=timeout)
+
+    async def wait(self, followup_id: str, timeout: float, user_id: str) -> Optional[Dict]:
+        """
+        Espera o acompanhamento ficar pronto por até timeout segundos
+
+        Returns:
+            {status, response} ou None se o id não existir, já expirou ou é de outro usuário
+        """
+        entry = self._entries.get(followup_id)
+        if entry is None or entry["user_id"] != user_id:
+            return None
+        if entry["status"] == "pending" and timeout > 0:
+            try:
+                await asyncio.wait_for(entry["event"].wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return {"status": entry["status"], "response": entry["response"]}
+
+    def stats(self) -> Dict:
+        finished = self._stats["ready"] + self._stats["failed"]
+        return {
+            "fast_path": self._stats["fast_path"],
+            "followups_ready": self._stats["ready"],
+            "followups_failed": self._stats["failed"],
+            "followups_pending": sum(1 for e in self._entries.values() if e["status"] == "pending"),
+            "avg_followup_ms": round(self._stats["total_ms"] / finished) if finished else 0,
+            "background_tasks": len(self._tasks)
+        }
+
+
+crisis_followups = FollowupStore()
@@ -0,0 +1,89 @@
+"""
+EaseMind LLM Client - Cliente OpenAI assíncrono compartilhado
+Um único AsyncOpenAI por processo, com pool de conexões keep-alive,
+criado no lifespan da aplicação e reutilizado por chat, TTS, STT e resumos.
+"""
+
+import os
+import logging
+from typing import Optional
+
+import httpx
+from openai import AsyncOpenAI
+
+logger = logging.getLogger(__name__)
+
+# Configuração do pool (via variáveis de ambiente)
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "30"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "60"))
+LLM_POOL_TIMEOUT = float(os.getenv("LLM_POOL_TIMEOUT", "10"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+
+_client: Optional[AsyncOpenAI] = None
+
+
+def get_api_key() -> Optional[str]:
+    """Retorna a chave configurada (OpenAI tem prioridade sobre Emergent)"""
+    return os.getenv("OPENAI_API_KEY") or os.getenv("EMERGENT_LLM_KEY")
+
+
+def _build_client(api_key: str) -> AsyncOpenAI:
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=LLM_KEEPALIVE_EXPIRY
+        ),
+        timeout=httpx.Timeout(
+            LLM_READ_TIMEOUT,
+            connect=LLM_CONNECT_TIMEOUT,
+            pool=LLM_POOL_TIMEOUT
+        )
+    )
+    return AsyncOpenAI(
+        api_key=api_key,
+        http_client=http_client,
+        max_retries=LLM_MAX_RETRIES
+    )
+
+
+async def init_llm_client() -> Optional[AsyncOpenAI]:
+    """Cria o cliente compartilhado (chamado no startup da aplicação)"""
+    global _client
+    api_key = get_api_key()
+    if not api_key:
+        logger.warning("LLM client not initialized: no API key configured")
+        return None
+    if _client is None:
+        _client = _build_client(api_key)
+        logger.info(
+            f"LLM client ready (max_connections={LLM_MAX_CONNECTIONS}, "
+            f"keepalive={LLM_MAX_KEEPALIVE_CONNECTIONS}, read_timeout={LLM_READ_TIMEOUT}s)"
+        )
+    return _client
+
+
+def get_llm_client() -> AsyncOpenAI:
+    """
+    Retorna o cliente compartilhado.
+    Cria sob demanda se o lifespan não rodou (ex: scripts).
+    """
+    global _client
+    if _client is None:
+        api_key = get_api_key()
+        if not api_key:
+            raise RuntimeError("API key not configured")
+        _client = _build_client(api_key)
+    return _client
+
+
+async def close_llm_client():
+    """Fecha o pool de conexões (chamado no shutdown da aplicação)"""
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+        logger.info("LLM client closed")
@@ -3,20 +3,71 @@ EaseMind Orchestrator - Sistema de Memória, Contexto e Detecção de Risco
 Gerencia interações entre usuário, Luna (IA) e banco de dados MongoDB
 """
 
-from pymongo import MongoClient
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import IndexModel, ReadPreference, UpdateOne
+from pymongo.errors import DuplicateKeyError
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 import os
 import re
+import json
+import time
+import asyncio
+import inspect
+import functools
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from risk_matcher import RiskHit, risk_lexicon
 from emergentintegrations.llm.chat import LlmChat, UserMessage
 import logging
 
 logger = logging.getLogger(__name__)
 
-# Conexão com MongoDB
+# Conexão com MongoDB (Motor, assíncrono)
 MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
-client = MongoClient(MONGO_URL)
-db = client.easemind
+
+# Um cliente Motor por event loop: o loop do uvicorn e o loop da fachada síncrona (scripts)
+_motor_clients: Dict[asyncio.AbstractEventLoop, AsyncIOMotorClient] = {}
+
+
+def get_database():
+    """Banco easemind ligado ao event loop em execução"""
+    loop = asyncio.get_running_loop()
+    motor_client = _motor_clients.get(loop)
+    if motor_client is None:
+        motor_client = AsyncIOMotorClient(MONGO_URL, io_loop=loop)
+        _motor_clients[loop] = motor_client
+    return motor_client.easemind
+
+
+def close_database():
+    """Fecha os clientes Motor abertos (shutdown da aplicação)"""
+    for motor_client in _motor_clients.values():
+        motor_client.close()
+    _motor_clients.clear()
+
+
+class _LazyCollection:
+    """Referência a uma coleção resolvida no momento da chamada (no loop atual)"""
+    
+    def __init__(self, name: str):
+        self.name = name
+    
+    def __getattr__(self, attr):
+        return getattr(get_database()[self.name], attr)
+
+
+class _LazyDatabase:
+    def __getattr__(self, name: str) -> _LazyCollection:
+        return _LazyCollection(name)
+    
+    def __getitem__(self, name: str) -> _LazyCollection:
+        return _LazyCollection(name)
+
+
+db = _LazyDatabase()
 
 # Collections
 users_collection = db.users
@@ -27,27 +78,149 @@ mood_logs_collection = db.mood_logs
 sessions_completed_collection = db.sessions_completed
 journal_entries_collection = db.journal_entries
 techniques_tracking_collection = db.techniques_tracking
+user_state_collection = db.user_state  # Read model desnormalizado para o contexto do prompt
+
+
+class IndexManager:
+    """
+    Registro das formas de consulta (query shapes) de cada coleção e dos índices que as atendem
+    
+    ensure_indexes() roda no startup da aplicação; report() compara o registro com os índices
+    existentes (faltando, não declarados) e com $indexStats (sem uso desde o último restart do mongod).
+    """
+    
+    # coleção → índices declarados (nome, chaves, consultas atendidas, opções)
+    INDEXES = {
+        "users": [
+            {"name": "user_id", "keys": [("user_id", 1)],
+             "queries": ["UserStateManager.rebuild", "SubscriptionManager.check_premium_status", "SOSManager.get_emergency_contacts"]}
+        ],
+        "user_state": [
+            {"name": "user_id_unique", "keys": [("user_id", 1)], "options": {"unique": True},
+             "queries": ["UserStateManager.get_state", "UserStateManager.on_*"]}
+        ],
+        "ai_memories": [
+            {"name": "user_created", "keys": [("user_id", 1), ("created_at", -1)],
+             "queries": ["MemoryManager.enforce_retention", "UserStateManager.rebuild", "/api/user-memories"]}
+        ],
+        "conversations": [
+            {"name": "user_created", "keys": [("user_id", 1), ("created_at", -1)],
+             "queries": ["histórico por usuário"]},
+            {"name": "created", "keys": [("created_at", 1)],
+             "queries": ["AnalyticsManager.get_global_stats (ativos 7d)"]}
+        ],
+        "risk_events": [
+            {"name": "user_created", "keys": [("user_id", 1), ("created_at", -1)],
+             "queries": ["/api/risk-events"]},
+            {"name": "created", "keys": [("created_at", 1)],
+             "queries": ["AnalyticsManager.get_global_stats (risco 30d)"]},
+            {"name": "conversation_unique", "keys": [("conversation_id", 1)],
+             "options": {"unique": True, "partialFilterExpression": {"conversation_id": {"$exists": True}}},
+             "queries": ["RiskRescanManager.run (upsert por conversa)"]}
+        ],
+        "mood_logs": [
+            {"name": "user_created", "keys": [("user_id", 1), ("created_at", -1)],
+             "queries": ["MoodTracker.get_mood_trend", "UserStateManager.rebuild"]}
+        ],
+        "techniques_tracking": [
+            {"name": "user_technique", "keys": [("user_id", 1), ("technique", 1)],
+             "queries": ["TechniqueTracker.get_best_techniques", "UserStateManager.rebuild"]}
+        ],
+        "sessions_completed": [
+            {"name": "user_completed_created", "keys": [("user_id", 1), ("completed", 1), ("created_at", -1)],
+             "queries": ["SessionManager.get_recent_sessions", "SessionManager.get_session_stats", "UserStateManager.rebuild"]},
+            {"name": "completed_session", "keys": [("completed", 1), ("session_id", 1)],
+             "queries": ["AnalyticsManager.get_popular_sessions", "AnalyticsManager.get_global_stats"]}
+        ],
+        "journal_entries": [
+            {"name": "user_created", "keys": [("user_id", 1), ("created_at", -1)],
+             "queries": ["JournalManager.get_entries", "JournalManager.get_common_tags"]},
+            {"name": "user_tags_created", "keys": [("user_id", 1), ("tags", 1), ("created_at", -1)],
+             "queries": ["JournalManager.get_entries (filtro por tag)"]}
+        ],
+        "sos_events": [
+            {"name": "user_created", "keys": [("user_id", 1), ("created_at", -1)],
+             "queries": ["SOSManager.get_sos_history"]}
+        ],
+        "audio_events": [
+            {"name": "user_created", "keys": [("user_id", 1), ("created_at", -1)],
+             "queries": ["analytics de áudio por usuário"]}
+        ],
+        "subscription_events": [
+            {"name": "user_created", "keys": [("user_id", 1), ("created_at", -1)],
+             "queries": ["eventos de assinatura por usuário"]}
+        ]
+    }
+    
+    @staticmethod
+    async def ensure_indexes() -> Dict[str, List[str]]:
+        """
+        Cria os índices declarados (idempotente)
+        Falhas em uma coleção são registradas sem impedir as demais nem o startup.
+        """
+        created = {}
+        for collection_name, specs in IndexManager.INDEXES.items():
+            models = [
+                IndexModel(spec["keys"], name=spec["name"], **spec.get("options", {}))
+                for spec in specs
+            ]
+            try:
+                created[collection_name] = await db[collection_name].create_indexes(models)
+            except Exception as e:
+                logger.error(f"Erro ao criar índices de {collection_name}: {e}")
+        logger.info(f"🗂️  Índices verificados em {len(created)}/{len(IndexManager.INDEXES)} coleções")
+        return created
+    
+    @staticmethod
+    async def report() -> Dict:
+        """
+        Compara o registro com o banco: índices faltando, não declarados e sem uso
+        """
+        report = {}
+        for collection_name, specs in IndexManager.INDEXES.items():
+            collection = db[collection_name]
+            existing = await collection.index_information()
+            existing_keys = {name: [tuple(k) for k in info["key"]] for name, info in existing.items()}
+            declared_keys = [[tuple(k) for k in spec["keys"]] for spec in specs]
+            
+            missing = [
+                spec["name"] for spec, keys in zip(specs, declared_keys)
+                if keys not in existing_keys.values()
+            ]
+            undeclared = [
+                name for name, keys in existing_keys.items()
+                if name != "_id_" and keys not in declared_keys
+            ]
+            
+            try:
+                stats = await collection.aggregate([{"$indexStats": {}}]).to_list(None)
+                unused = [
+                    stat["name"] for stat in stats
+                    if stat["name"] != "_id_" and stat["accesses"]["ops"] == 0
+                ]
+            except Exception as e:
+                # $indexStats exige permissão específica em alguns deployments
+                logger.warning(f"$indexStats indisponível para {collection_name}: {e}")
+                unused = None
+            
+            report[collection_name] = {
+                "declared": [spec["name"] for spec in specs],
+                "missing": missing,
+                "undeclared": undeclared,
+                "unused": unused
+            }
+        return report
 
 
 class RiskDetector:
     """Detecta sinais de risco nas mensagens do usuário"""
     
-    # Palavras-chave de risco (em português)
-    CRITICAL_KEYWORDS = [
-        "suicídio", "suicidar", "me matar", "acabar com tudo", "não aguento mais",
-        "não vale a pena viver", "quero morrer", "vou me matar", "quero sumir",
-        "acabar com minha vida", "prefiro morrer", "melhor morto"
-    ]
-    
-    HIGH_RISK_KEYWORDS = [
-        "desesperado", "sem saída", "sem esperança", "desistir", "não consigo mais",
-        "acabou", "me machucar", "autoagressão", "me cortar", "me ferir"
-    ]
+    # Léxico versionado em risk_lexicon.json, recarregado a quente (risk_matcher.risk_lexicon)
     
-    MODERATE_RISK_KEYWORDS = [
-        "muito triste", "muito ansioso", "muito mal", "péssimo", "horrível",
-        "pânico", "desespero", "sozinho", "ninguém liga", "abandono"
-    ]
+    @staticmethod
+    def scan(message: str) -> List[RiskHit]:
+        """Todas as ocorrências do léxico na mensagem, com severidade e idioma"""
+        return risk_lexicon.scan(message)
     
     @staticmethod
     def detect_risk(message: str) -> Tuple[int, List[str]]:
@@ -58,84 +231,497 @@ class RiskDetector:
             Tuple[int, List[str]]: (nível de risco, palavras detectadas)
             Níveis: 0=nenhum, 1=baixo, 2=moderado, 3=alto, 4=crítico
         """
-        message_lower = message.lower()
-        detected_words = []
+        by_severity: Dict[str, List[str]] = {"critical": [], "high": [], "moderate": []}
+        for hit in RiskDetector.scan(message):
+            if hit.phrase not in by_severity[hit.severity]:
+                by_severity[hit.severity].append(hit.phrase)
         
-        # Verificar palavras críticas
-        for keyword in RiskDetector.CRITICAL_KEYWORDS:
-            if keyword in message_lower:
-                detected_words.append(keyword)
-                return (4, detected_words)  # Risco crítico
+        if by_severity["critical"]:
+            return (4, by_severity["critical"])  # Risco crítico
         
-        # Verificar palavras de alto risco
-        for keyword in RiskDetector.HIGH_RISK_KEYWORDS:
-            if keyword in message_lower:
-                detected_words.append(keyword)
+        if by_severity["high"]:
+            return (3, by_severity["high"])  # Risco alto
         
-        if detected_words:
-            return (3, detected_words)  # Risco alto
+        moderate = by_severity["moderate"]
+        if len(moderate) >= 2:
+            return (2, moderate)  # Risco moderado
+        elif len(moderate) == 1:
+            return (1, moderate)  # Risco baixo
         
-        # Verificar palavras de risco moderado
-        for keyword in RiskDetector.MODERATE_RISK_KEYWORDS:
-            if keyword in message_lower:
-                detected_words.append(keyword)
+        return (0, [])  # Sem risco
+
+
+class UserContextCache:
+    """
+    Cache LRU em memória do contexto montado por usuário, com TTL
+    
+    Invalidado pelos métodos de escrita (humor, técnicas, sessões, memórias, perfil).
+    Cada invalidação dá ao usuário uma nova geração (de um contador global), e um contexto
+    buscado antes da invalidação é descartado em vez de ser gravado no cache.
+    As gerações também ficam num LRU limitado; a geração descartada eleva o piso usado
+    para usuários sem geração, então uma leitura antiga nunca volta a parecer atual.
+    """
+    
+    MAX_ENTRIES = int(os.getenv("CONTEXT_CACHE_MAX_ENTRIES", "5000"))
+    TTL_SECONDS = float(os.getenv("CONTEXT_CACHE_TTL_SECONDS", "300"))
+    
+    _entries: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+    _generations: "OrderedDict[str, int]" = OrderedDict()
+    _generation_clock = 0
+    _generation_floor = 0
+    _lock = threading.Lock()
+    _stats = {"hits": 0, "misses": 0, "invalidations": 0, "evictions": 0}
+    
+    @staticmethod
+    def get(user_id: str) -> Optional[Dict]:
+        """Retorna o contexto em cache ou None (miss/expirado)"""
+        cache = UserContextCache
+        with cache._lock:
+            entry = cache._entries.get(user_id)
+            if entry and entry[0] > time.monotonic():
+                cache._entries.move_to_end(user_id)
+                cache._stats["hits"] += 1
+                return entry[1]
+            if entry:
+                del cache._entries[user_id]
+            cache._stats["misses"] += 1
+            return None
+    
+    @staticmethod
+    def generation(user_id: str) -> int:
+        """Geração atual do usuário (capturar antes de buscar no banco)"""
+        cache = UserContextCache
+        with cache._lock:
+            return cache._generations.get(user_id, cache._generation_floor)
+    
+    @staticmethod
+    def set(user_id: str, context: Dict, generation: int):
+        """Grava o contexto se nenhuma escrita ocorreu desde a geração informada"""
+        cache = UserContextCache
+        with cache._lock:
+            if cache._generations.get(user_id, cache._generation_floor) != generation:
+                return
+            cache._entries[user_id] = (time.monotonic() + cache.TTL_SECONDS, context)
+            cache._entries.move_to_end(user_id)
+            while len(cache._entries) > cache.MAX_ENTRIES:
+                cache._entries.popitem(last=False)
+                cache._stats["evictions"] += 1
+    
+    @staticmethod
+    def invalidate(user_id: str):
+        """Remove o contexto do usuário (chamado após escritas)"""
+        cache = UserContextCache
+        with cache._lock:
+            cache._generation_clock += 1
+            cache._generations[user_id] = cache._generation_clock
+            cache._generations.move_to_end(user_id)
+            while len(cache._generations) > cache.MAX_ENTRIES:
+                _, dropped = cache._generations.popitem(last=False)
+                cache._generation_floor = max(cache._generation_floor, dropped)
+            if cache._entries.pop(user_id, None) is not None:
+                cache._stats["invalidations"] += 1
+    
+    @staticmethod
+    def stats() -> Dict:
+        """Contadores de hit/miss do cache"""
+        cache = UserContextCache
+        with cache._lock:
+            lookups = cache._stats["hits"] + cache._stats["misses"]
+            return {
+                **cache._stats,
+                "size": len(cache._entries),
+                "generations": len(cache._generations),
+                "hit_ratio": round(cache._stats["hits"] / lookups, 3) if lookups else 0
+            }
+
+
+class SingleFlight:
+    """
+    Coalescência de leituras concorrentes idênticas (single-flight)
+    
+    Chamadas simultâneas com a mesma chave (função, argumentos) compartilham uma única
+    execução em andamento; quem chega depois apenas aguarda o resultado. A execução
+    roda em uma task própria, então o cancelamento de um chamador não afeta os demais.
+    O resultado é o mesmo objeto para todos: não deve ser modificado pelos chamadores.
+    """
+    
+    _inflight: Dict[Tuple, asyncio.Task] = {}
+    _stats: Dict[str, Dict[str, int]] = {}
+    
+    @staticmethod
+    async def run(key: Tuple, fn, *args, **kwargs):
+        """Executa fn(*args, **kwargs) ou se junta à execução em andamento com a mesma chave"""
+        name = key[0]
+        stats = SingleFlight._stats.setdefault(name, {"calls": 0, "coalesced": 0})
+        stats["calls"] += 1
+        # Tasks pertencem a um event loop (uvicorn ou fachada síncrona)
+        key = (id(asyncio.get_running_loop()),) + key
+        task = SingleFlight._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn(*args, **kwargs))
+            SingleFlight._inflight[key] = task
+            task.add_done_callback(functools.partial(SingleFlight._done, key))
+        else:
+            stats["coalesced"] += 1
+        return await asyncio.shield(task)
+    
+    @staticmethod
+    def _done(key: Tuple, task: asyncio.Task):
+        SingleFlight._inflight.pop(key, None)
+        if not task.cancelled():
+            task.exception()  # Evita "exception was never retrieved" se todos os chamadores cancelaram
+    
+    @staticmethod
+    def coalesce(fn):
+        """Decorator: chave = nome qualificado + argumentos normalizados (com defaults)"""
+        signature = inspect.signature(fn)
+        name = fn.__qualname__
         
-        if len(detected_words) >= 2:
-            return (2, detected_words)  # Risco moderado
-        elif len(detected_words) == 1:
-            return (1, detected_words)  # Risco baixo
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = (name,) + tuple(bound.arguments.items())
+            try:
+                hash(key)
+            except TypeError:
+                return await fn(*args, **kwargs)
+            return await SingleFlight.run(key, fn, *args, **kwargs)
         
-        return (0, [])  # Sem risco
+        return wrapper
+    
+    @staticmethod
+    def stats() -> Dict:
+        """Chamadas e chamadas coalescidas por função"""
+        return {
+            "in_flight": len(SingleFlight._inflight),
+            "functions": {
+                name: {**s, "coalesced_ratio": round(s["coalesced"] / s["calls"], 3) if s["calls"] else 0}
+                for name, s in SingleFlight._stats.items()
+            }
+        }
 
 
-class MemoryManager:
-    """Gerencia memórias e contexto do usuário"""
+class UserStateManager:
+    """
+    Read model desnormalizado (coleção user_state) com tudo que o contexto do prompt precisa
+    
+    Documento por usuário:
+        profile          campos do perfil usados no prompt
+        memories         últimas MEMORIES_KEPT memórias (da mais antiga para a mais recente)
+        mood_days        {"AAAA-MM-DD": {"sum", "count"}} dos últimos MOOD_WINDOW_DAYS dias
+        techniques       {técnica: {"sum", "count"}} de efetividade
+        recent_sessions  últimas SESSIONS_KEPT sessões completadas
+    
+    Atualizado incrementalmente ($inc / $push + $slice) pelos métodos de escrita.
+    Se o documento não existir, é reconstruído a partir das coleções brutas.
+    """
+    
+    MEMORIES_KEPT = 3
+    SESSIONS_KEPT = 10
+    MOOD_WINDOW_DAYS = 30
+    
+    DEFAULT_PROFILE = {
+        "display_name": "Usuário",
+        "language": "pt-BR",
+        "country": "BR",
+        "goals": [],
+        "prefers_voice": True
+    }
+    
+    @staticmethod
+    def _technique_key(technique: str) -> str:
+        """Nome da técnica seguro para caminho de campo do MongoDB"""
+        return technique.replace(".", "_").replace("$", "_")
+    
+    @staticmethod
+    def _day_key(moment: datetime) -> str:
+        return moment.strftime("%Y-%m-%d")
     
     @staticmethod
-    def get_user_context(user_id: str) -> Dict:
+    async def on_memory_saved(user_id: str, memory: Dict):
+        await user_state_collection.update_one(
+            {"user_id": user_id},
+            {
+                "$push": {"memories": {
+                    "$each": [{
+                        "summary": memory.get("summary", ""),
+                        "importance": memory.get("importance", 1),
+                        "created_at": memory["created_at"]
+                    }],
+                    "$slice": -UserStateManager.MEMORIES_KEPT
+                }},
+                "$set": {"updated_at": datetime.utcnow()}
+            },
+            upsert=True
+        )
+    
+    @staticmethod
+    async def on_mood_logged(user_id: str, mood_value: int, created_at: datetime):
+        day = UserStateManager._day_key(created_at)
+        await user_state_collection.update_one(
+            {"user_id": user_id},
+            {
+                "$inc": {f"mood_days.{day}.sum": mood_value, f"mood_days.{day}.count": 1},
+                "$set": {"updated_at": datetime.utcnow()}
+            },
+            upsert=True
+        )
+    
+    @staticmethod
+    async def on_technique_tracked(user_id: str, technique: str, effectiveness: int):
+        key = UserStateManager._technique_key(technique)
+        await user_state_collection.update_one(
+            {"user_id": user_id},
+            {
+                "$inc": {f"techniques.{key}.sum": effectiveness, f"techniques.{key}.count": 1},
+                "$set": {"updated_at": datetime.utcnow()}
+            },
+            upsert=True
+        )
+    
+    @staticmethod
+    async def on_session_logged(user_id: str, session_id: str, created_at: datetime):
+        await user_state_collection.update_one(
+            {"user_id": user_id},
+            {
+                "$push": {"recent_sessions": {
+                    "$each": [{"session_id": session_id, "created_at": created_at}],
+                    "$slice": -UserStateManager.SESSIONS_KEPT
+                }},
+                "$set": {"updated_at": datetime.utcnow()}
+            },
+            upsert=True
+        )
+    
+    @staticmethod
+    async def get_state(user_id: str) -> Dict:
         """
-        Busca contexto completo do usuário para injetar no prompt
+        Retorna o read model do usuário (um find_one)
+        Reconstrói se ainda não existir ou se foi criado por escrita parcial sem perfil
+        """
+        state = await user_state_collection.find_one({"user_id": user_id})
+        if not state or "profile" not in state:
+            return await UserStateManager.rebuild(user_id)
         
-        Returns:
-            Dict com perfil, memórias, humor, técnicas eficazes
+        # Remover dias de humor fora da janela (no máximo uma vez por dia por usuário)
+        cutoff = UserStateManager._day_key(datetime.utcnow() - timedelta(days=UserStateManager.MOOD_WINDOW_DAYS))
+        stale = [day for day in state.get("mood_days", {}) if day <= cutoff]
+        if stale:
+            await user_state_collection.update_one(
+                {"user_id": user_id},
+                {"$unset": {f"mood_days.{day}": "" for day in stale}}
+            )
+            for day in stale:
+                del state["mood_days"][day]
+        return state
+    
+    @staticmethod
+    def mood_summary(state: Dict, days: int = 7) -> Dict:
+        """
+        Média e tendência de humor dos últimos N dias a partir dos buckets diários
+        (mesma regra de MoodTracker.get_mood_trend, com granularidade de dia)
+        """
+        cutoff = UserStateManager._day_key(datetime.utcnow() - timedelta(days=days))
+        buckets = sorted(
+            ((day, b) for day, b in state.get("mood_days", {}).items() if day > cutoff),
+            reverse=True  # Mais recente primeiro
+        )
+        total = sum(b["sum"] for _, b in buckets)
+        count = sum(b["count"] for _, b in buckets)
+        
+        if not count:
+            return {"average": 0, "trend": "sem_dados", "count": 0, "days": days}
+        
+        # Tendência: primeira metade (dias mais recentes) vs segunda metade
+        mid_point = count // 2
+        if mid_point > 0:
+            first_sum = first_count = 0
+            for _, b in buckets:
+                if first_count >= mid_point:
+                    break
+                first_sum += b["sum"]
+                first_count += b["count"]
+            second_count = count - first_count
+            if second_count:
+                first_half_avg = first_sum / first_count
+                second_half_avg = (total - first_sum) / second_count
+                if second_half_avg > first_half_avg + 0.5:
+                    trend = "melhorando"
+                elif second_half_avg < first_half_avg - 0.5:
+                    trend = "piorando"
+                else:
+                    trend = "estavel"
+            else:
+                trend = "estavel"
+        else:
+            trend = "insuficiente"
+        
+        return {
+            "average": round(total / count, 1),
+            "trend": trend,
+            "count": count,
+            "days": days
+        }
+    
+    @staticmethod
+    def best_techniques(state: Dict, limit: int = 5) -> List[Dict]:
+        """Técnicas mais eficazes (mínimo 2 usos), como TechniqueTracker.get_best_techniques"""
+        ranked = sorted(
+            (
+                {"technique": name, "effectiveness": round(t["sum"] / t["count"], 1), "uses": t["count"]}
+                for name, t in state.get("techniques", {}).items()
+                if t.get("count", 0) >= 2
+            ),
+            key=lambda t: t["effectiveness"],
+            reverse=True
+        )
+        return ranked[:limit]
+    
+    @staticmethod
+    async def rebuild(user_id: str) -> Dict:
+        """
+        Reconstrói o read model do usuário a partir das coleções brutas
+        (escritas incrementais concorrentes durante a reconstrução podem ser sobrescritas)
         """
-        # Buscar perfil do usuário
-        user = users_collection.find_one({"user_id": user_id})
+        mood_cutoff = datetime.utcnow() - timedelta(days=UserStateManager.MOOD_WINDOW_DAYS)
+        
+        # Leituras independentes em paralelo
+        user, memories, mood_days, techniques, sessions = await asyncio.gather(
+            users_collection.find_one({"user_id": user_id}),
+            ai_memories_collection.find(
+                {"user_id": user_id}
+            ).sort("created_at", -1).limit(UserStateManager.MEMORIES_KEPT).to_list(UserStateManager.MEMORIES_KEPT),
+            mood_logs_collection.aggregate([
+                {"$match": {"user_id": user_id, "created_at": {"$gte": mood_cutoff}}},
+                {"$group": {
+                    "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}},
+                    "sum": {"$sum": "$mood_value"},
+                    "count": {"$sum": 1}
+                }}
+            ]).to_list(None),
+            techniques_tracking_collection.aggregate([
+                {"$match": {"user_id": user_id}},
+                {"$group": {
+                    "_id": "$technique",
+                    "sum": {"$sum": "$effectiveness"},
+                    "count": {"$sum": 1}
+                }}
+            ]).to_list(None),
+            sessions_completed_collection.find(
+                {"user_id": user_id, "completed": True}
+            ).sort("created_at", -1).limit(UserStateManager.SESSIONS_KEPT).to_list(UserStateManager.SESSIONS_KEPT)
+        )
+        
         if not user:
             # Criar usuário básico se não existir
             user = {
                 "user_id": user_id,
-                "display_name": "Usuário",
-                "language": "pt-BR",
-                "country": "BR",
-                "goals": [],
-                "prefers_voice": True,
+                **UserStateManager.DEFAULT_PROFILE,
                 "created_at": datetime.utcnow()
             }
-            users_collection.insert_one(user)
+            await users_collection.insert_one(user)
         
-        # Buscar últimas 3 memórias
-        memories = list(ai_memories_collection.find(
-            {"user_id": user_id}
-        ).sort("created_at", -1).limit(3))
+        state = {
+            "user_id": user_id,
+            "profile": {
+                key: user.get(key, default)
+                for key, default in UserStateManager.DEFAULT_PROFILE.items()
+            },
+            "memories": [
+                {"summary": m.get("summary", ""), "importance": m.get("importance", 1), "created_at": m["created_at"]}
+                for m in reversed(memories)
+            ],
+            "mood_days": {d["_id"]: {"sum": d["sum"], "count": d["count"]} for d in mood_days},
+            "techniques": {
+                UserStateManager._technique_key(t["_id"]): {"sum": t["sum"], "count": t["count"]}
+                for t in techniques if t["_id"]
+            },
+            "recent_sessions": [
+                {"session_id": s["session_id"], "created_at": s["created_at"]}
+                for s in reversed(sessions)
+            ],
+            "updated_at": datetime.utcnow()
+        }
+        await user_state_collection.replace_one({"user_id": user_id}, state, upsert=True)
+        return state
+    
+    @staticmethod
+    async def rebuild_all() -> int:
+        """Backfill: reconstrói o read model de todos os usuários conhecidos"""
+        user_ids = set()
+        for distinct_ids in await asyncio.gather(*[
+            collection.distinct("user_id")
+            for collection in (users_collection, ai_memories_collection, mood_logs_collection,
+                               techniques_tracking_collection, sessions_completed_collection)
+        ]):
+            user_ids.update(distinct_ids)
+        
+        for user_id in user_ids:
+            await UserStateManager.rebuild(user_id)
+            UserContextCache.invalidate(user_id)
+        logger.info(f"🔁 user_state reconstruído para {len(user_ids)} usuários")
+        return len(user_ids)
+
+
+class MemoryManager:
+    """Gerencia memórias e contexto do usuário"""
+    
+    # Retenção de memórias por usuário
+    MEMORY_RETENTION = int(os.getenv("MEMORY_RETENTION", "20"))
+    MEMORY_EVICTION_POLICY = os.getenv("MEMORY_EVICTION_POLICY", "importance")  # importance | recency
+    # As N mais recentes nunca são removidas (inclui a recém-salva e as do user_state)
+    MEMORY_PROTECT_NEWEST = int(os.getenv("MEMORY_PROTECT_NEWEST", str(UserStateManager.MEMORIES_KEPT)))
+    DEFAULT_IMPORTANCE = 1
+    
+    @staticmethod
+    async def get_cached_user_context(user_id: str) -> Dict:
+        """
+        Contexto do usuário via UserContextCache (busca no banco apenas em miss)
+        """
+        context = UserContextCache.get(user_id)
+        if context is not None:
+            return context
+        generation = UserContextCache.generation(user_id)
+        # A geração entra na chave: leituras iniciadas antes de uma invalidação não são reaproveitadas
+        context = await SingleFlight.run(
+            ("MemoryManager.get_user_context", user_id, generation),
+            MemoryManager.get_user_context, user_id
+        )
+        UserContextCache.set(user_id, context, generation)
+        return context
+    
+    @staticmethod
+    async def get_user_context(user_id: str) -> Dict:
+        """
+        Busca contexto completo do usuário para injetar no prompt
+        
+        Lido do read model user_state (um único find_one).
+        
+        Returns:
+            Dict com perfil, memórias, humor, técnicas eficazes
+        """
+        state = await UserStateManager.get_state(user_id)
+        user = state.get("profile", {})
         
+        # Últimas 3 memórias (armazenadas da mais antiga para a mais recente)
         memory_texts = [
             mem.get("summary", "Nenhuma memória anterior")
-            for mem in memories
-        ]
+            for mem in reversed(state.get("memories", []))
+        ][:3]
         while len(memory_texts) < 3:
             memory_texts.append("Nenhuma memória")
         
-        # Buscar humor dos últimos 7 e 30 dias
-        mood_7d = MoodTracker.get_mood_trend(user_id, days=7)
-        mood_30d = MoodTracker.get_mood_trend(user_id, days=30)
+        # Humor dos últimos 7 e 30 dias
+        mood_7d = UserStateManager.mood_summary(state, days=7)
+        mood_30d = UserStateManager.mood_summary(state, days=30)
         
-        # Buscar técnicas mais eficazes
-        best_techniques_data = TechniqueTracker.get_best_techniques(user_id, limit=3)
+        # Técnicas mais eficazes
+        best_techniques_data = UserStateManager.best_techniques(state, limit=3)
         best_techniques = ", ".join([f"{t['technique']} ({t['effectiveness']}/5)" for t in best_techniques_data]) if best_techniques_data else "Ainda descobrindo"
         
-        # Buscar sessões recentes
-        recent_sessions = SessionManager.get_recent_sessions(user_id, limit=3)
+        # Sessões recentes
+        recent_sessions = list(reversed(state.get("recent_sessions", [])))[:3]
         sessions_text = ", ".join([s["session_id"] for s in recent_sessions]) if recent_sessions else "Nenhuma sessão recente"
         
         return {
@@ -157,106 +743,87 @@ class MemoryManager:
             },
             "user_best_techniques": best_techniques,
             "sessions": {
-                "recent_list": "Nenhuma sessão recente"
+                "recent_list": sessions_text
             }
         }
     
-    @staticmethod
-    def inject_context_in_prompt(base_prompt: str, context: Dict) -> str:
-        """
-        Injeta o contexto dinâmico no prompt da Luna
-        """
-        context_section = f"""
-
-[CONTEXTO DO USUÁRIO]
-Perfil: {context['user_profile']['display_name']}, idioma {context['user_profile']['language']}, país {context['user_profile']['country']}
-Objetivos: {context['user_profile']['goals']}
-Prefere voz: {context['user_profile']['prefers_voice']}
-
-Últimas memórias:
-1) {context['ai_memories']['last_1']}
-2) {context['ai_memories']['last_2']}
-3) {context['ai_memories']['last_3']}
-
-Humor médio (7 dias): {context['user_trends']['mood_7d']}
-Técnicas mais eficazes: {context['user_best_techniques']}
-Sessões recentes: {context['sessions']['recent_list']}
-
-Use esse contexto para personalizar a conversa sem revelar dados diretamente.
-"""
-        return base_prompt + context_section
+    # Schema de saída estruturada do resumo (strict: a resposta sempre é JSON válido)
+    SUMMARY_SCHEMA = {
+        "type": "object",
+        "properties": {
+            "summary": {"type": "string"},
+            "tags": {"type": "array", "items": {"type": "string"}},
+            "techniques_worked": {"type": "array", "items": {"type": "string"}},
+            "emotions": {"type": "array", "items": {"type": "string"}},
+            "next_step": {"type": "string"},
+            "importance": {"type": "integer", "enum": [1, 2, 3]}
+        },
+        "required": ["summary", "tags", "techniques_worked", "emotions", "next_step", "importance"],
+        "additionalProperties": False
+    }
     
     @staticmethod
-    async def generate_summary(user_message: str, luna_response: str) -> Dict:
+    async def generate_batch_summary(turns: List[Dict]) -> Dict:
         """
-        Gera resumo automático da conversa usando IA
+        Gera um único resumo para um lote de turnos usando saída estruturada
+        
+        Levanta exceção em caso de falha (recusa, resposta truncada, erro da API)
+        para que os turnos permaneçam no buffer e o lote seja tentado novamente.
         
         Returns:
-            Dict com summary, tags, importance
+            Dict com summary, tags, techniques_worked, emotions, next_step, importance
         """
-        try:
-            # Criar prompt para resumo
-            summary_prompt = f"""Resuma esta conversa de forma ética e prática em até 150 caracteres:
+        conversation = "\n\n".join(
+            f"Usuário: {t['user_message'][:500]}\nLuna: {t['luna_response'][:500]}"
+            for t in turns
+        )
+        summary_prompt = f"""Resuma estes {len(turns)} turnos de conversa de forma ética e prática em até 300 caracteres:
 
-Usuário: {user_message}
-Luna: {luna_response}
+{conversation}
 
-Liste em formato JSON:
-- summary: resumo curto
-- tags: array de 2-3 tags (ex: ["ansiedade", "respiração"])
+Campos:
+- summary: resumo curto do conjunto de turnos
+- tags: 2-4 tags (ex: ["ansiedade", "respiração"])
 - techniques_worked: técnicas mencionadas que ajudaram (ex: ["4-7-8", "diário"])
+- emotions: emoções predominantes (ex: ["ansiedade", "alívio"])
 - next_step: próximo passo sugerido (curto)
 - importance: 1 (baixa), 2 (média) ou 3 (alta)
 
 Sem diagnóstico, sem PII, sem citações diretas."""
-
-            # Usar OpenAI diretamente
-            import os
-            from openai import OpenAI
-            
-            api_key = os.getenv("OPENAI_API_KEY") or os.getenv("EMERGENT_LLM_KEY")
-            client = OpenAI(api_key=api_key)
-            
-            completion = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": "Você é um assistente que gera resumos éticos e práticos de conversas terapêuticas."},
-                    {"role": "user", "content": summary_prompt}
-                ],
-                temperature=0.3,
-                max_tokens=300
-            )
-            
-            response = completion.choices[0].message.content
-            
-            # Parse JSON (simplificado)
-            import json
-            try:
-                summary_data = json.loads(response)
-            except:
-                # Fallback se JSON falhar
-                summary_data = {
-                    "summary": user_message[:100],
-                    "tags": ["conversa"],
-                    "techniques_worked": [],
-                    "next_step": "Continuar conversando",
-                    "importance": 1
+        
+        # Cliente OpenAI assíncrono compartilhado
+        from llm_client import get_llm_client
+        client = get_llm_client()
+        
+        from resilience import upstreams
+        completion = await upstreams["summary"].call(lambda: client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[
+                {"role": "system", "content": "Você é um assistente que gera resumos éticos e práticos de conversas terapêuticas."},
+                {"role": "user", "content": summary_prompt}
+            ],
+            temperature=0.3,
+            max_tokens=400,
+            response_format={
+                "type": "json_schema",
+                "json_schema": {
+                    "name": "conversation_summary",
+                    "strict": True,
+                    "schema": MemoryManager.SUMMARY_SCHEMA
                 }
-            
-            return summary_data
-            
-        except Exception as e:
-            logger.error(f"Erro ao gerar resumo: {e}")
-            return {
-                "summary": user_message[:100],
-                "tags": ["conversa"],
-                "techniques_worked": [],
-                "next_step": "Continuar",
-                "importance": 1
             }
+        ))
+        
+        choice = completion.choices[0]
+        if choice.message.refusal:
+            raise ValueError(f"Resumo recusado pelo modelo: {choice.message.refusal}")
+        if choice.finish_reason == "length":
+            raise ValueError("Resumo truncado (max_tokens)")
+        
+        return json.loads(choice.message.content)
     
     @staticmethod
-    def save_memory(user_id: str, summary_data: Dict):
+    async def save_memory(user_id: str, summary_data: Dict):
         """Salva nova memória no banco"""
         memory = {
             "user_id": user_id,
@@ -265,23 +832,78 @@ Sem diagnóstico, sem PII, sem citações diretas."""
             "techniques_worked": summary_data.get("techniques_worked", []),
             "next_step": summary_data.get("next_step", ""),
             "importance": summary_data.get("importance", 1),
+            "emotions": summary_data.get("emotions", []),
+            "turn_count": summary_data.get("turn_count", 1),
+            "period_start": summary_data.get("period_start"),
+            "period_end": summary_data.get("period_end"),
+            "trigger": summary_data.get("trigger", "turn"),
             "created_at": datetime.utcnow()
         }
-        ai_memories_collection.insert_one(memory)
+        await ai_memories_collection.insert_one(memory)
+        await UserStateManager.on_memory_saved(user_id, memory)
+        UserContextCache.invalidate(user_id)
         
-        # Manter apenas as últimas 20 memórias
-        memories = list(ai_memories_collection.find(
-            {"user_id": user_id}
-        ).sort("created_at", -1))
+        # Manter no máximo MEMORY_RETENTION memórias
+        await MemoryManager.enforce_retention(user_id)
+    
+    @staticmethod
+    async def enforce_retention(user_id: str) -> int:
+        """
+        Mantém no máximo MEMORY_RETENTION memórias por usuário
+        
+        As MEMORY_PROTECT_NEWEST mais recentes ficam sempre; entre as demais, remove o
+        excedente na ordem da política e tira as removidas do user_state.
+        Custo limitado ao tamanho da retenção (roda a cada memória salva, excedente ~1).
+        
+        Políticas (MEMORY_EVICTION_POLICY):
+            importance  menor importância primeiro (sem importance = DEFAULT_IMPORTANCE), depois mais antigas (padrão)
+            recency     apenas as mais antigas
+        """
+        excess = await ai_memories_collection.count_documents({"user_id": user_id}) - MemoryManager.MEMORY_RETENTION
+        if excess <= 0:
+            return 0
         
-        if len(memories) > 20:
-            old_memories = memories[20:]
-            for old_mem in old_memories:
-                ai_memories_collection.delete_one({"_id": old_mem["_id"]})
+        protect = min(MemoryManager.MEMORY_PROTECT_NEWEST, MemoryManager.MEMORY_RETENTION)
+        candidates = {"user_id": user_id}
+        if protect > 0:
+            boundary = await ai_memories_collection.find(
+                {"user_id": user_id}, {"created_at": 1}
+            ).sort("created_at", -1).skip(protect - 1).limit(1).to_list(1)
+            if not boundary:
+                return 0
+            candidates["created_at"] = {"$lt": boundary[0]["created_at"]}
+        
+        if MemoryManager.MEMORY_EVICTION_POLICY == "recency":
+            eviction_order = {"created_at": 1}
+        else:
+            eviction_order = {"_importance": 1, "created_at": 1}
+        victims = await ai_memories_collection.aggregate([
+            {"$match": candidates},
+            {"$addFields": {"_importance": {"$ifNull": ["$importance", MemoryManager.DEFAULT_IMPORTANCE]}}},
+            {"$sort": eviction_order},
+            {"$limit": excess},
+            {"$project": {"_id": 1, "created_at": 1}}
+        ]).to_list(excess)
+        if not victims:
+            return 0
+        
+        result = await ai_memories_collection.delete_many({"_id": {"$in": [v["_id"] for v in victims]}})
+        # O read model não pode continuar servindo memórias removidas
+        await user_state_collection.update_one(
+            {"user_id": user_id},
+            {"$pull": {"memories": {"created_at": {"$in": [v["created_at"] for v in victims]}}}}
+        )
+        return result.deleted_count
     
     @staticmethod
-    def save_conversation(user_id: str, user_message: str, luna_response: str, risk_level: int):
-        """Salva conversa no histórico"""
+    async def save_conversation(user_id: str, user_message: str, luna_response: str, risk_level: int,
+                                conversation_id=None):
+        """
+        Salva conversa no histórico
+        
+        conversation_id (gerado por quem enfileira) torna a retentativa idempotente: se uma
+        tentativa anterior foi aplicada e só a resposta se perdeu, a repetição não duplica o turno.
+        """
         conversation = {
             "user_id": user_id,
             "user_message": user_message,
@@ -289,14 +911,135 @@ Sem diagnóstico, sem PII, sem citações diretas."""
             "risk_level": risk_level,
             "created_at": datetime.utcnow()
         }
-        conversations_collection.insert_one(conversation)
+        if conversation_id is not None:
+            conversation["_id"] = conversation_id
+        try:
+            await conversations_collection.insert_one(conversation)
+        except DuplicateKeyError:
+            logger.info(f"Conversa {conversation_id} já salva por uma tentativa anterior")
+
+
+class SummaryBatcher:
+    """
+    Agrupa os turnos recentes de cada usuário e gera um único resumo por lote
+    
+    Gatilhos de resumo: número de turnos (MAX_TURNS), inatividade (IDLE_SECONDS)
+    ou fim de sessão. O buffer fica em memória no processo; os turnos originais
+    continuam salvos em conversations. Com o resumo falhando, o buffer de cada usuário
+    guarda no máximo MAX_PENDING_TURNS (os mais antigos saem primeiro).
+    """
+    
+    MAX_TURNS = int(os.getenv("SUMMARY_BATCH_MAX_TURNS", "10"))
+    IDLE_SECONDS = float(os.getenv("SUMMARY_BATCH_IDLE_SECONDS", "900"))
+    MAX_PENDING_TURNS = int(os.getenv("SUMMARY_BATCH_MAX_PENDING_TURNS", str(MAX_TURNS * 5)))
+    
+    _turns: Dict[str, List[Dict]] = {}
+    _locks: Dict[str, asyncio.Lock] = {}
+    _lock_users: Dict[str, int] = {}  # flushes segurando ou esperando o lock de cada usuário
+    _stats = {"turns_buffered": 0, "batches": 0, "turns_summarized": 0, "failures": 0, "turns_dropped": 0}
+    
+    @staticmethod
+    def add_turn(user_id: str, user_message: str, luna_response: str) -> bool:
+        """
+        Adiciona um turno ao buffer do usuário
+        
+        Returns:
+            True se o lote atingiu MAX_TURNS e deve ser resumido
+        """
+        turns = SummaryBatcher._turns.setdefault(user_id, [])
+        turns.append({
+            "user_message": user_message,
+            "luna_response": luna_response,
+            "created_at": datetime.utcnow()
+        })
+        SummaryBatcher._stats["turns_buffered"] += 1
+        overflow = len(turns) - SummaryBatcher.MAX_PENDING_TURNS
+        if overflow > 0:
+            del turns[:overflow]
+            SummaryBatcher._stats["turns_dropped"] += overflow
+            logger.warning(f"Resumo em lote: {user_id} com {len(turns)} turnos pendentes, {overflow} mais antigos descartados")
+        return len(turns) >= SummaryBatcher.MAX_TURNS
+    
+    @staticmethod
+    def pending_users() -> List[str]:
+        """Usuários com turnos ainda não resumidos"""
+        return [user_id for user_id, turns in SummaryBatcher._turns.items() if turns]
+    
+    @staticmethod
+    def idle_users() -> List[str]:
+        """Usuários sem novos turnos há mais de IDLE_SECONDS"""
+        cutoff = datetime.utcnow() - timedelta(seconds=SummaryBatcher.IDLE_SECONDS)
+        return [
+            user_id for user_id, turns in SummaryBatcher._turns.items()
+            if turns and turns[-1]["created_at"] < cutoff
+        ]
+    
+    @staticmethod
+    async def flush(user_id: str, trigger: str = "turns") -> Optional[Dict]:
+        """
+        Resume os turnos pendentes do usuário em uma única chamada e salva uma memória
+        
+        Em caso de falha a exceção é propagada e os turnos permanecem no buffer.
+        """
+        lock = SummaryBatcher._locks.setdefault(user_id, asyncio.Lock())
+        SummaryBatcher._lock_users[user_id] = SummaryBatcher._lock_users.get(user_id, 0) + 1
+        try:
+            async with lock:
+                turns = list(SummaryBatcher._turns.get(user_id, []))
+                if not turns:
+                    return None
+                
+                try:
+                    summary_data = await MemoryManager.generate_batch_summary(turns)
+                except Exception:
+                    SummaryBatcher._stats["failures"] += 1
+                    raise
+                
+                summary_data.update({
+                    "turn_count": len(turns),
+                    "period_start": turns[0]["created_at"],
+                    "period_end": turns[-1]["created_at"],
+                    "trigger": trigger
+                })
+                await MemoryManager.save_memory(user_id, summary_data)
+                
+                # Remover apenas os turnos resumidos (novos podem ter chegado, e antigos
+                # saído pelo limite, durante a chamada)
+                summarized = {id(turn) for turn in turns}
+                remaining = [turn for turn in SummaryBatcher._turns.get(user_id, []) if id(turn) not in summarized]
+                if remaining:
+                    SummaryBatcher._turns[user_id] = remaining
+                else:
+                    SummaryBatcher._turns.pop(user_id, None)
+                
+                SummaryBatcher._stats["batches"] += 1
+                SummaryBatcher._stats["turns_summarized"] += len(turns)
+                logger.info(f"🧠 Resumo em lote ({trigger}): {user_id} - {len(turns)} turnos")
+                return summary_data
+        finally:
+            # Último flush do usuário (ninguém mais segurando ou esperando): o lock sai da memória
+            users = SummaryBatcher._lock_users[user_id] - 1
+            if users:
+                SummaryBatcher._lock_users[user_id] = users
+            else:
+                SummaryBatcher._lock_users.pop(user_id, None)
+                SummaryBatcher._locks.pop(user_id, None)
+    
+    @staticmethod
+    def stats() -> Dict:
+        """Métricas do resumo em lote"""
+        return {
+            **SummaryBatcher._stats,
+            "pending_users": len(SummaryBatcher.pending_users()),
+            "pending_turns": sum(len(t) for t in SummaryBatcher._turns.values())
+        }
 
 
 class MoodTracker:
     """Gerencia registro e análise de humor do usuário"""
     
     @staticmethod
-    def log_mood(user_id: str, mood_value: int, note: str = ""):
+    async def log_mood(user_id: str, mood_value: int, note: str = ""):
         """
         Registra humor do usuário (1-5)
         1 = Muito mal, 2 = Mal, 3 = Neutro, 4 = Bem, 5 = Muito bem
@@ -307,19 +1050,22 @@ class MoodTracker:
             "note": note,
             "created_at": datetime.utcnow()
         }
-        mood_logs_collection.insert_one(mood_log)
+        await mood_logs_collection.insert_one(mood_log)
+        await UserStateManager.on_mood_logged(user_id, mood_value, mood_log["created_at"])
+        UserContextCache.invalidate(user_id)
         logger.info(f"📊 Humor registrado: {user_id} = {mood_value}/5")
     
     @staticmethod
-    def get_mood_trend(user_id: str, days: int = 7) -> Dict:
+    @SingleFlight.coalesce
+    async def get_mood_trend(user_id: str, days: int = 7) -> Dict:
         """
         Calcula tendência de humor dos últimos N dias
         """
         cutoff_date = datetime.utcnow() - timedelta(days=days)
-        mood_logs = list(mood_logs_collection.find({
+        mood_logs = await mood_logs_collection.find({
             "user_id": user_id,
             "created_at": {"$gte": cutoff_date}
-        }).sort("created_at", -1))
+        }).sort("created_at", -1).to_list(None)
         
         if not mood_logs:
             return {
@@ -366,7 +1112,7 @@ class TechniqueTracker:
     ]
     
     @staticmethod
-    def track_technique(user_id: str, technique: str, effectiveness: int, context: str = ""):
+    async def track_technique(user_id: str, technique: str, effectiveness: int, context: str = ""):
         """
         Registra uso de uma técnica e sua efetividade
         effectiveness: 1-5 (1=não ajudou, 5=ajudou muito)
@@ -378,11 +1124,14 @@ class TechniqueTracker:
             "context": context,
             "created_at": datetime.utcnow()
         }
-        techniques_tracking_collection.insert_one(tracking)
+        await techniques_tracking_collection.insert_one(tracking)
+        await UserStateManager.on_technique_tracked(user_id, tracking["technique"], effectiveness)
+        UserContextCache.invalidate(user_id)
         logger.info(f"🎯 Técnica registrada: {technique} = {effectiveness}/5")
     
     @staticmethod
-    def get_best_techniques(user_id: str, limit: int = 5) -> List[Dict]:
+    @SingleFlight.coalesce
+    async def get_best_techniques(user_id: str, limit: int = 5) -> List[Dict]:
         """
         Retorna as técnicas mais eficazes para o usuário
         """
@@ -398,7 +1147,7 @@ class TechniqueTracker:
             {"$limit": limit}
         ]
         
-        results = list(techniques_tracking_collection.aggregate(pipeline))
+        results = await techniques_tracking_collection.aggregate(pipeline).to_list(None)
         return [{
             "technique": r["_id"],
             "effectiveness": round(r["avg_effectiveness"], 1),
@@ -410,7 +1159,7 @@ class SessionManager:
     """Gerencia sessões guiadas completadas"""
     
     @staticmethod
-    def log_session(user_id: str, session_id: str, duration_seconds: int, completed: bool = True, notes: str = ""):
+    async def log_session(user_id: str, session_id: str, duration_seconds: int, completed: bool = True, notes: str = ""):
         """
         Registra uma sessão guiada completada
         """
@@ -422,17 +1171,20 @@ class SessionManager:
             "notes": notes,
             "created_at": datetime.utcnow()
         }
-        sessions_completed_collection.insert_one(session)
+        await sessions_completed_collection.insert_one(session)
+        if completed:
+            await UserStateManager.on_session_logged(user_id, session_id, session["created_at"])
+        UserContextCache.invalidate(user_id)
         logger.info(f"🧘 Sessão registrada: {session_id} ({duration_seconds}s)")
     
     @staticmethod
-    def get_recent_sessions(user_id: str, limit: int = 10) -> List[Dict]:
+    async def get_recent_sessions(user_id: str, limit: int = 10) -> List[Dict]:
         """
         Retorna sessões recentes do usuário
         """
-        sessions = list(sessions_completed_collection.find(
+        sessions = await sessions_completed_collection.find(
             {"user_id": user_id, "completed": True}
-        ).sort("created_at", -1).limit(limit))
+        ).sort("created_at", -1).limit(limit).to_list(limit)
         
         return [{
             "session_id": s["session_id"],
@@ -441,29 +1193,31 @@ class SessionManager:
         } for s in sessions]
     
     @staticmethod
-    def get_session_stats(user_id: str) -> Dict:
+    async def get_session_stats(user_id: str) -> Dict:
         """
         Estatísticas de sessões do usuário
         """
-        total = sessions_completed_collection.count_documents({
-            "user_id": user_id,
-            "completed": True
-        })
-        
-        # Últimos 7 dias
         seven_days_ago = datetime.utcnow() - timedelta(days=7)
-        recent = sessions_completed_collection.count_documents({
-            "user_id": user_id,
-            "completed": True,
-            "created_at": {"$gte": seven_days_ago}
-        })
         
         # Duração total
         pipeline = [
             {"$match": {"user_id": user_id, "completed": True}},
             {"$group": {"_id": None, "total_duration": {"$sum": "$duration_seconds"}}}
         ]
-        duration_result = list(sessions_completed_collection.aggregate(pipeline))
+        
+        # Total, últimos 7 dias e duração em paralelo
+        total, recent, duration_result = await asyncio.gather(
+            sessions_completed_collection.count_documents({
+                "user_id": user_id,
+                "completed": True
+            }),
+            sessions_completed_collection.count_documents({
+                "user_id": user_id,
+                "completed": True,
+                "created_at": {"$gte": seven_days_ago}
+            }),
+            sessions_completed_collection.aggregate(pipeline).to_list(None)
+        )
         total_duration = duration_result[0]["total_duration"] if duration_result else 0
         
         return {
@@ -477,7 +1231,7 @@ class JournalManager:
     """Gerencia entradas de diário"""
     
     @staticmethod
-    def create_entry(user_id: str, title: str, content: str, mood: int, tags: List[str] = None):
+    async def create_entry(user_id: str, title: str, content: str, mood: int, tags: List[str] = None):
         """
         Cria nova entrada de diário
         """
@@ -490,12 +1244,12 @@ class JournalManager:
             "created_at": datetime.utcnow(),
             "updated_at": datetime.utcnow()
         }
-        result = journal_entries_collection.insert_one(entry)
+        result = await journal_entries_collection.insert_one(entry)
         logger.info(f"📓 Entrada de diário criada: {title}")
         return str(result.inserted_id)
     
     @staticmethod
-    def get_entries(user_id: str, limit: int = 20, tag: str = None) -> List[Dict]:
+    async def get_entries(user_id: str, limit: int = 20, tag: str = None) -> List[Dict]:
         """
         Busca entradas de diário do usuário
         """
@@ -503,7 +1257,7 @@ class JournalManager:
         if tag:
             query["tags"] = tag
         
-        entries = list(journal_entries_collection.find(query).sort("created_at", -1).limit(limit))
+        entries = await journal_entries_collection.find(query).sort("created_at", -1).limit(limit).to_list(limit)
         
         return [{
             "id": str(e["_id"]),
@@ -515,7 +1269,7 @@ class JournalManager:
         } for e in entries]
     
     @staticmethod
-    def get_common_tags(user_id: str, limit: int = 10) -> List[Dict]:
+    async def get_common_tags(user_id: str, limit: int = 10) -> List[Dict]:
         """
         Retorna tags mais usadas pelo usuário
         """
@@ -527,7 +1281,7 @@ class JournalManager:
             {"$limit": limit}
         ]
         
-        results = list(journal_entries_collection.aggregate(pipeline))
+        results = await journal_entries_collection.aggregate(pipeline).to_list(None)
         return [{"tag": r["_id"], "count": r["count"]} for r in results]
 
 
@@ -538,12 +1292,13 @@ class SubscriptionManager:
     """Gerencia assinaturas e status premium (preparado para RevenueCat)"""
     
     @staticmethod
-    def check_premium_status(user_id: str) -> Dict:
+    @SingleFlight.coalesce
+    async def check_premium_status(user_id: str) -> Dict:
         """
         Verifica se usuário tem acesso premium
         Por enquanto, todos têm acesso (preparado para RevenueCat)
         """
-        user = users_collection.find_one({"user_id": user_id})
+        user = await users_collection.find_one({"user_id": user_id})
         
         if not user:
             return {
@@ -570,7 +1325,7 @@ class SubscriptionManager:
         }
     
     @staticmethod
-    def log_subscription_event(user_id: str, event_type: str, details: Dict):
+    async def log_subscription_event(user_id: str, event_type: str, details: Dict):
         """
         Registra eventos de assinatura (compra, cancelamento, renovação)
         Preparado para integração com RevenueCat webhooks
@@ -581,7 +1336,7 @@ class SubscriptionManager:
             "details": details,
             "created_at": datetime.utcnow()
         }
-        db.subscription_events.insert_one(event)
+        await db.subscription_events.insert_one(event)
         logger.info(f"💸 Subscription event: {user_id} - {event_type}")
 
 
@@ -589,35 +1344,12 @@ class AnalyticsManager:
     """Gerencia analytics agregados e anônimos para admin"""
     
     @staticmethod
-    def get_global_stats() -> Dict:
+    async def get_global_stats() -> Dict:
         """
         Estatísticas globais da plataforma (anônimas e agregadas)
         """
-        from datetime import datetime, timedelta
-        
-        # Total de usuários
-        total_users = users_collection.count_documents({})
-        
-        # Usuários ativos (últimos 7 dias)
         seven_days_ago = datetime.utcnow() - timedelta(days=7)
-        active_users_7d = conversations_collection.distinct("user_id", {
-            "created_at": {"$gte": seven_days_ago}
-        })
-        
-        # Total de conversas
-        total_conversations = conversations_collection.count_documents({})
-        
-        # Total de sessões guiadas
-        total_sessions = sessions_completed_collection.count_documents({"completed": True})
-        
-        # Total de entradas de diário
-        total_journal_entries = journal_entries_collection.count_documents({})
-        
-        # Eventos de risco (últimos 30 dias)
         thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        risk_events_30d = risk_events_collection.count_documents({
-            "created_at": {"$gte": thirty_days_ago}
-        })
         
         # Distribuição de humor médio
         mood_pipeline = [
@@ -627,7 +1359,29 @@ class AnalyticsManager:
                 "total_logs": {"$sum": 1}
             }}
         ]
-        mood_result = list(mood_logs_collection.aggregate(mood_pipeline))
+        
+        # Contagens independentes em paralelo
+        (
+            total_users,            # Total de usuários
+            active_users_7d,        # Usuários ativos (últimos 7 dias)
+            total_conversations,    # Total de conversas
+            total_sessions,         # Total de sessões guiadas
+            total_journal_entries,  # Total de entradas de diário
+            risk_events_30d,        # Eventos de risco (últimos 30 dias)
+            mood_result
+        ) = await asyncio.gather(
+            users_collection.count_documents({}),
+            conversations_collection.distinct("user_id", {
+                "created_at": {"$gte": seven_days_ago}
+            }),
+            conversations_collection.count_documents({}),
+            sessions_completed_collection.count_documents({"completed": True}),
+            journal_entries_collection.count_documents({}),
+            risk_events_collection.count_documents({
+                "created_at": {"$gte": thirty_days_ago}
+            }),
+            mood_logs_collection.aggregate(mood_pipeline).to_list(None)
+        )
         avg_mood = mood_result[0]["avg_mood"] if mood_result else 0
         
         return {
@@ -649,7 +1403,7 @@ class AnalyticsManager:
         }
     
     @staticmethod
-    def get_popular_sessions() -> List[Dict]:
+    async def get_popular_sessions() -> List[Dict]:
         """
         Sessões guiadas mais populares
         """
@@ -664,7 +1418,7 @@ class AnalyticsManager:
             {"$limit": 10}
         ]
         
-        results = list(sessions_completed_collection.aggregate(pipeline))
+        results = await sessions_completed_collection.aggregate(pipeline).to_list(None)
         return [{
             "session_id": r["_id"],
             "completions": r["count"],
@@ -672,7 +1426,7 @@ class AnalyticsManager:
         } for r in results]
     
     @staticmethod
-    def get_mood_distribution() -> Dict:
+    async def get_mood_distribution() -> Dict:
         """
         Distribuição de humor na plataforma
         """
@@ -684,7 +1438,7 @@ class AnalyticsManager:
             {"$sort": {"_id": 1}}
         ]
         
-        results = list(mood_logs_collection.aggregate(pipeline))
+        results = await mood_logs_collection.aggregate(pipeline).to_list(None)
         distribution = {r["_id"]: r["count"] for r in results}
         
         return {
@@ -697,7 +1451,7 @@ class SOSManager:
     """Gerencia protocolo SOS aprimorado"""
     
     @staticmethod
-    def trigger_sos(user_id: str, location: Dict = None, notes: str = ""):
+    async def trigger_sos(user_id: str, location: Dict = None, notes: str = ""):
         """
         Aciona protocolo SOS completo
         """
@@ -710,10 +1464,10 @@ class SOSManager:
             "created_at": datetime.utcnow()
         }
         
-        result = db.sos_events.insert_one(sos_event)
+        result = await db.sos_events.insert_one(sos_event)
         
         # Também registrar como evento de risco crítico
-        RiskEventManager.save_risk_event(
+        await RiskEventManager.save_risk_event(
             user_id,
             risk_level=4,
             detected_words=["SOS_BUTTON"],
@@ -723,6 +1477,44 @@ class SOSManager:
         logger.warning(f"🆘 SOS ACIONADO: {user_id}")
         
         return str(result.inserted_id)
+    
+    @staticmethod
+    async def get_emergency_contacts(user_id: str) -> List[Dict]:
+        """
+        Busca contatos de emergência do usuário
+        """
+        user = await users_collection.find_one({"user_id": user_id})
+        return user.get("sos_contacts", []) if user else []
+    
+    @staticmethod
+    async def add_emergency_contact(user_id: str, name: str, phone: str):
+        """
+        Adiciona contato de emergência
+        """
+        await users_collection.update_one(
+            {"user_id": user_id},
+            {"$push": {"sos_contacts": {"name": name, "phone": phone}}},
+            upsert=True
+        )
+        UserContextCache.invalidate(user_id)
+        logger.info(f"📞 Emergency contact added for {user_id}")
+    
+    @staticmethod
+    async def get_sos_history(user_id: str, limit: int = 10) -> List[Dict]:
+        """
+        Histórico de eventos SOS do usuário
+        """
+        events = await db.sos_events.find(
+            {"user_id": user_id}
+        ).sort("created_at", -1).limit(limit).to_list(limit)
+        
+        return [{
+            "id": str(e["_id"]),
+            "type": e["type"],
+            "status": e.get("status", "active"),
+            "date": e["created_at"].isoformat(),
+            "notes": e.get("notes", "")
+        } for e in events]
 
 
 class AudioManager:
@@ -792,9 +1584,12 @@ class AudioManager:
         }
     
     @staticmethod
-    def get_sos_audio_config() -> Dict:
+    def get_sos_audio_config(lang: str) -> Dict:
         """
         Configuração de áudio para protocolo SOS
+
+        Args:
+            lang: idioma (já normalizado) da mensagem de segurança falada
         """
         return {
             "track": "deep_piano.mp3",
@@ -804,11 +1599,13 @@ class AudioManager:
             "fade_out": 3.0,
             "ducking": True,
             "visualization": "orb_breathing_slow",
-            "breathing_cycle": 3.0  # 3 segundos por ciclo
+            "breathing_cycle": 3.0,  # 3 segundos por ciclo
+            # Mensagem de segurança falada, pré-renderizada (toca mesmo com o TTS fora)
+            "voice": f"/api/tts/static/crisis?lang={lang}"
         }
     
     @staticmethod
-    def log_audio_event(user_id: str, event_type: str, track: str, context: str = ""):
+    async def log_audio_event(user_id: str, event_type: str, track: str, context: str = ""):
         """
         Registra evento de áudio para analytics
         """
@@ -819,7 +1616,7 @@ class AudioManager:
             "context": context,
             "created_at": datetime.utcnow()
         }
-        db.audio_events.insert_one(event)
+        await db.audio_events.insert_one(event)
         logger.info(f"🎵 Audio event: {user_id} - {event_type} - {track}")
     
     @staticmethod
@@ -903,49 +1700,11 @@ class AudioManager:
             "reason": f"Recomendado para {emotion}"
         }
 
-    
-    @staticmethod
-    def get_emergency_contacts(user_id: str) -> List[Dict]:
-        """
-        Busca contatos de emergência do usuário
-        """
-        user = users_collection.find_one({"user_id": user_id})
-        return user.get("sos_contacts", []) if user else []
-    
-    @staticmethod
-    def add_emergency_contact(user_id: str, name: str, phone: str):
-        """
-        Adiciona contato de emergência
-        """
-        users_collection.update_one(
-            {"user_id": user_id},
-            {"$push": {"sos_contacts": {"name": name, "phone": phone}}},
-            upsert=True
-        )
-        logger.info(f"📞 Emergency contact added for {user_id}")
-    
-    @staticmethod
-    def get_sos_history(user_id: str, limit: int = 10) -> List[Dict]:
-        """
-        Histórico de eventos SOS do usuário
-        """
-        events = list(db.sos_events.find(
-            {"user_id": user_id}
-        ).sort("created_at", -1).limit(limit))
-        
-        return [{
-            "id": str(e["_id"]),
-            "type": e["type"],
-            "status": e.get("status", "active"),
-            "date": e["created_at"].isoformat(),
-            "notes": e.get("notes", "")
-        } for e in events]
-
 class RiskEventManager:
     """Gerencia eventos de risco"""
     
     @staticmethod
-    def save_risk_event(user_id: str, risk_level: int, detected_words: List[str], message: str):
+    async def save_risk_event(user_id: str, risk_level: int, detected_words: List[str], message: str):
         """Salva evento de risco no banco"""
         if risk_level >= 2:  # Apenas moderado ou superior
             risk_event = {
@@ -959,14 +1718,225 @@ class RiskEventManager:
                 },
                 "created_at": datetime.utcnow()
             }
-            risk_events_collection.insert_one(risk_event)
+            await risk_events_collection.insert_one(risk_event)
             logger.warning(f"⚠️  Risco nível {risk_level} detectado para usuário {user_id}")
 
 
-def get_enhanced_system_prompt(user_id: str, base_prompt: str) -> str:
+def _score_risk_batch(rows: List[Tuple]) -> Tuple[Optional[str], List[Tuple], Dict[int, int]]:
+    """
+    Pontua um lote de (conversation_id, mensagem) em um processo worker
+    
+    Returns:
+        (versão do léxico, sinalizados [(id, nível, palavras)] com nível ≥ 2, contagem por nível)
+    """
+    flagged = []
+    levels: Dict[int, int] = {}
+    for conversation_id, message in rows:
+        level, words = RiskDetector.detect_risk(message or "")
+        levels[level] = levels.get(level, 0) + 1
+        if level >= 2:
+            flagged.append((conversation_id, level, words))
+    return risk_lexicon.version, flagged, levels
+
+
+class RiskRescanManager:
+    """
+    Re-varredura offline de conversations com o léxico de risco atual
+    
+    Lê as conversas em lotes grandes por _id (preferindo secundários), pontua em um
+    pool de processos com RiskDetector e grava os sinalizados em risk_events com
+    upserts em massa por conversation_id (idempotente). Turnos cujo risk_level salvo
+    já gerou evento ao vivo (≥ 2) no mesmo nível ou acima são pulados: o evento ao vivo
+    não tem conversation_id e seria duplicado. O progresso fica em
+    risk_rescan_checkpoints, então uma execução interrompida continua de onde parou.
+    """
+    
+    BATCH_SIZE = int(os.getenv("RISK_RESCAN_BATCH_SIZE", "5000"))
+    CHUNK_SIZE = int(os.getenv("RISK_RESCAN_CHUNK_SIZE", "1000"))
+    WORKERS = int(os.getenv("RISK_RESCAN_WORKERS", str(os.cpu_count() or 2)))
+    # Pausa entre lotes para limitar a carga no banco compartilhado com a API
+    PAUSE_SECONDS = float(os.getenv("RISK_RESCAN_PAUSE_SECONDS", "0"))
+    
+    @staticmethod
+    def default_job() -> str:
+        return f"lexicon-{risk_lexicon.version}"
+    
+    @staticmethod
+    async def get_checkpoint(job: str) -> Optional[Dict]:
+        return await db.risk_rescan_checkpoints.find_one({"_id": job})
+    
+    @staticmethod
+    def _upsert(doc: Dict, level: int, words: List[str], lexicon_version: Optional[str], job: str) -> UpdateOne:
+        now = datetime.utcnow()
+        return UpdateOne(
+            {"conversation_id": doc["_id"]},
+            {
+                "$set": {
+                    "user_id": doc.get("user_id"),
+                    "type": "keyword_flag",
+                    "level": level,
+                    "details": {
+                        "matched": words,
+                        "source": "rescan",
+                        "message_preview": (doc.get("user_message") or "")[:100],
+                        "lexicon_version": lexicon_version,
+                        "job": job
+                    },
+                    "rescanned_at": now
+                },
+                "$setOnInsert": {"created_at": doc.get("created_at") or now}
+            },
+            upsert=True
+        )
+    
+    @staticmethod
+    async def run(job: Optional[str] = None, restart: bool = False, batch_size: Optional[int] = None,
+                  workers: Optional[int] = None, limit: Optional[int] = None) -> Dict:
+        """
+        Executa (ou retoma) a re-varredura
+        
+        Args:
+            job: nome do checkpoint (padrão: versão atual do léxico)
+            restart: ignora o checkpoint existente e começa do início
+            limit: para depois de aproximadamente N conversas (o checkpoint permite continuar)
+        """
+        job = job or RiskRescanManager.default_job()
+        batch_size = batch_size or RiskRescanManager.BATCH_SIZE
+        workers = workers or RiskRescanManager.WORKERS
+        chunk_size = RiskRescanManager.CHUNK_SIZE
+        
+        state = None if restart else await RiskRescanManager.get_checkpoint(job)
+        last_id = state["last_id"] if state else None
+        totals = {
+            key: (state or {}).get(key, 0)
+            for key in ("scanned", "flagged", "already_flagged", "upserted", "modified")
+        }
+        levels = {str(k): v for k, v in ((state or {}).get("levels") or {}).items()}
+        started = time.monotonic()
+        scanned_now = 0
+        
+        source = get_database().get_collection(
+            "conversations", read_preference=ReadPreference.SECONDARY_PREFERRED
+        )
+        query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+        cursor = source.find(query, {"user_id": 1, "user_message": 1, "risk_level": 1, "created_at": 1}) \
+            .sort("_id", 1).batch_size(batch_size)
+        
+        logger.info(f"🔎 Re-varredura de risco '{job}' iniciada (retomando de {last_id}, {workers} workers)")
+        loop = asyncio.get_running_loop()
+        # spawn: o processo pai tem threads (Motor, fachada síncrona), fork não é seguro
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            batch = await cursor.to_list(batch_size)
+            while batch:
+                # Busca o próximo lote enquanto o atual é pontuado
+                done = limit is not None and scanned_now + len(batch) >= limit
+                next_batch = None if done else asyncio.ensure_future(cursor.to_list(batch_size))
+                
+                docs = {doc["_id"]: doc for doc in batch}
+                rows = [(doc["_id"], doc.get("user_message")) for doc in batch]
+                results = await asyncio.gather(*(
+                    loop.run_in_executor(pool, _score_risk_batch, rows[i:i + chunk_size])
+                    for i in range(0, len(rows), chunk_size)
+                ))
+                
+                operations = []
+                for lexicon_version, flagged, chunk_levels in results:
+                    for level, count in chunk_levels.items():
+                        levels[str(level)] = levels.get(str(level), 0) + count
+                    for conversation_id, level, words in flagged:
+                        stored_level = docs[conversation_id].get("risk_level") or 0
+                        if stored_level >= 2 and stored_level >= level:
+                            totals["already_flagged"] += 1
+                            continue
+                        operations.append(RiskRescanManager._upsert(
+                            docs[conversation_id], level, words, lexicon_version, job
+                        ))
+                
+                if operations:
+                    result = await risk_events_collection.bulk_write(operations, ordered=False)
+                    totals["upserted"] += result.upserted_count
+                    totals["modified"] += result.modified_count
+                totals["flagged"] += len(operations)
+                totals["scanned"] += len(batch)
+                scanned_now += len(batch)
+                last_id = batch[-1]["_id"]
+                
+                await db.risk_rescan_checkpoints.update_one(
+                    {"_id": job},
+                    {"$set": {**totals, "levels": levels, "last_id": last_id,
+                              "lexicon_version": risk_lexicon.version, "updated_at": datetime.utcnow()},
+                     "$setOnInsert": {"started_at": datetime.utcnow()}},
+                    upsert=True
+                )
+                
+                if next_batch is None:
+                    break
+                if RiskRescanManager.PAUSE_SECONDS:
+                    await asyncio.sleep(RiskRescanManager.PAUSE_SECONDS)
+                batch = await next_batch
+        
+        elapsed = time.monotonic() - started
+        summary = {
+            "job": job,
+            **totals,
+            "levels": levels,
+            "last_id": str(last_id) if last_id is not None else None,
+            "scanned_this_run": scanned_now,
+            "elapsed_seconds": round(elapsed, 1),
+            "rate_per_second": round(scanned_now / elapsed) if elapsed else 0,
+            "completed": limit is None or scanned_now < limit
+        }
+        logger.info(f"🔎 Re-varredura de risco '{job}': {summary}")
+        return summary
+
+
+class _SyncProxy:
+    """Expõe os métodos assíncronos de uma classe/função do orchestrator como chamadas bloqueantes"""
+    
+    def __init__(self, facade: "SyncFacade", target):
+        self._facade = facade
+        self._target = target
+    
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if asyncio.iscoroutinefunction(attr):
+            return lambda *args, **kwargs: self._facade.run(attr(*args, **kwargs))
+        return attr
+    
+    def __call__(self, *args, **kwargs):
+        result = self._target(*args, **kwargs)
+        if asyncio.iscoroutine(result):
+            return self._facade.run(result)
+        return result
+
+
+class SyncFacade:
     """
-    Função principal: retorna prompt da Luna com contexto do usuário injetado
+    Fachada síncrona para scripts e backfills
+    
+    Executa as corrotinas em um event loop dedicado (thread própria), então pode ser
+    usada fora de qualquer loop. Ex:
+        from orchestrator import sync
+        sync.MoodTracker.get_mood_trend("user_1", 7)
+        sync.UserStateManager.rebuild_all()
     """
-    context = MemoryManager.get_user_context(user_id)
-    enhanced_prompt = MemoryManager.inject_context_in_prompt(base_prompt, context)
-    return enhanced_prompt
+    
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+    
+    def run(self, coro):
+        """Executa a corrotina no loop da fachada e aguarda o resultado"""
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="orchestrator-sync", daemon=True).start()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+    
+    def __getattr__(self, name):
+        if name.startswith("_") or name not in globals():
+            raise AttributeError(name)
+        return _SyncProxy(self, globals()[name])
+
+
+sync = SyncFacade()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Pré-renderiza o áudio das frases fixas (crise/SOS, apêndice de crise, fallback) no bundle
+
+Rodar no deploy para que o servidor já suba com o áudio pronto; só sintetiza o que
+falta (textos novos ou alterados) e remove os arquivos de textos que saíram.
+
+Uso:
+    python prerender_audio.py                  # bundle em TTS_BUNDLE_DIR
+    TTS_BUNDLE_DIR=/srv/easemind/tts python prerender_audio.py
+"""
+
+import asyncio
+import logging
+import sys
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from llm_client import init_llm_client, close_llm_client  # noqa: E402
+from prompting import prompt_templates  # noqa: E402
+from speech_pipeline import prerender_static_audio  # noqa: E402
+from tts_bundle import audio_bundle  # noqa: E402
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def run() -> dict:
+    await init_llm_client()
+    try:
+        audio_bundle.load()
+        return await prerender_static_audio(prompt_templates.static_phrases())
+    finally:
+        await close_llm_client()
+
+
+def main():
+    summary = asyncio.run(run())
+    logger.info(f"Static audio bundle at {audio_bundle.directory}: {summary}")
+    if summary["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+"""
+EaseMind Prompting - Templates de prompt por idioma e montagem com orçamento de tokens
+Pré-compila um system prompt por idioma no startup (parte estática primeiro, contexto
+do usuário por último, para aproveitar o cache de prefixo do provedor), conta tokens
+localmente (tiktoken), aplica um orçamento configurável de entrada descartando os
+turnos mais antigos do histórico e registra métricas por requisição.
+
+O tiktoken baixa o arquivo BPE na primeira carga (sem TIKTOKEN_CACHE_DIR pré-populado):
+a carga roda numa thread em segundo plano e, até terminar, conta-se por caracteres.
+"""
+
+import os
+import logging
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PROMPT_MODEL = os.getenv("PROMPT_MODEL", "gpt-4o-mini")
+PROMPT_INPUT_TOKEN_BUDGET = int(os.getenv("PROMPT_INPUT_TOKEN_BUDGET", "6000"))
+PROMPT_METRICS_WINDOW = int(os.getenv("PROMPT_METRICS_WINDOW", "1000"))
+PROMPT_DEFAULT_LANGUAGE = os.getenv("PROMPT_DEFAULT_LANGUAGE", "pt-BR")
+# Quanto o startup espera pelo tokenizer antes de seguir com a estimativa
+PROMPT_TOKENIZER_TIMEOUT = float(os.getenv("PROMPT_TOKENIZER_TIMEOUT", "10"))
+
+PROMPTS_DIR = Path(__file__).parent / "prompts"
+SUPPORTED_LANGUAGES = ("en", "pt-BR", "es")
+
+# Overhead aproximado do formato de chat (por mensagem e para o início da resposta)
+TOKENS_PER_MESSAGE = 3
+TOKENS_REPLY_PRIMING = 3
+
+_encoding = None
+_encoding_loaded = threading.Event()
+_encoding_loader: Optional[threading.Thread] = None
+_encoding_lock = threading.Lock()
+
+
+def _load_encoding():
+    global _encoding
+    try:
+        import tiktoken
+        try:
+            _encoding = tiktoken.encoding_for_model(PROMPT_MODEL)
+        except KeyError:
+            _encoding = tiktoken.get_encoding("o200k_base")
+    except Exception as e:  # tiktoken ausente ou sem acesso ao arquivo BPE
+        logger.warning(f"tiktoken unavailable, using character-based token estimate: {e}")
+    finally:
+        _encoding_loaded.set()
+
+
+def load_tokenizer(timeout: float = 0) -> bool:
+    """
+    Inicia (uma vez) a carga do tiktoken em segundo plano e espera até timeout
+
+    Returns:
+        True se o tokenizer já está disponível
+    """
+    global _encoding_loader
+    with _encoding_lock:
+        if _encoding_loader is None:
+            _encoding_loader = threading.Thread(target=_load_encoding, name="tiktoken-loader", daemon=True)
+            _encoding_loader.start()
+    if timeout > 0:
+        _encoding_loaded.wait(timeout)
+    return _encoding is not None
+
+
+def count_tokens(text: str) -> int:
+    """Número de tokens do texto (estimativa de 4 caracteres/token enquanto o tiktoken não carregou)"""
+    if not text:
+        return 0
+    if load_tokenizer():
+        return len(_encoding.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+
+def message_tokens(message: Dict) -> int:
+    return TOKENS_PER_MESSAGE + count_tokens(message.get("content") or "")
+
+
+class PromptMetrics:
+    """Janela deslizante dos tokens de entrada por requisição"""
+
+    def __init__(self, window: int = PROMPT_METRICS_WINDOW):
+        self._totals = deque(maxlen=window)
+        self._requests = 0
+        self._history_dropped = 0
+        self._billed_prompt_tokens = 0
+        self._cached_prompt_tokens = 0
+
+    def record(self, stats: Dict):
+        self._totals.append(stats["total_tokens"])
+        self._requests += 1
+        self._history_dropped += stats["history_dropped"]
+
+    def record_usage(self, usage) -> Tuple[int, int]:
+        """
+        Registra o uso reportado pelo provedor
+
+        Returns:
+            (prompt_tokens, cached_tokens) da requisição
+        """
+        if usage is None:
+            return 0, 0
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = (getattr(details, "cached_tokens", 0) or 0) if details else 0
+        self._billed_prompt_tokens += usage.prompt_tokens
+        self._cached_prompt_tokens += cached
+        return usage.prompt_tokens, cached
+
+    def stats(self) -> Dict:
+        totals = sorted(self._totals)
+        if not totals:
+            return {"requests": 0}
+        billed = self._billed_prompt_tokens
+        return {
+            "requests": self._requests,
+            "history_messages_dropped": self._history_dropped,
+            "provider_prompt_tokens": billed,
+            "provider_cached_tokens": self._cached_prompt_tokens,
+            "provider_uncached_tokens": billed - self._cached_prompt_tokens,
+            "prefix_cache_ratio": round(self._cached_prompt_tokens / billed, 3) if billed else 0,
+            "budget": PROMPT_INPUT_TOKEN_BUDGET,
+            "tokenizer": "tiktoken" if _encoding is not None else "estimate",
+            "avg_tokens": round(sum(totals) / len(totals)),
+            "p50_tokens": totals[len(totals) // 2],
+            "p99_tokens": totals[min(len(totals) - 1, int(len(totals) * 0.99))],
+            "max_tokens": totals[-1]
+        }
+
+
+prompt_metrics = PromptMetrics()
+
+
+def normalize_language(lang: Optional[str]) -> str:
+    """Mapeia o lang da requisição (en, pt, pt-br, es-ES...) para um idioma suportado"""
+    code = (lang or "").strip().lower()
+    if code.startswith("pt"):
+        return "pt-BR"
+    if code.startswith("es"):
+        return "es"
+    if code.startswith("en"):
+        return "en"
+    return PROMPT_DEFAULT_LANGUAGE
+
+
+class PromptTemplates:
+    """
+    System prompts pré-compilados por idioma
+
+    Cada prompt é montado como duas mensagens de sistema: a parte estática
+    (idêntica byte a byte entre requisições do mesmo idioma, prefixo cacheável)
+    e a parte dinâmica com o contexto do usuário, sempre por último.
+    """
+
+    def __init__(self, directory: Path = PROMPTS_DIR):
+        self.directory = directory
+        self._system: Dict[str, Dict] = {}
+        self._context: Dict[str, str] = {}
+        self._crisis: Dict[str, str] = {}
+        self._history_dropped: Dict[str, str] = {}
+        # Textos fixos devolvidos pelo chat; também pré-renderizados em áudio pelo tts_bundle
+        self._crisis_appendix: Dict[str, str] = {}
+        self._fallback: Dict[str, str] = {}
+        self._static_tokens: Dict[str, int] = {}
+
+    def load(self) -> "PromptTemplates":
+        for lang in SUPPORTED_LANGUAGES:
+            system_prompt = (self.directory / f"system_prompt.{lang}.txt").read_text(encoding="utf-8").rstrip("\n")
+            self._system[lang] = {"role": "system", "content": system_prompt}
+            self._context[lang] = (self.directory / f"context.{lang}.txt").read_text(encoding="utf-8").rstrip("\n")
+            self._crisis[lang] = (self.directory / f"crisis.{lang}.txt").read_text(encoding="utf-8").rstrip("\n")
+            self._history_dropped[lang] = (self.directory / f"history_dropped.{lang}.txt").read_text(encoding="utf-8").rstrip("\n")
+            self._crisis_appendix[lang] = (self.directory / f"crisis_appendix.{lang}.txt").read_text(encoding="utf-8").strip()
+            self._fallback[lang] = (self.directory / f"fallback.{lang}.txt").read_text(encoding="utf-8").strip()
+            self._static_tokens[lang] = message_tokens(self._system[lang])
+        logger.info(f"Prompt templates compiled: {self._static_tokens}")
+        return self
+
+    def system_prompt(self, lang: str) -> str:
+        return self._system[normalize_language(lang)]["content"]
+
+    def crisis_response(self, lang: str) -> str:
+        """Resposta de segurança pré-renderizada do idioma (caminho rápido de crise)"""
+        return self._crisis[normalize_language(lang)]
+
+    def crisis_appendix(self, lang: str) -> str:
+        """Recursos de ajuda anexados à resposta do LLM em mensagens de crise (com a separação)"""
+        return "\n\n" + self._crisis_appendix[normalize_language(lang)]
+
+    def fallback_response(self, lang: str) -> str:
+        """Resposta fixa quando o LLM falha"""
+        return self._fallback[normalize_language(lang)]
+
+    def history_dropped_note(self, lang: Optional[str], dropped: int) -> str:
+        """Aviso ao modelo de que turnos antigos do histórico ficaram de fora"""
+        return self._history_dropped[normalize_language(lang)].format(dropped=dropped)
+
+    def render_context(self, lang: str, context: Dict) -> str:
+        """Parte dinâmica: contexto do usuário no template do idioma"""
+        return self._context[normalize_language(lang)].format(
+            display_name=context["user_profile"]["display_name"],
+            language=context["user_profile"]["language"],
+            country=context["user_profile"]["country"],
+            goals=context["user_profile"]["goals"],
+            prefers_voice=context["user_profile"]["prefers_voice"],
+            memory_1=context["ai_memories"]["last_1"],
+            memory_2=context["ai_memories"]["last_2"],
+            memory_3=context["ai_memories"]["last_3"],
+            mood_7d=context["user_trends"]["mood_7d"],
+            best_techniques=context["user_best_techniques"],
+            recent_sessions=context["sessions"]["recent_list"]
+        )
+
+    def system_messages(self, lang: str, context: Optional[Dict] = None) -> List[Dict]:
+        """Mensagens de sistema: prefixo estático do idioma + contexto dinâmico (se houver)"""
+        messages = [self._system[normalize_language(lang)]]
+        if context:
+            messages.append({"role": "system", "content": self.render_context(lang, context)})
+        return messages
+
+    def static_phrases(self) -> Dict[str, Dict[str, str]]:
+        """Frases fixas faladas pela Luna: frase → idioma → texto (fonte do bundle de áudio)"""
+        return {
+            "crisis": dict(self._crisis),
+            "crisis_appendix": dict(self._crisis_appendix),
+            "fallback": dict(self._fallback)
+        }
+
+    def stats(self) -> Dict:
+        return {"languages": list(self._system), "static_prefix_tokens": self._static_tokens}
+
+
+prompt_templates = PromptTemplates().load()
+
+
+def assemble_messages(system_messages: List[Dict], history: List[Dict], user_message: str,
+                      budget: int = PROMPT_INPUT_TOKEN_BUDGET, lang: Optional[str] = None) -> Tuple[List[Dict], Dict]:
+    """
+    Monta o array de mensagens respeitando o orçamento de tokens de entrada
+
+    As mensagens de sistema e a mensagem atual sempre entram. O histórico é incluído do
+    turno mais recente para o mais antigo até o orçamento acabar; os turnos
+    mais antigos que não couberem são descartados e sinalizados ao modelo.
+
+    Returns:
+        (messages, stats) com a contagem de tokens por parte da requisição
+    """
+    current_message = {"role": "user", "content": user_message}
+
+    history_messages = [
+        {"role": m["role"], "content": m["content"]}
+        for m in history
+        if m.get("role") in ["user", "assistant"] and m.get("content")
+    ]
+
+    system_tokens = sum(message_tokens(m) for m in system_messages)
+    current_tokens = message_tokens(current_message)
+    remaining = budget - system_tokens - current_tokens - TOKENS_REPLY_PRIMING
+
+    kept: List[Dict] = []
+    history_tokens = 0
+    for msg in reversed(history_messages):
+        tokens = message_tokens(msg)
+        if tokens > remaining:
+            break
+        kept.append(msg)
+        history_tokens += tokens
+        remaining -= tokens
+    kept.reverse()
+    dropped = len(history_messages) - len(kept)
+
+    messages = list(system_messages)
+    if dropped:
+        note = {"role": "system", "content": prompt_templates.history_dropped_note(lang, dropped)}
+        messages.append(note)
+        history_tokens += message_tokens(note)
+    messages.extend(kept)
+    messages.append(current_message)
+
+    total_tokens = system_tokens + history_tokens + current_tokens + TOKENS_REPLY_PRIMING
+    stats = {
+        "system_tokens": system_tokens,
+        "history_tokens": history_tokens,
+        "message_tokens": current_tokens,
+        "total_tokens": total_tokens,
+        "history_kept": len(kept),
+        "history_dropped": dropped,
+        "budget": budget,
+        "over_budget": total_tokens > budget
+    }
+    prompt_metrics.record(stats)
+    return messages, stats
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Reconstrói o read model user_state a partir das coleções brutas
+
+Uso:
+    python rebuild_user_state.py              # todos os usuários
+    python rebuild_user_state.py <user_id>... # usuários específicos
+"""
+
+import sys
+import logging
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from orchestrator import sync  # noqa: E402
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main(user_ids):
+    if user_ids:
+        for user_id in user_ids:
+            sync.UserStateManager.rebuild(user_id)
+            logger.info(f"user_state rebuilt: {user_id}")
+    else:
+        count = sync.UserStateManager.rebuild_all()
+        logger.info(f"user_state rebuilt for {count} users")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Re-varre as conversas salvas com o léxico de risco atual e preenche risk_events
+
+Retoma do último checkpoint do job (padrão: versão atual do léxico).
+
+Uso:
+    python rescan_risk.py                       # executa ou retoma o job da versão atual
+    python rescan_risk.py --job nome --restart  # recomeça um job do início
+    python rescan_risk.py --workers 8 --batch-size 10000 --limit 100000
+"""
+
+import argparse
+import logging
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from orchestrator import sync  # noqa: E402
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-scan conversations with the current risk lexicon")
+    parser.add_argument("--job", help="checkpoint name (default: lexicon-<version>)")
+    parser.add_argument("--restart", action="store_true", help="ignore the existing checkpoint")
+    parser.add_argument("--batch-size", type=int, help="conversations read per batch")
+    parser.add_argument("--workers", type=int, help="scoring processes")
+    parser.add_argument("--limit", type=int, help="stop after about N conversations")
+    args = parser.parse_args()
+
+    summary = sync.RiskRescanManager.run(
+        job=args.job,
+        restart=args.restart,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        limit=args.limit
+    )
+    logger.info(f"Risk re-scan finished: {summary}")
+
+
+if __name__ == "__main__":
+    main()
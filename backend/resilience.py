@@ -0,0 +1,317 @@
+"""
+EaseMind Resilience - Prazos, requisições "hedged" e circuit breaker para chamadas upstream
+Cada endpoint upstream (chat, stream, TTS, STT, resumo) tem um UpstreamGuard com:
+- prazo total por chamada (e, em streams, prazo até o primeiro chunk e entre chunks;
+  o prazo total de um stream inclui o ritmo do cliente e não conta como falha do upstream);
+- hedge opcional: uma segunda requisição idêntica se a primeira passar do p95 observado;
+- circuit breaker: após falhas consecutivas, falha na hora (o chamador serve o fallback)
+  até o período de recuperação, quando uma chamada de teste decide se o circuito fecha.
+"""
+
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RECOVERY_SECONDS = float(os.getenv("BREAKER_RECOVERY_SECONDS", "30"))
+HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LATENCY_WINDOW = int(os.getenv("LLM_LATENCY_WINDOW", "200"))
+STREAM_IDLE_TIMEOUT = float(os.getenv("LLM_STREAM_IDLE_TIMEOUT", "15"))
+
+
+class CircuitOpenError(RuntimeError):
+    """O upstream está marcado como indisponível; chamadas falham sem tentar"""
+
+
+class DeadlineExceededError(asyncio.TimeoutError):
+    """A chamada upstream passou do prazo configurado"""
+
+
+def is_upstream_failure(exc: BaseException) -> bool:
+    """
+    Conta para o breaker: prazos, erros de conexão, 429 e 5xx.
+    Erros 4xx (requisição inválida) são problema nosso, não do provedor.
+    """
+    if isinstance(exc, asyncio.TimeoutError):
+        return True
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        return not isinstance(exc, (ValueError, TypeError))
+    return status == 429 or status >= 500
+
+
+class CircuitBreaker:
+    """Estados closed → open (após N falhas seguidas) → half_open (após recuperação) → closed"""
+
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 recovery_seconds: float = BREAKER_RECOVERY_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_seconds = recovery_seconds
+        self.state = "closed"
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._stats = {"opened": 0, "rejected": 0}
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open" and time.monotonic() - self._opened_at >= self.recovery_seconds:
+            self.state = "half_open"
+            self._trial_in_flight = False
+        if self.state == "half_open" and not self._trial_in_flight:
+            # Uma única chamada de teste por vez enquanto meio-aberto
+            self._trial_in_flight = True
+            return True
+        self._stats["rejected"] += 1
+        return False
+
+    def is_open(self) -> bool:
+        """Aberto e ainda dentro do período de recuperação (não consome a chamada de teste)"""
+        return self.state == "open" and time.monotonic() - self._opened_at < self.recovery_seconds
+
+    def release_trial(self):
+        """Libera a chamada de teste sem mudar o estado (erro da requisição ou cancelamento)"""
+        self._trial_in_flight = False
+
+    def retry_after(self) -> int:
+        return max(1, int(self.recovery_seconds - (time.monotonic() - self._opened_at)))
+
+    def record_success(self):
+        if self.state != "closed":
+            logger.info(f"Circuit '{self.name}' closed")
+        self.state = "closed"
+        self._consecutive_failures = 0
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self._consecutive_failures += 1
+        self._trial_in_flight = False
+        if self.state == "half_open" or self._consecutive_failures >= self.failure_threshold:
+            if self.state != "open":
+                self._stats["opened"] += 1
+                logger.error(f"Circuit '{self.name}' opened after {self._consecutive_failures} consecutive failures")
+            self.state = "open"
+            self._opened_at = time.monotonic()
+
+    def stats(self) -> Dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self._consecutive_failures,
+            "times_opened": self._stats["opened"],
+            "rejected": self._stats["rejected"],
+            "retry_after_s": self.retry_after() if self.state == "open" else 0
+        }
+
+
+class UpstreamGuard:
+    """Prazo + hedge + circuit breaker em torno de um tipo de chamada upstream"""
+
+    def __init__(self, name: str, deadline: Optional[float], hedge: bool = False,
+                 first_chunk_deadline: Optional[float] = None):
+        self.name = name
+        self.deadline = deadline
+        self.hedge = hedge
+        self.first_chunk_deadline = first_chunk_deadline or deadline
+        self.breaker = CircuitBreaker(name)
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._stats = {"calls": 0, "failures": 0, "timeouts": 0, "hedged": 0, "hedge_wins": 0, "deadline_cuts": 0}
+
+    def check(self):
+        """Falha imediatamente se o circuito estiver aberto (antes de preparar a chamada)"""
+        if self.breaker.is_open():
+            raise CircuitOpenError(f"{self.name} upstream unavailable (circuit open)")
+
+    def _acquire(self):
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"{self.name} upstream unavailable (circuit open)")
+
+    def hedge_delay(self) -> Optional[float]:
+        """Atraso do hedge: percentil observado da latência (None sem amostras suficientes)"""
+        if not self.hedge or len(self._latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * HEDGE_PERCENTILE / 100))]
+
+    def _record(self, started: float, exc: Optional[BaseException] = None):
+        if exc is None:
+            self._latencies.append(time.monotonic() - started)
+            self.breaker.record_success()
+            return
+        self._stats["failures"] += 1
+        if isinstance(exc, asyncio.TimeoutError):
+            self._stats["timeouts"] += 1
+        if is_upstream_failure(exc):
+            self.breaker.record_failure()
+        else:
+            self.breaker.release_trial()
+
+    async def _hedged(self, factory: Callable[[], Awaitable[T]], delay: float) -> T:
+        """Dispara a segunda tentativa após delay; a primeira a concluir com sucesso vence"""
+        primary = asyncio.ensure_future(factory())
+        tasks = {primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done:
+                return primary.result()
+
+            self._stats["hedged"] += 1
+            backup = asyncio.ensure_future(factory())
+            tasks.add(backup)
+            pending = set(tasks)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is backup:
+                            self._stats["hedge_wins"] += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # Cancela a tentativa perdedora (ou ambas, se o prazo estourar)
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def call(self, factory: Callable[[], Awaitable[T]]) -> T:
+        """
+        Executa factory() dentro do prazo, com hedge opcional e breaker
+
+        factory deve criar uma nova chamada a cada invocação (o hedge pode chamá-la duas vezes).
+        Raises:
+            CircuitOpenError, DeadlineExceededError ou o erro do upstream
+        """
+        self._acquire()
+        self._stats["calls"] += 1
+        started = time.monotonic()
+        delay = self.hedge_delay()
+        try:
+            coro = self._hedged(factory, delay) if delay is not None else factory()
+            result = await asyncio.wait_for(coro, self.deadline)
+        except asyncio.TimeoutError as e:
+            self._record(started, e)
+            raise DeadlineExceededError(f"{self.name} exceeded {self.deadline}s deadline") from e
+        except Exception as e:
+            self._record(started, e)
+            raise
+        except BaseException:
+            # Requisição cancelada (cliente desconectou): não é falha do upstream
+            self.breaker.release_trial()
+            raise
+        self._record(started)
+        return result
+
+    async def stream(self, factory: Callable[[], Awaitable[AsyncIterator[T]]],
+                     idle_timeout: float = STREAM_IDLE_TIMEOUT) -> AsyncIterator[T]:
+        """
+        Variante para streams: prazo até o stream abrir, prazo entre chunks e prazo total
+        opcional (deadline=None desliga). Sem hedge (o conteúdo já foi entregue ao cliente parcialmente).
+
+        Só os prazos de abertura e entre chunks medem o upstream; o prazo total também conta
+        o tempo em que o consumidor segurou o stream, então estourá-lo encerra o stream sem
+        contar falha no breaker.
+        """
+        self._acquire()
+        self._stats["calls"] += 1
+        started = time.monotonic()
+        try:
+            stream = await asyncio.wait_for(factory(), self.first_chunk_deadline)
+            iterator = stream.__aiter__()
+            while True:
+                timeout = idle_timeout
+                if self.deadline is not None:
+                    remaining = self.deadline - (time.monotonic() - started)
+                    if remaining <= 0:
+                        self._stats["deadline_cuts"] += 1
+                        self.breaker.record_success()  # O upstream estava entregando
+                        raise DeadlineExceededError(f"{self.name} stream cut at its {self.deadline}s total deadline")
+                    timeout = min(idle_timeout, remaining)
+                try:
+                    chunk = await asyncio.wait_for(iterator.__anext__(), timeout)
+                except StopAsyncIteration:
+                    break
+                yield chunk
+        except DeadlineExceededError:
+            raise
+        except asyncio.TimeoutError as e:
+            self._record(started, e)
+            raise DeadlineExceededError(f"{self.name} stream exceeded its deadline") from e
+        except Exception as e:
+            self._record(started, e)
+            raise
+        except BaseException:
+            # Cliente desconectou (GeneratorExit/CancelledError): não é falha do upstream
+            self.breaker.release_trial()
+            raise
+        self._record(started)
+
+    def stats(self) -> Dict:
+        ordered = sorted(self._latencies)
+        return {
+            "deadline_s": self.deadline,
+            "hedge": self.hedge,
+            "hedge_delay_s": round(self.hedge_delay(), 3) if self.hedge_delay() is not None else None,
+            "p50_s": round(ordered[len(ordered) // 2], 3) if ordered else None,
+            "p95_s": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3) if ordered else None,
+            **self._stats,
+            "breaker": self.breaker.stats()
+        }
+
+
+def _env_flag(name: str, default: str = "false") -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
+
+# Um guard por endpoint upstream; o stream de chat compartilha o breaker do chat
+upstreams: Dict[str, UpstreamGuard] = {
+    "chat": UpstreamGuard(
+        "chat",
+        deadline=float(os.getenv("LLM_DEADLINE_CHAT", "20")),
+        hedge=_env_flag("LLM_HEDGE_CHAT")
+    ),
+    "tts": UpstreamGuard(
+        "tts",
+        deadline=float(os.getenv("LLM_DEADLINE_TTS", "20")),
+        hedge=_env_flag("LLM_HEDGE_TTS")
+    ),
+    "stt": UpstreamGuard(
+        "stt",
+        deadline=float(os.getenv("LLM_DEADLINE_STT", "45")),
+        hedge=_env_flag("LLM_HEDGE_STT")
+    ),
+    "summary": UpstreamGuard(
+        "summary",
+        deadline=float(os.getenv("LLM_DEADLINE_SUMMARY", "45")),
+        hedge=_env_flag("LLM_HEDGE_SUMMARY")
+    )
+}
+upstreams["chat_stream"] = UpstreamGuard(
+    "chat_stream",
+    deadline=float(os.getenv("LLM_DEADLINE_CHAT_STREAM", "60")),
+    first_chunk_deadline=float(os.getenv("LLM_DEADLINE_CHAT_FIRST_CHUNK", "10"))
+)
+upstreams["chat_stream"].breaker = upstreams["chat"].breaker
+# Áudio em streaming é consumido no ritmo do cliente: sem prazo total por padrão (0), só até o
+# primeiro bloco e entre blocos, que medem o provedor
+_tts_stream_deadline = float(os.getenv("LLM_DEADLINE_TTS_STREAM", "0"))
+upstreams["tts_stream"] = UpstreamGuard(
+    "tts_stream",
+    deadline=_tts_stream_deadline or None,
+    first_chunk_deadline=float(os.getenv("LLM_DEADLINE_TTS_FIRST_CHUNK", "10"))
+)
+upstreams["tts_stream"].breaker = upstreams["tts"].breaker
+
+
+def upstream_stats() -> Dict:
+    return {name: guard.stats() for name, guard in upstreams.items()}
@@ -0,0 +1,227 @@
+"""
+EaseMind Risk Matcher - Casamento de múltiplos padrões em uma única passada
+Autômato Aho-Corasick sobre frases normalizadas (minúsculas, sem acentos,
+espaços colapsados), com verificação de fronteira de palavra. Frases terminadas
+em "*" são radicais: casam no início de palavra com qualquer terminação
+("suicid*" pega suicídio, suicidaria, suicidal).
+Compilado uma vez; cada mensagem é varrida em tempo linear no seu tamanho,
+independente do número de frases no léxico.
+
+O léxico vive em um único arquivo versionado (risk_lexicon.json), recarregado a
+quente quando muda: o novo autômato é compilado ao lado do atual e trocado por
+uma única atribuição, sem bloquear varreduras em andamento.
+"""
+
+import os
+import re
+import json
+import time
+import logging
+import unicodedata
+from collections import deque
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+RISK_LEXICON_PATH = Path(os.getenv("RISK_LEXICON_PATH", str(Path(__file__).parent / "risk_lexicon.json")))
+RISK_LEXICON_POLL_SECONDS = float(os.getenv("RISK_LEXICON_POLL_SECONDS", "5"))
+
+_WHITESPACE = re.compile(r"\s+")
+
+# Nível numérico de cada severidade (mesma escala de RiskDetector.detect_risk)
+SEVERITY_LEVELS = {"critical": 4, "high": 3, "moderate": 1}
+PREFIX_MARKER = "*"
+
+
+def fold_text(text: str) -> str:
+    """Minúsculas, sem acentos (suicídio → suicidio) e espaços colapsados"""
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return _WHITESPACE.sub(" ", stripped).strip()
+
+
+class RiskHit(NamedTuple):
+    phrase: str      # Frase do léxico, como cadastrada
+    severity: str    # critical | high | moderate
+    lang: str        # pt | en | es
+    start: int       # Posição no texto normalizado
+
+
+class RiskMatcher:
+    """Autômato Aho-Corasick compilado a partir do léxico {severidade: {idioma: [frases]}}"""
+
+    def __init__(self, lexicon: Dict[str, Dict[str, List[str]]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, bool, RiskHit]]] = [[]]
+        self.phrase_count = 0
+
+        # Frases iguais após normalização ficam com a maior severidade
+        patterns: Dict[Tuple[str, bool], RiskHit] = {}
+        for severity, by_lang in lexicon.items():
+            for lang, phrases in by_lang.items():
+                for phrase in phrases:
+                    prefix = phrase.endswith(PREFIX_MARKER)
+                    folded = fold_text(phrase.rstrip(PREFIX_MARKER))
+                    if not folded:
+                        continue
+                    current = patterns.get((folded, prefix))
+                    if current is None or SEVERITY_LEVELS[severity] > SEVERITY_LEVELS[current.severity]:
+                        patterns[(folded, prefix)] = RiskHit(phrase, severity, lang, -1)
+
+        for (folded, prefix), hit in patterns.items():
+            self._add(folded, prefix, hit)
+        self._build()
+        self.phrase_count = len(patterns)
+
+    def _add(self, folded: str, prefix: bool, hit: RiskHit):
+        state = 0
+        for ch in folded:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+                self._goto[state][ch] = nxt
+            state = nxt
+        self._out[state].append((len(folded), prefix, hit))
+
+    def _build(self):
+        """Calcula os links de falha em largura e herda as saídas dos sufixos"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                # Nós de profundidade 1 sempre falham para a raiz
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def scan(self, text: str) -> List[RiskHit]:
+        """
+        Varre o texto uma única vez e retorna todas as ocorrências em fronteira de palavra
+        (radicais exigem só a fronteira do início)
+        """
+        folded = fold_text(text)
+        hits: List[RiskHit] = []
+        state = 0
+        goto, fail, out = self._goto, self._fail, self._out
+        for index, ch in enumerate(folded):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for length, prefix, hit in out[state]:
+                start = index - length + 1
+                if start > 0 and folded[start - 1].isalnum():
+                    continue
+                if not prefix and index + 1 < len(folded) and folded[index + 1].isalnum():
+                    continue
+                hits.append(hit._replace(start=start))
+        return hits
+
+
+class RiskLexicon:
+    """
+    Léxico versionado carregado de arquivo, com recarga atômica
+
+    Leitores pegam self.matcher uma vez por varredura; a recarga compila um
+    autômato novo e só então substitui a referência. Um arquivo inválido
+    mantém o léxico atual em uso.
+    """
+
+    def __init__(self, path: Path = RISK_LEXICON_PATH):
+        self.path = path
+        self.matcher: Optional[RiskMatcher] = None
+        self.version: Optional[str] = None
+        self._mtime_ns: Optional[int] = None
+        self._loaded_at: Optional[float] = None
+        self._reloads = 0
+        self._failed_reloads = 0
+        self._last_error: Optional[str] = None
+
+    @staticmethod
+    def _parse(raw: Dict) -> Tuple[str, Dict[str, Dict[str, List[str]]]]:
+        version = raw.get("version")
+        severities = raw.get("severities")
+        if not version or not isinstance(severities, dict):
+            raise ValueError("risk lexicon requires 'version' and 'severities'")
+        unknown = set(severities) - set(SEVERITY_LEVELS)
+        if unknown:
+            raise ValueError(f"unknown severities in risk lexicon: {sorted(unknown)}")
+        for severity, by_lang in severities.items():
+            if not isinstance(by_lang, dict) or not all(isinstance(p, list) for p in by_lang.values()):
+                raise ValueError(f"severity '{severity}' must map language -> list of phrases")
+            for phrases in by_lang.values():
+                misplaced = [p for p in phrases if PREFIX_MARKER in p.rstrip(PREFIX_MARKER)]
+                if misplaced:
+                    raise ValueError(f"'{PREFIX_MARKER}' is only allowed at the end of a phrase: {misplaced}")
+        return str(version), severities
+
+    def load(self) -> "RiskLexicon":
+        """Carga inicial: um arquivo inválido aqui é erro de startup"""
+        mtime_ns = self.path.stat().st_mtime_ns
+        version, severities = self._parse(json.loads(self.path.read_text(encoding="utf-8")))
+        self._swap(RiskMatcher(severities), version, mtime_ns)
+        logger.info(f"Risk lexicon {version} loaded: {self.matcher.phrase_count} phrases")
+        return self
+
+    def _swap(self, matcher: RiskMatcher, version: str, mtime_ns: int):
+        self.matcher = matcher
+        self.version = version
+        self._mtime_ns = mtime_ns
+        self._loaded_at = time.time()
+
+    def reload_if_changed(self) -> bool:
+        """
+        Recompila se o arquivo mudou desde a última carga
+
+        Returns:
+            True se um novo léxico entrou em uso
+        """
+        try:
+            mtime_ns = self.path.stat().st_mtime_ns
+            if mtime_ns == self._mtime_ns:
+                return False
+            version, severities = self._parse(json.loads(self.path.read_text(encoding="utf-8")))
+            matcher = RiskMatcher(severities)
+        except Exception as e:
+            # Guarda o mtime para não reprocessar o mesmo arquivo quebrado a cada ciclo
+            if self._last_error != str(e):
+                logger.error(f"Risk lexicon reload failed, keeping {self.version}: {e}")
+            self._failed_reloads += 1
+            self._last_error = str(e)
+            try:
+                self._mtime_ns = self.path.stat().st_mtime_ns
+            except OSError:
+                pass
+            return False
+
+        previous = self.version
+        self._swap(matcher, version, mtime_ns)
+        self._reloads += 1
+        self._last_error = None
+        logger.info(f"Risk lexicon reloaded {previous} -> {version}: {matcher.phrase_count} phrases")
+        return True
+
+    def scan(self, text: str) -> List[RiskHit]:
+        return self.matcher.scan(text)
+
+    def stats(self) -> Dict:
+        return {
+            "version": self.version,
+            "path": str(self.path),
+            "phrases": self.matcher.phrase_count if self.matcher else 0,
+            "loaded_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(self._loaded_at)) if self._loaded_at else None,
+            "reloads": self._reloads,
+            "failed_reloads": self._failed_reloads,
+            "last_error": self._last_error
+        }
+
+
+risk_lexicon = RiskLexicon().load()
@@ -1,18 +1,32 @@
-from fastapi import FastAPI, HTTPException, Request, UploadFile, File
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse, StreamingResponse
-from pydantic import BaseModel
+from starlette.background import BackgroundTask
+from pydantic import BaseModel, Field, field_validator
 from dotenv import load_dotenv
 import os
 from emergentintegrations.llm.chat import LlmChat, UserMessage
 import asyncio
+import anyio
+import json
 import uuid
 import logging
 from elevenlabs.client import ElevenLabs
 from elevenlabs import save
-import tempfile
-from pathlib import Path
-from openai import OpenAI
+from contextlib import asynccontextmanager
+from bson import ObjectId
+from llm_client import init_llm_client, close_llm_client, get_llm_client, get_api_key
+from background import post_processing
+from prompting import assemble_messages, load_tokenizer, prompt_metrics, prompt_templates, normalize_language, PROMPT_DEFAULT_LANGUAGE, PROMPT_TOKENIZER_TIMEOUT
+from risk_matcher import risk_lexicon, RISK_LEXICON_POLL_SECONDS
+from crisis import crisis_followups, CRISIS_FAST_PATH_LEVEL, CRISIS_FOLLOWUP_INSTRUCTION, CRISIS_FOLLOWUP_MAX_TOKENS
+from typing import Optional
+from resilience import upstreams, upstream_stats, CircuitOpenError
+from tts_cache import tts_cache, cache_key, iter_file
+from speech_pipeline import speak, prerender_static_audio, TTS_MODEL, TTS_VOICE, TTS_FORMAT
+from tts_bundle import audio_bundle, TTS_BUNDLE_PRERENDER
+from audio_upload import read_audio_upload, enforce_duration, audio_workspace, AudioUpload
+from audio_processing import audio_normalizer, transcribe_long, LONG_AUDIO_THRESHOLD_SECONDS
 
 load_dotenv()
 
@@ -20,7 +34,69 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+SUMMARY_SWEEP_INTERVAL = float(os.getenv("SUMMARY_SWEEP_INTERVAL", "60"))
+# How long /api/chat/stream keeps the connection open for the crisis follow-up
+CRISIS_STREAM_FOLLOWUP_WAIT = float(os.getenv("CRISIS_STREAM_FOLLOWUP_WAIT", "30"))
+
+async def summary_idle_sweeper():
+    """Periodically queue batch summaries for users who went idle"""
+    from orchestrator import SummaryBatcher
+    while True:
+        await asyncio.sleep(SUMMARY_SWEEP_INTERVAL)
+        try:
+            for user_id in SummaryBatcher.idle_users():
+                await post_processing.submit("summary_flush", SummaryBatcher.flush, user_id, "idle")
+        except Exception as e:
+            logger.error(f"Summary sweeper error: {e}", exc_info=True)
+
+async def risk_lexicon_watcher():
+    """Recompile the risk lexicon off the event loop whenever its file changes"""
+    while True:
+        await asyncio.sleep(RISK_LEXICON_POLL_SECONDS)
+        try:
+            await asyncio.to_thread(risk_lexicon.reload_if_changed)
+        except Exception as e:
+            logger.error(f"Risk lexicon watcher error: {e}", exc_info=True)
+
+async def warm_static_audio():
+    """Render any static phrase missing from the audio bundle (existing files keep serving if TTS is down)"""
+    try:
+        await prerender_static_audio(prompt_templates.static_phrases())
+    except Exception as e:
+        logger.error(f"Static audio prerender error: {e}", exc_info=True)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create process-wide resources on startup and release them on shutdown"""
+    from orchestrator import SummaryBatcher, IndexManager, close_database
+    
+    # Build indexes in the background so an unreachable Mongo doesn't delay startup
+    index_bootstrap = asyncio.create_task(IndexManager.ensure_indexes())
+    await init_llm_client()
+    # tiktoken may download its BPE file on a cold cache; don't let that hang startup
+    if not await asyncio.to_thread(load_tokenizer, PROMPT_TOKENIZER_TIMEOUT):
+        logger.warning("Tokenizer not ready, counting prompt tokens by characters until it loads")
+    await post_processing.start()
+    await asyncio.to_thread(tts_cache.load)
+    await asyncio.to_thread(audio_bundle.load)
+    audio_warmup = asyncio.create_task(warm_static_audio()) if TTS_BUNDLE_PRERENDER else None
+    sweeper = asyncio.create_task(summary_idle_sweeper())
+    lexicon_watcher = asyncio.create_task(risk_lexicon_watcher())
+    yield
+    sweeper.cancel()
+    lexicon_watcher.cancel()
+    if audio_warmup is not None:
+        audio_warmup.cancel()
+    index_bootstrap.cancel()
+    # Summarize buffered turns, then drain pending writes before the LLM client goes away
+    await crisis_followups.drain()
+    for user_id in SummaryBatcher.pending_users():
+        await post_processing.submit("summary_flush", SummaryBatcher.flush, user_id, "shutdown")
+    await post_processing.drain()
+    await close_llm_client()
+    close_database()
+
+app = FastAPI(lifespan=lifespan)
 
 # Enable CORS with specific origin
 app.add_middleware(
@@ -37,135 +113,57 @@ app.add_middleware(
     expose_headers=["X-Correlation-ID"],
 )
 
-# System prompt for Luna - EaseMind Voice Therapist
-SYSTEM_PROMPT = """SYSTEM CONTEXT - EASEMIND.IO
-
-Você é Luna, terapeuta virtual do aplicativo EaseMind.
-Seu papel é oferecer acolhimento emocional, exercícios de respiração, práticas de atenção plena (mindfulness) e reflexões baseadas em TCC, TRG e Psicologia Positiva.
-
-IDIOMA:
-Responda automaticamente no mesmo idioma do usuário (Português, Inglês ou Espanhol).
-
----
-
-AVISO LEGAL E DE USO
-
-O EaseMind é um aplicativo de apoio emocional e bem-estar mental.
-O conteúdo fornecido é educativo, voltado ao autocuidado e baseado em práticas de Terapia Cognitivo-Comportamental (TCC), Respiração Guiada (TRG) e Psicologia Positiva.
-
-O EaseMind não substitui terapia, diagnóstico ou tratamento médico ou psicológico.
-Nenhuma resposta deve ser interpretada como aconselhamento médico ou psicológico profissional.
-A Luna nunca deve prescrever medicamentos, doses, terapias ou diagnósticos.
-
-Em caso de crise emocional ou risco à vida:
-Procure ajuda profissional imediatamente.
-- Brasil: CVV - 188 (gratuito e confidencial, 24h)
-- EUA: 988 Suicide & Crisis Lifeline
-- Outros países: procure linhas locais de emergência.
-
-O uso do EaseMind implica a aceitação dos nossos Termos de Uso e Política de Privacidade, disponíveis em:
-https://easemind.io/terms
-https://easemind.io/privacy
-
----
-
-Você é Luna, uma terapeuta virtual empática e consciente, criada para oferecer apoio emocional, reflexões e práticas de autocuidado baseadas em psicologia e neurociência aplicada.
-
-MISSÃO:
-Ajudar o usuário a lidar com ansiedade, estresse, traumas leves e emoções desafiadoras por meio de técnicas de:
-- TCC (Terapia Cognitivo-Comportamental)
-- TRG (Terapia de Reprocessamento Guiado / EMDR light)
-- Mindfulness e Respiração Consciente
-- Psicologia Positiva
-- Terapia do Esquema e Regulação Emocional
-- Princípios da Terapia de Aceitação e Compromisso (ACT)
-
-TOM E ESTILO:
-- Fale como uma terapeuta humana, gentil e presente.
-- Voz calma, linguagem acessível, empatia real.
-- Respostas curtas (1 a 3 parágrafos).
-- Use pausas e respiração quando guiar exercícios.
-- Evite jargões ou linguagem técnica demais.
-
-COMO AGIR NAS CONVERSAS:
-1. Escute o que o usuário expressa com atenção emocional.
-2. Valide seus sentimentos (ex: "faz sentido se sentir assim").
-3. Ofereça uma reflexão, técnica ou exercício prático.
-4. Termine com uma frase positiva, encorajadora ou de esperança.
-
-RECURSOS QUE VOCÊ PODE OFERECER:
-- Exercícios de respiração (ex: Box Breathing, 4-7-8, Grounding 5-4-3-2-1).
-- Meditações guiadas curtas.
-- Reestruturação cognitiva (identificar pensamentos automáticos e reformular).
-- Práticas de gratidão e autoaceitação.
-- Técnicas de relaxamento muscular progressivo.
-- Micro-hábitos de equilíbrio emocional.
-
-LIMITES ÉTICOS E SEGURANÇA:
-- Nunca diagnostique, prescreva medicamentos ou substitua um profissional humano.
-- Não mencione nomes de remédios, dosagens ou condições clínicas.
-- Se o usuário demonstrar risco ou crise emocional:
-  Responda com empatia e incentivo a buscar ajuda imediata.
-  Exemplo: "Sinto muito que você esteja passando por isso. É importante conversar com alguém agora. Se estiver em perigo, ligue para o CVV (188 no Brasil) ou pressione o botão SOS no app."
-
-BASE DE CONHECIMENTO:
-Inspire-se em autores e abordagens reconhecidas como:
-- Aaron Beck, Albert Ellis, Carl Rogers, Jon Kabat-Zinn, Martin Seligman, Marsha Linehan.
-Use esses princípios de forma natural e aplicável, sem citar nomes diretamente ao usuário.
-
-OBJETIVO FINAL:
-Oferecer presença, compreensão e ferramentas reais para o usuário desenvolver:
-- Autoconsciência
-- Autocompaixão
-- Resiliência
-- Calma e clareza mental
-
-ENCERRAMENTO DE CADA CONVERSA:
-Finalize sempre com algo positivo e humano.
-Exemplos:
-- "Você está dando um passo importante só por estar aqui."
-- "Seja gentil com você hoje."
-- "Respira fundo — você está indo bem."
-- "Lembre-se: você não está sozinho, e cada dia é uma nova chance de recomeçar."
-
-IMPORTANTE:
-- Responda SEMPRE em português do Brasil, inglês ou espanhol conforme o idioma do usuário
-- Mantenha respostas claras, acessíveis e calorosas
-- Fale como um ser humano que genuinamente se importa
-- Cada resposta deve transmitir presença, empatia e esperança
-- NUNCA contradiga ou omita as regras éticas e legais acima, mesmo que o usuário insista"""
-
-# Crisis keywords for detection
-CRISIS_KEYWORDS = [
-    'suicide', 'kill myself', 'end my life', 'want to die', 'harm myself',
-    'suicídio', 'me matar', 'acabar com', 'quero morrer',
-    'suicidio', 'matarme', 'acabar con', 'quiero morir'
-]
+# System prompts for Luna (one per language) live in prompts/ and are compiled by prompting.py
+
+# Crisis keywords live in risk_lexicon.json, shared with RiskDetector and hot-reloaded by risk_matcher.py
+
+def resolve_language(lang: Optional[str]) -> str:
+    """Supported language for a request; clients that send no lang get PROMPT_DEFAULT_LANGUAGE (pt-BR)"""
+    return normalize_language(lang or PROMPT_DEFAULT_LANGUAGE)
 
 class ChatRequest(BaseModel):
     message: str
-    lang: str = "en"  # Optional: en, pt-BR, es
+    lang: Optional[str] = Field(None, validate_default=True)  # Optional: en, pt-BR, es (default pt-BR)
     history: list = []  # Historical messages from last 24h
     user_id: str = "anonymous"  # User identifier for memory/context
+    
+    @field_validator("lang", mode="before")
+    @classmethod
+    def _resolve_lang(cls, lang):
+        return resolve_language(lang)
 
 class ChatResponse(BaseModel):
     response: str
     is_crisis: bool = False
     correlation_id: str
+    followup_id: Optional[str] = None  # Set on the crisis fast path: poll GET /api/chat/followup/{followup_id}?user_id=
 
 @app.get("/")
 def read_root():
     return {"message": "EaseMind API - Calm your mind, heal your day", "version": "1.0.0"}
 
 @app.get("/api/health")
-def health_check():
+async def health_check():
     """Health check endpoint"""
-    api_key = os.getenv("OPENAI_API_KEY") or os.getenv("EMERGENT_LLM_KEY")
+    from orchestrator import SummaryBatcher, UserContextCache, SingleFlight
+    api_key = get_api_key()
     return {
         "status": "ok",
         "service": "easemind",
         "api_configured": bool(api_key),
-        "api_key_type": "openai" if os.getenv("OPENAI_API_KEY") else "emergent"
+        "api_key_type": "openai" if os.getenv("OPENAI_API_KEY") else "emergent",
+        "post_processing": post_processing.stats(),
+        "summaries": SummaryBatcher.stats(),
+        "context_cache": UserContextCache.stats(),
+        "single_flight": SingleFlight.stats(),
+        "prompt_tokens": prompt_metrics.stats(),
+        "prompt_templates": prompt_templates.stats(),
+        "crisis": crisis_followups.stats(),
+        "upstreams": upstream_stats(),
+        "tts_cache": tts_cache.stats(),
+        "tts_bundle": audio_bundle.stats(),
+        "audio_normalization": audio_normalizer.stats(),
+        "risk_lexicon": risk_lexicon.stats()
     }
 
 @app.get("/api/version")
@@ -176,19 +174,25 @@ def version():
         "name": "EaseMind API",
         "endpoints": {
             "chat": "POST /api/chat",
+            "chat_stream": "POST /api/chat/stream (text/event-stream)",
+            "chat_speech": "POST /api/chat/speech (audio/mpeg, spoken sentence by sentence)",
+            "voice_session": "WS /api/ws/voice (audio in, transcript + spoken reply out, barge-in)",
+            "chat_session_end": "POST /api/chat/session-end",
+            "chat_followup": "GET /api/chat/followup/{followup_id}?user_id=",
             "health": "GET /api/health",
             "version": "GET /api/version",
             "transcribe": "POST /api/transcribe",
-            "tts": "POST /api/tts"
+            "tts": "POST /api/tts",
+            "tts_static": "GET /api/tts/static/{phrase_id}?lang= (prerendered: crisis, crisis_appendix, fallback)"
         },
         "contract": {
             "chat": {
-                "request": {"message": "string", "lang": "string (optional: en|pt-BR|es)", "history": "array (optional)"},
-                "response": {"response": "string", "is_crisis": "boolean", "correlation_id": "string"}
+                "request": {"message": "string", "lang": "string (optional: en|pt-BR|es, default pt-BR)", "history": "array (optional)"},
+                "response": {"response": "string", "is_crisis": "boolean", "correlation_id": "string", "followup_id": "string (crisis fast path only)"}
             },
             "transcribe": {
                 "request": "audio file (multipart/form-data)",
-                "response": {"text": "string", "lang_detected": "string"}
+                "response": {"text": "string", "lang_detected": "string", "segments": "integer (long recordings only)"}
             },
             "tts": {
                 "request": {"text": "string", "lang": "string", "provider": "string (optional)"},
@@ -199,69 +203,204 @@ def version():
 
 class TTSRequest(BaseModel):
     text: str
-    lang: str = "en"  # en, pt-BR, es
+    lang: Optional[str] = Field(None, validate_default=True)  # en, pt-BR, es (default pt-BR)
     provider: str = "elevenlabs"  # elevenlabs or google
-
-@app.post("/api/transcribe")
-async def transcribe_audio(file: UploadFile = File(...)):
-    """Speech-to-Text using OpenAI Whisper"""
+    
+    @field_validator("lang", mode="before")
+    @classmethod
+    def _resolve_lang(cls, lang):
+        return resolve_language(lang)
+
+TRANSCRIBE_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {"multipart/form-data": {"schema": {
+            "type": "object",
+            "required": ["file"],
+            "properties": {"file": {"type": "string", "format": "binary"}}
+        }}}
+    }
+}
+
+@app.post("/api/transcribe", openapi_extra=TRANSCRIBE_OPENAPI)
+async def transcribe_audio(request: Request):
+    """
+    Speech-to-Text using OpenAI Whisper.
+    The multipart upload is streamed into memory and rejected with 413 as soon as it
+    exceeds TRANSCRIBE_MAX_BYTES or runs longer than TRANSCRIBE_MAX_SECONDS
+    (containers without a duration header, like browser WebM, are measured from their packets;
+    400 for unreadable durations only with TRANSCRIBE_REQUIRE_DURATION). ffprobe/ffmpeg share
+    one copy in tmpfs.
+    Recordings longer than LONG_AUDIO_THRESHOLD_SECONDS are split on silence and the
+    segments transcribed concurrently, so latency tracks the longest segment.
+    """
     correlation_id = str(uuid.uuid4())
     
     try:
-        logger.info(f"[{correlation_id}] STT: Received audio file: {file.filename}")
-        
         # Get OpenAI API key
-        api_key = os.getenv("OPENAI_API_KEY") or os.getenv("EMERGENT_LLM_KEY")
+        api_key = get_api_key()
         if not api_key:
             raise HTTPException(status_code=500, detail="API key not configured")
         
-        # Save uploaded file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix=Path(file.filename).suffix) as temp_file:
-            content = await file.read()
-            temp_file.write(content)
-            temp_file_path = temp_file.name
+        upload = await read_audio_upload(request)
         
-        try:
-            # Initialize OpenAI client
-            client = OpenAI(api_key=api_key)
-            
-            # Transcribe with Whisper
-            logger.info(f"[{correlation_id}] STT: Calling Whisper...")
-            with open(temp_file_path, "rb") as audio_file:
-                transcript = client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=audio_file,
-                    response_format="verbose_json"
-                )
-            
-            transcribed_text = transcript.text
-            detected_lang = transcript.language if hasattr(transcript, 'language') else 'unknown'
-            
-            logger.info(f"[{correlation_id}] STT: Transcribed ({detected_lang}): {transcribed_text[:50]}...")
+        # Shared async OpenAI client
+        client = get_llm_client()
+        
+        def whisper(segment: AudioUpload, language: Optional[str] = None):
+            options = {"language": language} if language else {}
+            return upstreams["stt"].call(lambda: client.audio.transcriptions.create(
+                model="whisper-1",
+                file=segment.as_file(),
+                response_format="verbose_json",
+                **options
+            ))
+        
+        # One copy on disk (tmpfs) for probing, normalization and segmenting, removed afterwards
+        async with audio_workspace() as workspace:
+            await upload.spool(workspace)
+            await enforce_duration(upload)
+            logger.info(f"[{correlation_id}] STT: Received audio file: {upload.filename} ({upload.size} bytes, {upload.duration or '?'}s)")
             
-            return {
-                "text": transcribed_text,
-                "lang_detected": detected_lang,
-                "correlation_id": correlation_id
-            }
+            # Mono 16 kHz Opus without leading/trailing silence (original audio if ffmpeg fails),
+            # with the duration of what Whisper will actually receive
+            audio = await audio_normalizer.normalize(upload, workspace, measure=True)
             
-        finally:
-            # Clean up temp file
-            if os.path.exists(temp_file_path):
-                os.unlink(temp_file_path)
+            # Long recordings: split on silence and transcribe the segments in parallel
+            if audio.duration is not None and audio.duration > LONG_AUDIO_THRESHOLD_SECONDS:
+                duration, silences = await audio_normalizer.analyze_silences(audio)
+                if duration is not None and duration > LONG_AUDIO_THRESHOLD_SECONDS:
+                    upstreams["stt"].check()
+                    logger.info(f"[{correlation_id}] STT: Long audio ({duration:.0f}s), transcribing in segments...")
+                    result = await transcribe_long(audio, duration, silences, whisper)
+                    logger.info(f"[{correlation_id}] STT: Transcribed ({result['language']}, {result['segments']} segments): {result['text'][:50]}...")
+                    return {
+                        "text": result["text"],
+                        "lang_detected": result["language"],
+                        "segments": result["segments"],
+                        "correlation_id": correlation_id
+                    }
+        
+        # Transcribe with Whisper, straight from memory
+        logger.info(f"[{correlation_id}] STT: Calling Whisper with {audio.size} bytes...")
+        transcript = await whisper(audio)
+        
+        transcribed_text = transcript.text
+        detected_lang = transcript.language if hasattr(transcript, 'language') else 'unknown'
+        
+        logger.info(f"[{correlation_id}] STT: Transcribed ({detected_lang}): {transcribed_text[:50]}...")
+        
+        return {
+            "text": transcribed_text,
+            "lang_detected": detected_lang,
+            "correlation_id": correlation_id
+        }
                 
+    except HTTPException as e:
+        if e.status_code == 413:
+            logger.warning(f"[{correlation_id}] STT: rejected upload: {e.detail}")
+        raise
+    except CircuitOpenError as e:
+        logger.warning(f"[{correlation_id}] STT: {e}")
+        raise HTTPException(
+            status_code=503,
+            detail="Transcription temporarily unavailable",
+            headers={"Retry-After": str(upstreams["stt"].breaker.retry_after())}
+        )
     except Exception as e:
         logger.error(f"[{correlation_id}] STT error: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Transcription failed: {str(e)}")
 
+# Upstream audio is relayed one chunk at a time, so each request buffers at most this much
+TTS_STREAM_CHUNK_SIZE = int(os.getenv("TTS_STREAM_CHUNK_SIZE", str(16 * 1024)))
+
+async def relay_tts_stream(correlation_id: str, chunks, first_chunk: bytes, upstream: dict, key: str):
+    """
+    Pass upstream audio through to the client as it arrives, keeping a copy for the TTS cache.
+    Pulling the next chunk only after the previous one was sent keeps buffering bounded;
+    the copy is written to disk in a worker thread once the stream completes, and dropped
+    on client disconnect (the cancellation also closes the upstream response).
+    """
+    audio = [] if tts_cache.enabled else None
+    completed = False
+    sent = 0
+    try:
+        chunk = first_chunk
+        while True:
+            if audio is not None:
+                audio.append(chunk)
+            sent += len(chunk)
+            yield chunk
+            try:
+                chunk = await chunks.__anext__()
+            except StopAsyncIteration:
+                break
+        completed = True
+    except Exception as e:
+        # Headers are already sent: the best we can do is end the stream early
+        logger.error(f"[{correlation_id}] TTS: upstream stream failed after {sent} bytes: {e}")
+    finally:
+        with anyio.CancelScope(shield=True):
+            await chunks.aclose()
+            if upstream.get("response") is not None:
+                await upstream["response"].close()
+            if completed and audio is not None:
+                try:
+                    await asyncio.to_thread(tts_cache.put, key, TTS_FORMAT, b"".join(audio))
+                except Exception as e:
+                    logger.warning(f"[{correlation_id}] TTS: cache write failed: {e}")
+        if completed:
+            logger.info(f"[{correlation_id}] TTS: Streamed {sent} bytes with OpenAI")
+        else:
+            logger.info(f"[{correlation_id}] TTS: Stream stopped after {sent} bytes (client disconnected or upstream error)")
+
+@app.get("/api/tts/static/{phrase_id}")
+async def static_speech(phrase_id: str, lang: Optional[str] = None):
+    """
+    Prerendered audio for a fixed phrase (SOS/crisis message, crisis appendix, fallback).
+    Served straight from the on-disk bundle, so it plays instantly and works while TTS is down.
+    """
+    bundled = await asyncio.to_thread(audio_bundle.open_phrase, phrase_id, resolve_language(lang))
+    if bundled is None:
+        raise HTTPException(status_code=404, detail=f"No prerendered audio for '{phrase_id}'")
+    return StreamingResponse(
+        iter_file(bundled),
+        media_type="audio/mpeg",
+        headers={"Cache-Control": "public, max-age=86400", "X-Cache": "BUNDLE"}
+    )
+
 @app.post("/api/tts")
 async def text_to_speech(request: TTSRequest):
-    """Text-to-Speech using OpenAI (Alloy voice)"""
+    """Text-to-Speech using OpenAI (Alloy voice), served from the content-addressed cache when possible"""
     correlation_id = str(uuid.uuid4())
     
     try:
         logger.info(f"[{correlation_id}] TTS: Text ({request.lang}): {request.text[:50]}...")
         
+        audio_headers = {
+            "X-Correlation-ID": correlation_id,
+            "Content-Disposition": "inline; filename=speech.mp3"
+        }
+        # Static phrases (fallback, crisis texts) come from the prerendered bundle, never from TTS
+        bundled = await asyncio.to_thread(audio_bundle.open_text, request.text, TTS_VOICE, TTS_MODEL, TTS_FORMAT)
+        if bundled is not None:
+            logger.info(f"[{correlation_id}] TTS: prerendered bundle hit")
+            return StreamingResponse(
+                iter_file(bundled),
+                media_type="audio/mpeg",
+                headers={**audio_headers, "X-Cache": "BUNDLE"}
+            )
+        
+        key = cache_key(request.text, TTS_VOICE, TTS_MODEL, TTS_FORMAT, request.lang)
+        cached = await asyncio.to_thread(tts_cache.open, key, TTS_FORMAT)
+        if cached is not None:
+            logger.info(f"[{correlation_id}] TTS: cache hit {key[:12]}")
+            return StreamingResponse(
+                iter_file(cached),
+                media_type="audio/mpeg",
+                headers={**audio_headers, "X-Cache": "HIT"}
+            )
+        
         # Get OpenAI API key
         openai_key = os.getenv("OPENAI_API_KEY")
         if not openai_key:
@@ -272,41 +411,166 @@ async def text_to_speech(request: TTSRequest):
         try:
             logger.info(f"[{correlation_id}] TTS: Using OpenAI TTS (Alloy voice) for language: {request.lang}")
             
-            # Initialize OpenAI client
-            from openai import OpenAI as OpenAIClient
-            client = OpenAIClient(api_key=openai_key)
+            # Shared async OpenAI client
+            client = get_llm_client()
             
-            # Generate speech using OpenAI TTS
-            response = client.audio.speech.create(
-                model="tts-1",  # Using standard model (faster than tts-1-hd)
-                voice="alloy",  # Alloy voice - natural and warm
-                input=request.text,
-                response_format="mp3"
-            )
+            # Generate speech using OpenAI TTS, streamed straight through
+            upstream = {}
             
-            # Get audio bytes
-            audio_bytes = response.content
+            async def open_speech_stream():
+                manager = client.audio.speech.with_streaming_response.create(
+                    model=TTS_MODEL,
+                    voice=TTS_VOICE,
+                    input=request.text,
+                    response_format=TTS_FORMAT
+                )
+                upstream["response"] = await manager.__aenter__()
+                return upstream["response"].iter_bytes(TTS_STREAM_CHUNK_SIZE)
             
-            logger.info(f"[{correlation_id}] TTS: Generated {len(audio_bytes)} bytes with OpenAI")
+            chunks = upstreams["tts_stream"].stream(open_speech_stream)
+            # Wait for the first chunk here so upstream errors still map to an HTTP status
+            try:
+                first_chunk = await chunks.__anext__()
+            except BaseException:
+                with anyio.CancelScope(shield=True):
+                    await chunks.aclose()
+                    if upstream.get("response") is not None:
+                        await upstream["response"].close()
+                raise
             
-            # Return audio as streaming response
             return StreamingResponse(
-                iter([audio_bytes]),
+                relay_tts_stream(correlation_id, chunks, first_chunk, upstream, key),
                 media_type="audio/mpeg",
-                headers={
-                    "X-Correlation-ID": correlation_id,
-                    "Content-Disposition": "inline; filename=speech.mp3"
-                }
+                headers={**audio_headers, "X-Cache": "MISS"}
             )
             
+        except CircuitOpenError as e:
+            logger.warning(f"[{correlation_id}] TTS: {e}")
+            raise HTTPException(
+                status_code=503,
+                detail="TTS temporarily unavailable",
+                headers={"Retry-After": str(upstreams["tts_stream"].breaker.retry_after())}
+            )
         except Exception as e:
             logger.error(f"[{correlation_id}] TTS: OpenAI TTS failed: {str(e)}")
             raise HTTPException(status_code=500, detail=f"OpenAI TTS failed: {str(e)}")
                 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"[{correlation_id}] TTS error: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"TTS failed: {str(e)}")
 
+async def build_chat_messages(request: ChatRequest, correlation_id: str) -> list:
+    """
+    Build the LLM messages array: static per-language system prompt first (cacheable prefix),
+    then the user's context, history within the token budget and the current message
+    """
+    from orchestrator import MemoryManager
+    
+    context = await MemoryManager.get_cached_user_context(request.user_id)
+    system_messages = prompt_templates.system_messages(request.lang, context)
+    messages, token_stats = assemble_messages(system_messages, request.history, request.message, lang=request.lang)
+    logger.info(
+        f"[{correlation_id}] Prompt tokens: {token_stats['total_tokens']}/{token_stats['budget']} "
+        f"(system {token_stats['system_tokens']}, history {token_stats['history_tokens']} "
+        f"[{token_stats['history_kept']} kept, {token_stats['history_dropped']} dropped], "
+        f"message {token_stats['message_tokens']})"
+    )
+    if token_stats["over_budget"]:
+        logger.warning(f"[{correlation_id}] Prompt exceeds token budget even without history")
+    return messages
+
+async def buffer_turn_for_summary(correlation_id: str, user_id: str, user_message: str, response: str):
+    """Background job: buffer the turn and queue a batch summary once the batch is full"""
+    from orchestrator import SummaryBatcher
+    
+    if SummaryBatcher.add_turn(user_id, user_message, response):
+        logger.info(f"[{correlation_id}] Lote de resumo completo para {user_id}")
+        await post_processing.submit("summary_flush", SummaryBatcher.flush, user_id, "turns")
+
+async def save_chat_turn(correlation_id: str, request: ChatRequest, response: str, risk_level: int, detected_words: list,
+                         record_risk_event: bool = True):
+    """Persist one chat turn: risk events inline, memory and conversation history in the background queue"""
+    from orchestrator import MemoryManager, RiskEventManager
+    
+    # 4. SALVAR EVENTOS DE RISCO (se houver; o caminho rápido de crise já salvou)
+    if record_risk_event and risk_level >= 2:
+        await RiskEventManager.save_risk_event(
+            request.user_id, 
+            risk_level, 
+            detected_words, 
+            request.message
+        )
+    
+    # 5. RESUMO PÓS-CONVERSA EM LOTE (fila em background, fora do caminho crítico)
+    await post_processing.submit(
+        "buffer_turn_for_summary",
+        buffer_turn_for_summary,
+        correlation_id,
+        request.user_id,
+        request.message,
+        response
+    )
+    
+    # 6. SALVAR CONVERSA NO HISTÓRICO (fila em background)
+    await post_processing.submit(
+        "save_conversation",
+        MemoryManager.save_conversation,
+        request.user_id, 
+        request.message, 
+        response, 
+        risk_level,
+        conversation_id=ObjectId()  # Fixo entre retentativas
+    )
+
+async def crisis_followup(correlation_id: str, request: ChatRequest, safety_response: str, risk_level: int, detected_words: list):
+    """
+    Background half of the crisis fast path: record the risk event right away, then ask the
+    LLM for a personalized follow-up, publish it to the follow-up store and persist the turn
+    """
+    from orchestrator import RiskEventManager
+    
+    try:
+        await RiskEventManager.save_risk_event(request.user_id, risk_level, detected_words, request.message)
+    except Exception as e:
+        logger.error(f"[{correlation_id}] Erro ao salvar evento de risco (caminho rápido): {e}", exc_info=True)
+    
+    followup = None
+    try:
+        messages = await build_chat_messages(request, correlation_id)
+        messages.append({"role": "assistant", "content": safety_response})
+        messages.append({"role": "system", "content": CRISIS_FOLLOWUP_INSTRUCTION})
+        client = get_llm_client()
+        completion = await upstreams["chat"].call(lambda: client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=messages,
+            temperature=0.7,
+            max_tokens=CRISIS_FOLLOWUP_MAX_TOKENS
+        ))
+        followup = completion.choices[0].message.content
+        if completion.usage:
+            prompt_metrics.record_usage(completion.usage)
+        logger.info(f"[{correlation_id}] Crisis follow-up ready: {(followup or '')[:50]}...")
+    except Exception as e:
+        logger.error(f"[{correlation_id}] Crisis follow-up failed: {e}", exc_info=True)
+    finally:
+        crisis_followups.resolve(correlation_id, followup)
+    
+    response = f"{safety_response}\n\n{followup}" if followup else safety_response
+    try:
+        await save_chat_turn(correlation_id, request, response, risk_level, detected_words, record_risk_event=False)
+    except Exception as e:
+        logger.error(f"[{correlation_id}] Erro ao salvar turno de crise: {e}", exc_info=True)
+
+def start_crisis_fast_path(correlation_id: str, request: ChatRequest, risk_level: int, detected_words: list) -> str:
+    """Return the prerendered safety response now; everything that touches Mongo or the LLM runs in the background"""
+    safety_response = prompt_templates.crisis_response(request.lang)
+    crisis_followups.create(correlation_id, request.user_id)
+    crisis_followups.spawn(crisis_followup(correlation_id, request, safety_response, risk_level, detected_words))
+    logger.warning(f"[{correlation_id}] Crisis fast path (level {risk_level}), follow-up queued")
+    return safety_response
+
 @app.post("/api/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest, req: Request):
     """Chat endpoint with AI-powered emotional support, memory, and risk detection"""
@@ -314,10 +578,7 @@ async def chat(request: ChatRequest, req: Request):
     
     try:
         # Import orchestrator modules
-        from orchestrator import (
-            RiskDetector, MemoryManager, RiskEventManager,
-            get_enhanced_system_prompt
-        )
+        from orchestrator import RiskDetector
         
         logger.info(f"[{correlation_id}] Received chat request: {request.message[:50]}... (user: {request.user_id}, lang: {request.lang}, history: {len(request.history)} messages)")
         
@@ -328,78 +589,48 @@ async def chat(request: ChatRequest, req: Request):
         if risk_level > 0:
             logger.warning(f"[{correlation_id}] Risco nível {risk_level} detectado: {detected_words}")
         
-        # 2. BUSCAR CONTEXTO DO USUÁRIO E INJETAR NO PROMPT
-        enhanced_prompt = get_enhanced_system_prompt(request.user_id, SYSTEM_PROMPT)
+        # Risco crítico: resposta de segurança imediata, sem esperar contexto, LLM ou Mongo
+        if risk_level >= CRISIS_FAST_PATH_LEVEL:
+            safety_response = start_crisis_fast_path(correlation_id, request, risk_level, detected_words)
+            result = ChatResponse(response=safety_response, is_crisis=True, correlation_id=correlation_id, followup_id=correlation_id)
+            return JSONResponse(content=result.dict(), headers={"X-Correlation-ID": correlation_id})
         
-        # Initialize OpenAI client
-        api_key = os.getenv("OPENAI_API_KEY") or os.getenv("EMERGENT_LLM_KEY")
-        if not api_key:
+        # Shared async OpenAI client
+        if not get_api_key():
             logger.error(f"[{correlation_id}] No API key configured")
             raise HTTPException(status_code=500, detail="API key not configured")
         
         logger.info(f"[{correlation_id}] Using API key type: {'OpenAI' if os.getenv('OPENAI_API_KEY') else 'Emergent'}")
         
-        # Build messages array with enhanced system prompt and history
-        from openai import OpenAI
-        client = OpenAI(api_key=api_key)
-        
-        messages = [{"role": "system", "content": enhanced_prompt}]
+        client = get_llm_client()
+        # Circuito aberto: fallback imediato, sem montar contexto
+        upstreams["chat"].check()
         
-        # Add conversation history (last 24h)
-        for hist_msg in request.history:
-            if hist_msg.get("role") in ["user", "assistant"]:
-                messages.append({
-                    "role": hist_msg["role"],
-                    "content": hist_msg["content"]
-                })
+        # 2. BUSCAR CONTEXTO DO USUÁRIO E MONTAR O PROMPT (prefixo estático por idioma + contexto)
+        messages = await build_chat_messages(request, correlation_id)
         
-        # Add current user message
-        messages.append({
-            "role": "user",
-            "content": request.message
-        })
-        
-        logger.info(f"[{correlation_id}] Sending to LLM with {len(messages)} messages (including enhanced system prompt)...")
+        logger.info(f"[{correlation_id}] Sending to LLM with {len(messages)} messages (including system prompt and user context)...")
         
         # 3. GET AI RESPONSE
-        completion = client.chat.completions.create(
+        completion = await upstreams["chat"].call(lambda: client.chat.completions.create(
             model="gpt-4o-mini",
             messages=messages,
             temperature=0.7,
             max_tokens=600
-        )
+        ))
         
         response = completion.choices[0].message.content
+        if completion.usage:
+            prompt_tokens, cached_tokens = prompt_metrics.record_usage(completion.usage)
+            logger.info(f"[{correlation_id}] LLM usage: {prompt_tokens} prompt ({cached_tokens} cached) / {completion.usage.completion_tokens} completion tokens")
         logger.info(f"[{correlation_id}] LLM response received: {response[:50]}...")
         
         # If crisis detected, append help resources
         if is_crisis:
-            response += "\n\n🆘 Se estiver em perigo, acione o botão SOS do app ou ligue para o número local de emergência (Brasil: 188 - CVV)."
-        
-        # 4. SALVAR EVENTOS DE RISCO (se houver)
-        if risk_level >= 2:
-            RiskEventManager.save_risk_event(
-                request.user_id, 
-                risk_level, 
-                detected_words, 
-                request.message
-            )
+            response += prompt_templates.crisis_appendix(request.lang)
         
-        # 5. GERAR RESUMO PÓS-CONVERSA (async)
-        try:
-            summary_data = await MemoryManager.generate_summary(request.message, response)
-            MemoryManager.save_memory(request.user_id, summary_data)
-            logger.info(f"[{correlation_id}] Memória salva: {summary_data.get('summary', '')[:50]}...")
-        except Exception as e:
-            logger.error(f"[{correlation_id}] Erro ao salvar memória: {e}")
-        
-        # 6. SALVAR CONVERSA NO HISTÓRICO
-        MemoryManager.save_conversation(
-            request.user_id, 
-            request.message, 
-            response, 
-            risk_level
-        )
+        # 4-6. EVENTOS DE RISCO, MEMÓRIA E HISTÓRICO (memória e histórico após a resposta)
+        await save_chat_turn(correlation_id, request, response, risk_level, detected_words)
         
         result = ChatResponse(response=response, is_crisis=is_crisis, correlation_id=correlation_id)
         
@@ -413,7 +644,7 @@ async def chat(request: ChatRequest, req: Request):
         logger.error(f"[{correlation_id}] Chat error: {str(e)}", exc_info=True)
         # Fallback response
         result = ChatResponse(
-            response="Estou aqui para você. Respire fundo. Vamos respirar juntos: Inspire por 4, segure por 4, expire por 4. Você não está sozinho.",
+            response=prompt_templates.fallback_response(request.lang),
             is_crisis=False,
             correlation_id=correlation_id
         )
@@ -423,13 +654,470 @@ async def chat(request: ChatRequest, req: Request):
             status_code=200  # Return 200 even on error to provide fallback message
         )
 
+def sse_event(event: str, data: dict) -> str:
+    """Format one Server-Sent Event frame"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.post("/api/chat/stream")
+async def chat_stream(request: ChatRequest, req: Request):
+    """
+    Streaming variant of /api/chat (Server-Sent Events).
+    
+    Events, in order:
+      meta   {correlation_id, is_crisis, risk_level}
+      token  {delta}                      (repeated, as tokens arrive)
+      done   {response, is_crisis, correlation_id}
+    On upstream failure the fallback message is sent as a single token before done.
+    Risk event, memory and conversation writes run after the stream finishes.
+    
+    Critical risk (crisis fast path): meta, the prerendered safety response as one token,
+    then followup {response} once the personalized follow-up is ready, then done.
+    """
+    correlation_id = str(uuid.uuid4())
+    from orchestrator import RiskDetector
+    
+    logger.info(f"[{correlation_id}] Received streaming chat request: {request.message[:50]}... (user: {request.user_id}, lang: {request.lang}, history: {len(request.history)} messages)")
+    
+    risk_level, detected_words = RiskDetector.detect_risk(request.message)
+    is_crisis = risk_level >= 3
+    if risk_level > 0:
+        logger.warning(f"[{correlation_id}] Risco nível {risk_level} detectado: {detected_words}")
+    
+    if risk_level >= CRISIS_FAST_PATH_LEVEL:
+        safety_response = start_crisis_fast_path(correlation_id, request, risk_level, detected_words)
+        
+        async def crisis_stream():
+            yield sse_event("meta", {"correlation_id": correlation_id, "is_crisis": True, "risk_level": risk_level, "followup_id": correlation_id})
+            yield sse_event("token", {"delta": safety_response})
+            followup = await crisis_followups.wait(correlation_id, CRISIS_STREAM_FOLLOWUP_WAIT, request.user_id)
+            if followup and followup["response"]:
+                yield sse_event("followup", {"response": followup["response"]})
+            yield sse_event("done", {"response": safety_response, "is_crisis": True, "correlation_id": correlation_id})
+        
+        # The turn is persisted by the follow-up task, independent of this connection
+        return StreamingResponse(
+            crisis_stream(),
+            media_type="text/event-stream",
+            headers={"X-Correlation-ID": correlation_id, "Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+    
+    # Filled by the generator, read by the post-stream background task
+    turn = {"response": "", "completed": False}
+    
+    async def event_stream():
+        yield sse_event("meta", {"correlation_id": correlation_id, "is_crisis": is_crisis, "risk_level": risk_level})
+        
+        try:
+            client = get_llm_client()
+            guard = upstreams["chat_stream"]
+            guard.check()
+            
+            messages = await build_chat_messages(request, correlation_id)
+            
+            parts = []
+            async for chunk in guard.stream(lambda: client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=messages,
+                temperature=0.7,
+                max_tokens=600,
+                stream=True,
+                stream_options={"include_usage": True}
+            )):
+                if chunk.usage:
+                    prompt_tokens, cached_tokens = prompt_metrics.record_usage(chunk.usage)
+                    logger.info(f"[{correlation_id}] LLM usage: {prompt_tokens} prompt ({cached_tokens} cached) / {chunk.usage.completion_tokens} completion tokens")
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parts.append(delta)
+                    yield sse_event("token", {"delta": delta})
+            
+            response = "".join(parts)
+            logger.info(f"[{correlation_id}] LLM stream finished: {response[:50]}...")
+        except Exception as e:
+            logger.error(f"[{correlation_id}] Chat stream error: {str(e)}", exc_info=True)
+            fallback = prompt_templates.fallback_response(request.lang)
+            yield sse_event("token", {"delta": fallback})
+            yield sse_event("done", {"response": fallback, "is_crisis": False, "correlation_id": correlation_id})
+            return
+        
+        if is_crisis:
+            appendix = prompt_templates.crisis_appendix(request.lang)
+            response += appendix
+            yield sse_event("token", {"delta": appendix})
+        
+        turn["response"] = response
+        turn["completed"] = True
+        yield sse_event("done", {"response": response, "is_crisis": is_crisis, "correlation_id": correlation_id})
+    
+    async def persist_turn():
+        if not turn["completed"]:
+            logger.warning(f"[{correlation_id}] Stream did not complete, skipping memory/history writes")
+            return
+        try:
+            await save_chat_turn(correlation_id, request, turn["response"], risk_level, detected_words)
+        except Exception as e:
+            logger.error(f"[{correlation_id}] Erro ao salvar turno do stream: {e}", exc_info=True)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "X-Correlation-ID": correlation_id,
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # Disable nginx proxy buffering for SSE
+        },
+        background=BackgroundTask(persist_turn)
+    )
+
+
+async def reply_text_stream(request: ChatRequest, correlation_id: str, risk_level: int, turn: dict):
+    """
+    LLM reply as text deltas for the voice endpoints. Falls back to the breathing message
+    if the upstream fails before producing text; fills turn for persistence when complete.
+    """
+    parts = []
+    try:
+        client = get_llm_client()
+        guard = upstreams["chat_stream"]
+        guard.check()
+        messages = await build_chat_messages(request, correlation_id)
+        async for chunk in guard.stream(lambda: client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=messages,
+            temperature=0.7,
+            max_tokens=600,
+            stream=True,
+            stream_options={"include_usage": True}
+        )):
+            if chunk.usage:
+                prompt_metrics.record_usage(chunk.usage)
+            if chunk.choices and chunk.choices[0].delta.content:
+                parts.append(chunk.choices[0].delta.content)
+                yield chunk.choices[0].delta.content
+    except Exception as e:
+        logger.error(f"[{correlation_id}] Voice reply error: {str(e)}", exc_info=True)
+        if not parts:
+            yield prompt_templates.fallback_response(request.lang)
+        return
+    
+    response = "".join(parts)
+    if risk_level >= 3:
+        appendix = prompt_templates.crisis_appendix(request.lang)
+        response += appendix
+        yield appendix
+    turn["response"] = response
+    turn["completed"] = True
+
+async def single_text(text: str):
+    yield text
+
+@app.post("/api/chat/speech")
+async def chat_speech(request: ChatRequest, req: Request):
+    """
+    Spoken reply to a chat message (audio/mpeg).
+    The LLM reply is streamed, cut at sentence boundaries and synthesized concurrently;
+    MP3 segments are sent in order while the rest of the reply is still being generated.
+    Critical-risk messages are answered with the prerendered safety response.
+    """
+    correlation_id = str(uuid.uuid4())
+    from orchestrator import RiskDetector
+    
+    logger.info(f"[{correlation_id}] Received speech chat request: {request.message[:50]}... (user: {request.user_id}, lang: {request.lang})")
+    
+    risk_level, detected_words = RiskDetector.detect_risk(request.message)
+    is_crisis = risk_level >= 3
+    if risk_level > 0:
+        logger.warning(f"[{correlation_id}] Risco nível {risk_level} detectado: {detected_words}")
+    
+    turn = {"response": "", "completed": False}
+    headers = {
+        "X-Correlation-ID": correlation_id,
+        "X-Is-Crisis": str(is_crisis).lower(),
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    }
+    
+    if risk_level >= CRISIS_FAST_PATH_LEVEL:
+        # The follow-up task persists the turn; its text is available from /api/chat/followup
+        text = single_text(start_crisis_fast_path(correlation_id, request, risk_level, detected_words))
+        headers["X-Followup-ID"] = correlation_id
+    else:
+        # The safety response above plays from the prerendered bundle even with the TTS provider down
+        if upstreams["tts"].breaker.is_open():
+            raise HTTPException(
+                status_code=503,
+                detail="TTS temporarily unavailable",
+                headers={"Retry-After": str(upstreams["tts"].breaker.retry_after())}
+            )
+        text = reply_text_stream(request, correlation_id, risk_level, turn)
+    
+    async def audio_stream():
+        segments = 0
+        try:
+            async for index, sentence, audio in speak(text, request.lang):
+                segments += 1
+                yield audio
+        except Exception as e:
+            # Headers are already sent: end the audio early
+            logger.error(f"[{correlation_id}] Speech reply stopped after {segments} segments: {e}")
+            return
+        logger.info(f"[{correlation_id}] Speech reply: {segments} segments")
+    
+    async def persist_turn():
+        if not turn["completed"]:
+            return
+        try:
+            await save_chat_turn(correlation_id, request, turn["response"], risk_level, detected_words)
+        except Exception as e:
+            logger.error(f"[{correlation_id}] Erro ao salvar turno falado: {e}", exc_info=True)
+    
+    return StreamingResponse(
+        audio_stream(),
+        media_type="audio/mpeg",
+        headers=headers,
+        background=BackgroundTask(persist_turn)
+    )
+
+VOICE_MAX_UTTERANCE_BYTES = int(os.getenv("VOICE_MAX_UTTERANCE_BYTES", str(10 * 1024 * 1024)))
+VOICE_SESSION_HISTORY = int(os.getenv("VOICE_SESSION_HISTORY", "20"))
+
+class VoiceSession:
+    """Server-side state of one /api/ws/voice connection: settings, history and the running turn"""
+    
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.session_id = str(uuid.uuid4())
+        self.user_id = "anonymous"
+        self.lang = resolve_language(None)
+        self.audio_format = "webm"
+        self.history: list = []
+        self.audio = bytearray()
+        self.turns = 0
+        self.turn_task: Optional[asyncio.Task] = None
+        self._send_lock = asyncio.Lock()
+    
+    def configure(self, data: dict):
+        self.user_id = data.get("user_id") or self.user_id
+        self.lang = resolve_language(data.get("lang") or self.lang)
+        self.audio_format = data.get("format") or self.audio_format
+        self.history = list(data.get("history") or self.history)[-VOICE_SESSION_HISTORY:]
+    
+    def remember(self, user_message: str, response: str):
+        self.history.append({"role": "user", "content": user_message})
+        if response:
+            self.history.append({"role": "assistant", "content": response})
+        self.history = self.history[-VOICE_SESSION_HISTORY:]
+    
+    async def send_json(self, data: dict):
+        async with self._send_lock:
+            await self.websocket.send_json(data)
+    
+    async def send_segment(self, meta: dict, audio: bytes):
+        """Segment metadata and its audio frame go out back to back"""
+        async with self._send_lock:
+            await self.websocket.send_json(meta)
+            await self.websocket.send_bytes(audio)
+    
+    def replying(self) -> bool:
+        return self.turn_task is not None and not self.turn_task.done()
+    
+    async def cancel_turn(self) -> bool:
+        """Barge-in: stop transcription, LLM and synthesis of the running turn"""
+        if not self.replying():
+            return False
+        self.turn_task.cancel()
+        try:
+            await self.turn_task
+        except BaseException:
+            pass
+        return True
+
+async def run_voice_turn(session: VoiceSession, turn_id: int, audio: Optional[bytes] = None, text: Optional[str] = None):
+    """One voice turn: transcribe (in memory), reply with the chat pipeline, stream audio segments"""
+    from orchestrator import RiskDetector
+    correlation_id = str(uuid.uuid4())
+    
+    try:
+        if audio is not None:
+            client = get_llm_client()
+            async with audio_workspace() as workspace:
+                utterance = await audio_normalizer.normalize(
+                    AudioUpload(f"speech.{session.audio_format}", f"audio/{session.audio_format}", audio), workspace
+                )
+            transcript = await upstreams["stt"].call(lambda: client.audio.transcriptions.create(
+                model="whisper-1",
+                file=utterance.as_file(),
+                response_format="verbose_json"
+            ))
+            text = (transcript.text or "").strip()
+            await session.send_json({
+                "type": "transcript", "turn_id": turn_id, "text": text,
+                "lang_detected": getattr(transcript, "language", None)
+            })
+        if not text:
+            await session.send_json({"type": "reply_end", "turn_id": turn_id, "response": ""})
+            return
+        
+        logger.info(f"[{correlation_id}] Voice turn {turn_id} ({session.session_id}): {text[:50]}...")
+        request = ChatRequest(message=text, lang=session.lang, history=list(session.history), user_id=session.user_id)
+        risk_level, detected_words = RiskDetector.detect_risk(text)
+        is_crisis = risk_level >= 3
+        if risk_level > 0:
+            logger.warning(f"[{correlation_id}] Risco nível {risk_level} detectado: {detected_words}")
+        
+        turn = {"response": "", "completed": False}
+        start = {"type": "reply_start", "turn_id": turn_id, "correlation_id": correlation_id,
+                 "is_crisis": is_crisis, "risk_level": risk_level}
+        if risk_level >= CRISIS_FAST_PATH_LEVEL:
+            # The follow-up task persists this turn; the follow-up text comes from /api/chat/followup
+            reply = single_text(start_crisis_fast_path(correlation_id, request, risk_level, detected_words))
+            start["followup_id"] = correlation_id
+        else:
+            reply = reply_text_stream(request, correlation_id, risk_level, turn)
+        await session.send_json(start)
+        
+        spoken = []
+        async for index, sentence, segment in speak(reply, session.lang):
+            spoken.append(sentence)
+            await session.send_segment({"type": "segment", "turn_id": turn_id, "index": index, "text": sentence}, segment)
+        
+        response = turn["response"] or " ".join(spoken)
+        session.remember(text, response)
+        await session.send_json({"type": "reply_end", "turn_id": turn_id, "response": response})
+        if turn["completed"]:
+            await save_chat_turn(correlation_id, request, turn["response"], risk_level, detected_words)
+    except asyncio.CancelledError:
+        # Barge-in: keep what the user said so the next turn has the context
+        if text:
+            session.remember(text, "")
+        raise
+    except CircuitOpenError as e:
+        logger.warning(f"[{correlation_id}] Voice turn {turn_id}: {e}")
+        await session.send_json({"type": "error", "turn_id": turn_id, "code": "unavailable", "message": str(e)})
+    except Exception as e:
+        logger.error(f"[{correlation_id}] Voice turn {turn_id} error: {str(e)}", exc_info=True)
+        await session.send_json({"type": "error", "turn_id": turn_id, "code": "turn_failed", "message": "Voice turn failed"})
+
+@app.websocket("/api/ws/voice")
+async def voice_session(websocket: WebSocket):
+    """
+    Full-duplex voice session.
+    
+    Client -> server:
+      {"type": "start", "user_id", "lang", "format", "history"?}   session settings (optional)
+      <binary>                                                     audio chunk of the current utterance
+      {"type": "end_of_speech"}                                    transcribe the buffered audio and reply
+      {"type": "text", "message"}                                  typed turn (no transcription)
+      {"type": "cancel"}                                           barge-in: stop the current reply
+      {"type": "end"}                                              close the session
+    Audio arriving while Luna is replying is treated as barge-in (clients send audio only on detected speech).
+    
+    Server -> client:
+      ready {session_id}, transcript {turn_id, text, lang_detected},
+      reply_start {turn_id, correlation_id, is_crisis, risk_level, followup_id?},
+      segment {turn_id, index, text} followed by one binary frame with its MP3 audio,
+      reply_end {turn_id, response}, cancelled {turn_id}, error {turn_id?, code, message}
+    """
+    await websocket.accept()
+    session = VoiceSession(websocket)
+    logger.info(f"Voice session {session.session_id} opened")
+    await session.send_json({"type": "ready", "session_id": session.session_id})
+    
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            
+            chunk = message.get("bytes")
+            if chunk is not None:
+                if session.replying() and await session.cancel_turn():
+                    await session.send_json({"type": "cancelled", "turn_id": session.turns})
+                if len(session.audio) + len(chunk) > VOICE_MAX_UTTERANCE_BYTES:
+                    session.audio.clear()
+                    await session.send_json({"type": "error", "code": "utterance_too_large",
+                                             "message": f"Utterance exceeds {VOICE_MAX_UTTERANCE_BYTES} bytes"})
+                    continue
+                session.audio.extend(chunk)
+                continue
+            
+            try:
+                data = json.loads(message.get("text") or "{}")
+            except json.JSONDecodeError:
+                await session.send_json({"type": "error", "code": "bad_message", "message": "Invalid JSON"})
+                continue
+            kind = data.get("type")
+            
+            if kind == "start":
+                session.configure(data)
+            elif kind in ("end_of_speech", "text"):
+                audio = bytes(session.audio) if kind == "end_of_speech" else None
+                text = (data.get("message") or "").strip() if kind == "text" else None
+                session.audio.clear()
+                if not audio and not text:
+                    await session.send_json({"type": "error", "code": "empty_turn", "message": "No audio or text to reply to"})
+                    continue
+                if await session.cancel_turn():
+                    await session.send_json({"type": "cancelled", "turn_id": session.turns})
+                session.turns += 1
+                session.turn_task = asyncio.create_task(run_voice_turn(session, session.turns, audio=audio, text=text))
+                # Sends fail once the client is gone; don't leave the error unretrieved
+                session.turn_task.add_done_callback(lambda task: task.cancelled() or task.exception())
+            elif kind == "cancel":
+                session.audio.clear()
+                if await session.cancel_turn():
+                    await session.send_json({"type": "cancelled", "turn_id": session.turns})
+            elif kind == "end":
+                break
+            else:
+                await session.send_json({"type": "error", "code": "bad_message", "message": f"Unknown message type: {kind}"})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await session.cancel_turn()
+        if session.turns:
+            from orchestrator import SummaryBatcher
+            await post_processing.submit("summary_flush", SummaryBatcher.flush, session.user_id, "session_end")
+        logger.info(f"Voice session {session.session_id} closed after {session.turns} turns")
+    
+    try:
+        await websocket.close()
+    except RuntimeError:
+        pass  # Already closed by the client
+
+@app.get("/api/chat/followup/{followup_id}")
+async def chat_followup(followup_id: str, user_id: str, wait: float = 0):
+    """
+    Personalized follow-up for a crisis fast-path reply, only for the user who sent the message
+    (404 for anyone else). Long-poll with ?wait=<seconds> (max 30); status is pending, ready or failed.
+    """
+    followup = await crisis_followups.wait(followup_id, min(max(wait, 0), 30), user_id)
+    if followup is None:
+        raise HTTPException(status_code=404, detail="Follow-up not found or expired")
+    return {"followup_id": followup_id, **followup}
+
+class ChatSessionEndRequest(BaseModel):
+    user_id: str
+
+@app.post("/api/chat/session-end")
+async def chat_session_end(request: ChatSessionEndRequest):
+    """Signal the end of a chat session so buffered turns are summarized now"""
+    try:
+        from orchestrator import SummaryBatcher
+        await post_processing.submit("summary_flush", SummaryBatcher.flush, request.user_id, "session_end")
+        return {"success": True, "user_id": request.user_id}
+    except Exception as e:
+        logger.error(f"Error ending chat session: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/user-context/{user_id}")
 async def get_user_context_endpoint(user_id: str):
     """Debug endpoint to view user context"""
     try:
         from orchestrator import MemoryManager
-        context = MemoryManager.get_user_context(user_id)
+        context = await MemoryManager.get_user_context(user_id)
         return {"user_id": user_id, "context": context}
     except Exception as e:
         logger.error(f"Error getting user context: {e}")
@@ -440,9 +1128,9 @@ async def get_user_memories(user_id: str):
     """Get user's conversation memories"""
     try:
         from orchestrator import ai_memories_collection
-        memories = list(ai_memories_collection.find(
+        memories = await ai_memories_collection.find(
             {"user_id": user_id}
-        ).sort("created_at", -1).limit(10))
+        ).sort("created_at", -1).limit(10).to_list(10)
         
         # Convert ObjectId to string
         for mem in memories:
@@ -459,9 +1147,9 @@ async def get_risk_events(user_id: str):
     """Get user's risk events"""
     try:
         from orchestrator import risk_events_collection
-        events = list(risk_events_collection.find(
+        events = await risk_events_collection.find(
             {"user_id": user_id}
-        ).sort("created_at", -1).limit(10))
+        ).sort("created_at", -1).limit(10).to_list(10)
         
         # Convert ObjectId to string
         for event in events:
@@ -490,7 +1178,7 @@ async def log_mood(request: MoodLogRequest):
     """Log user mood (1-5)"""
     try:
         from orchestrator import MoodTracker
-        MoodTracker.log_mood(request.user_id, request.mood_value, request.note)
+        await MoodTracker.log_mood(request.user_id, request.mood_value, request.note)
         return {"success": True, "mood": request.mood_value}
     except Exception as e:
         logger.error(f"Error logging mood: {e}")
@@ -501,7 +1189,7 @@ async def get_mood_trend(user_id: str, days: int = 7):
     """Get mood trend for last N days"""
     try:
         from orchestrator import MoodTracker
-        trend = MoodTracker.get_mood_trend(user_id, days)
+        trend = await MoodTracker.get_mood_trend(user_id, days)
         return {"user_id": user_id, "trend": trend}
     except Exception as e:
         logger.error(f"Error getting mood trend: {e}")
@@ -519,7 +1207,7 @@ async def track_technique(request: TechniqueTrackRequest):
     """Track technique usage and effectiveness"""
     try:
         from orchestrator import TechniqueTracker
-        TechniqueTracker.track_technique(
+        await TechniqueTracker.track_technique(
             request.user_id, 
             request.technique, 
             request.effectiveness, 
@@ -535,7 +1223,7 @@ async def get_best_techniques(user_id: str, limit: int = 5):
     """Get user's most effective techniques"""
     try:
         from orchestrator import TechniqueTracker
-        techniques = TechniqueTracker.get_best_techniques(user_id, limit)
+        techniques = await TechniqueTracker.get_best_techniques(user_id, limit)
         return {"user_id": user_id, "techniques": techniques}
     except Exception as e:
         logger.error(f"Error getting best techniques: {e}")
@@ -554,7 +1242,7 @@ async def log_session(request: SessionLogRequest):
     """Log completed guided session"""
     try:
         from orchestrator import SessionManager
-        SessionManager.log_session(
+        await SessionManager.log_session(
             request.user_id,
             request.session_id,
             request.duration_seconds,
@@ -571,8 +1259,10 @@ async def get_sessions(user_id: str, limit: int = 10):
     """Get user's recent sessions"""
     try:
         from orchestrator import SessionManager
-        sessions = SessionManager.get_recent_sessions(user_id, limit)
-        stats = SessionManager.get_session_stats(user_id)
+        sessions, stats = await asyncio.gather(
+            SessionManager.get_recent_sessions(user_id, limit),
+            SessionManager.get_session_stats(user_id)
+        )
         return {
             "user_id": user_id,
             "sessions": sessions,
@@ -595,7 +1285,7 @@ async def create_journal_entry(request: JournalCreateRequest):
     """Create new journal entry"""
     try:
         from orchestrator import JournalManager
-        entry_id = JournalManager.create_entry(
+        entry_id = await JournalManager.create_entry(
             request.user_id,
             request.title,
             request.content,
@@ -612,8 +1302,10 @@ async def get_journal_entries(user_id: str, limit: int = 20, tag: str = None):
     """Get user's journal entries"""
     try:
         from orchestrator import JournalManager
-        entries = JournalManager.get_entries(user_id, limit, tag)
-        common_tags = JournalManager.get_common_tags(user_id)
+        entries, common_tags = await asyncio.gather(
+            JournalManager.get_entries(user_id, limit, tag),
+            JournalManager.get_common_tags(user_id)
+        )
         return {
             "user_id": user_id,
             "entries": entries,
@@ -634,7 +1326,7 @@ async def get_subscription_status(user_id: str):
     """Get user subscription status"""
     try:
         from orchestrator import SubscriptionManager
-        status = SubscriptionManager.check_premium_status(user_id)
+        status = await SubscriptionManager.check_premium_status(user_id)
         return {"user_id": user_id, "subscription": status}
     except Exception as e:
         logger.error(f"Error getting subscription: {e}")
@@ -646,7 +1338,7 @@ async def get_global_stats():
     """Get global platform statistics (admin only)"""
     try:
         from orchestrator import AnalyticsManager
-        stats = AnalyticsManager.get_global_stats()
+        stats = await AnalyticsManager.get_global_stats()
         return {"stats": stats}
     except Exception as e:
         logger.error(f"Error getting stats: {e}")
@@ -657,7 +1349,7 @@ async def get_popular_sessions():
     """Get most popular guided sessions"""
     try:
         from orchestrator import AnalyticsManager
-        sessions = AnalyticsManager.get_popular_sessions()
+        sessions = await AnalyticsManager.get_popular_sessions()
         return {"sessions": sessions}
     except Exception as e:
         logger.error(f"Error getting popular sessions: {e}")
@@ -668,12 +1360,23 @@ async def get_mood_distribution():
     """Get mood distribution across platform"""
     try:
         from orchestrator import AnalyticsManager
-        distribution = AnalyticsManager.get_mood_distribution()
+        distribution = await AnalyticsManager.get_mood_distribution()
         return distribution
     except Exception as e:
         logger.error(f"Error getting mood distribution: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/admin/indexes")
+async def get_index_report():
+    """Report missing, undeclared and unused MongoDB indexes against the query-shape registry"""
+    try:
+        from orchestrator import IndexManager
+        report = await IndexManager.report()
+        return {"indexes": report}
+    except Exception as e:
+        logger.error(f"Error building index report: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 # Website Contact Form Endpoint
 class ContactRequest(BaseModel):
     name: str
@@ -723,7 +1426,7 @@ async def trigger_sos(request: SOSTriggerRequest):
     """Trigger SOS protocol"""
     try:
         from orchestrator import SOSManager
-        event_id = SOSManager.trigger_sos(
+        event_id = await SOSManager.trigger_sos(
             request.user_id,
             request.location,
             request.notes
@@ -742,7 +1445,7 @@ async def get_emergency_contacts(user_id: str):
     """Get user's emergency contacts"""
     try:
         from orchestrator import SOSManager
-        contacts = SOSManager.get_emergency_contacts(user_id)
+        contacts = await SOSManager.get_emergency_contacts(user_id)
         return {"user_id": user_id, "contacts": contacts}
     except Exception as e:
         logger.error(f"Error getting emergency contacts: {e}")
@@ -758,7 +1461,7 @@ async def add_emergency_contact(request: EmergencyContactRequest):
     """Add emergency contact"""
     try:
         from orchestrator import SOSManager
-        SOSManager.add_emergency_contact(
+        await SOSManager.add_emergency_contact(
             request.user_id,
             request.name,
             request.phone
@@ -797,11 +1500,11 @@ async def get_mood_audio(mood_value: int):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/audio/sos")
-async def get_sos_audio():
-    """Get audio configuration for SOS protocol"""
+async def get_sos_audio(lang: Optional[str] = None):
+    """Get audio configuration for SOS protocol (the spoken safety message follows lang, default pt-BR)"""
     try:
         from orchestrator import AudioManager
-        config = AudioManager.get_sos_audio_config()
+        config = AudioManager.get_sos_audio_config(resolve_language(lang))
         return {"audio": config}
     except Exception as e:
         logger.error(f"Error getting SOS audio: {e}")
@@ -840,7 +1543,7 @@ async def log_audio_event(request: AudioEventRequest):
     """Log audio playback event"""
     try:
         from orchestrator import AudioManager
-        AudioManager.log_audio_event(
+        await AudioManager.log_audio_event(
             request.user_id,
             request.event_type,
             request.track,
@@ -856,7 +1559,7 @@ async def get_sos_history(user_id: str, limit: int = 10):
     """Get SOS event history"""
     try:
         from orchestrator import SOSManager
-        history = SOSManager.get_sos_history(user_id, limit)
+        history = await SOSManager.get_sos_history(user_id, limit)
         return {"user_id": user_id, "history": history}
     except Exception as e:
         logger.error(f"Error getting SOS history: {e}")
@@ -0,0 +1,155 @@
+"""
+EaseMind Speech Pipeline - Resposta falada frase a frase
+Recebe o texto do LLM em streaming, corta em fronteiras de frase e sintetiza as
+frases em paralelo (pool limitado), devolvendo o áudio na ordem original enquanto
+o restante da resposta ainda está sendo gerado.
+"""
+
+import os
+import re
+import asyncio
+import logging
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from llm_client import get_llm_client
+from resilience import upstreams, CircuitOpenError
+from tts_cache import tts_cache, cache_key
+from tts_bundle import audio_bundle
+
+logger = logging.getLogger(__name__)
+
+TTS_MODEL = "tts-1"  # Modelo padrão (mais rápido que tts-1-hd)
+TTS_VOICE = "alloy"  # Voz Alloy - natural e acolhedora
+TTS_FORMAT = "mp3"
+
+SPEECH_PIPELINE_CONCURRENCY = int(os.getenv("SPEECH_PIPELINE_CONCURRENCY", "3"))
+# Quantas frases podem estar sintetizadas/em síntese à frente da que está sendo enviada
+SPEECH_PIPELINE_MAX_AHEAD = int(os.getenv("SPEECH_PIPELINE_MAX_AHEAD", "4"))
+# Frases muito curtas ("Ok.") são juntadas à seguinte para evitar sínteses minúsculas
+SPEECH_MIN_SENTENCE_CHARS = int(os.getenv("SPEECH_MIN_SENTENCE_CHARS", "20"))
+
+_SENTENCE_END = re.compile(r"(?<=[.!?…])[\"')\]]*\s+|\n+")
+
+_synthesis_slots: Optional[asyncio.Semaphore] = None
+
+
+def split_sentences(buffer: str, min_chars: int = SPEECH_MIN_SENTENCE_CHARS) -> Tuple[List[str], str]:
+    """
+    Separa as frases completas do buffer
+
+    Returns:
+        (frases completas, resto ainda sem fim de frase)
+    """
+    sentences = []
+    start = 0
+    for match in _SENTENCE_END.finditer(buffer):
+        candidate = buffer[start:match.end()].strip()
+        if len(candidate) < min_chars:
+            continue  # Junta com a próxima frase
+        sentences.append(candidate)
+        start = match.end()
+    return sentences, buffer[start:]
+
+
+async def _synthesize_upstream(text: str) -> bytes:
+    global _synthesis_slots
+    if _synthesis_slots is None:
+        _synthesis_slots = asyncio.Semaphore(SPEECH_PIPELINE_CONCURRENCY)
+    async with _synthesis_slots:
+        client = get_llm_client()
+        response = await upstreams["tts"].call(lambda: client.audio.speech.create(
+            model=TTS_MODEL,
+            voice=TTS_VOICE,
+            input=text,
+            response_format=TTS_FORMAT
+        ))
+    return response.content
+
+
+async def synthesize(text: str, lang: str) -> bytes:
+    """Áudio de uma frase: bundle pré-renderizado, cache em disco, depois TTS (com prazo e breaker)"""
+    bundled = await asyncio.to_thread(audio_bundle.open_text, text, TTS_VOICE, TTS_MODEL, TTS_FORMAT)
+    if bundled is not None:
+        with bundled:
+            return await asyncio.to_thread(bundled.read)
+
+    key = cache_key(text, TTS_VOICE, TTS_MODEL, TTS_FORMAT, lang)
+    cached = await asyncio.to_thread(tts_cache.open, key, TTS_FORMAT)
+    if cached is not None:
+        with cached:
+            return await asyncio.to_thread(cached.read)
+
+    audio = await _synthesize_upstream(text)
+    try:
+        await asyncio.to_thread(tts_cache.put, key, TTS_FORMAT, audio)
+    except Exception as e:
+        logger.warning(f"TTS cache write failed: {e}")
+    return audio
+
+
+async def _synthesize_segment(index: int, text: str, lang: str) -> Tuple[int, str, Optional[bytes]]:
+    """Uma falha isolada pula a frase em vez de encerrar a resposta inteira"""
+    try:
+        return index, text, await synthesize(text, lang)
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        logger.error(f"Speech segment {index} failed, skipping: {e}")
+        return index, text, None
+
+
+async def speak(deltas: AsyncIterator[str], lang: str) -> AsyncIterator[Tuple[int, str, bytes]]:
+    """
+    Converte um stream de texto em segmentos de áudio ordenados
+
+    Yields:
+        (índice, texto da frase, áudio) na ordem do texto
+    """
+    pending: asyncio.Queue = asyncio.Queue(maxsize=SPEECH_PIPELINE_MAX_AHEAD)
+
+    async def produce():
+        index = 0
+        buffer = ""
+        try:
+            async for delta in deltas:
+                buffer += delta
+                sentences, buffer = split_sentences(buffer)
+                for sentence in sentences:
+                    await pending.put(asyncio.ensure_future(_synthesize_segment(index, sentence, lang)))
+                    index += 1
+            if buffer.strip():
+                await pending.put(asyncio.ensure_future(_synthesize_segment(index, buffer.strip(), lang)))
+        finally:
+            await pending.put(None)
+
+    producer = asyncio.ensure_future(produce())
+    try:
+        while True:
+            segment = await pending.get()
+            if segment is None:
+                break
+            index, text, audio = await segment
+            if audio:
+                yield index, text, audio
+        await producer  # Propaga erros do stream de texto
+    finally:
+        # Cancelamento (cliente saiu, barge-in) ou erro: descarta o que ainda está em andamento
+        producer.cancel()
+        while not pending.empty():
+            segment = pending.get_nowait()
+            if segment is not None:
+                segment.cancel()
+
+
+async def prerender_static_audio(phrases: Dict[str, Dict[str, str]]) -> Dict:
+    """
+    Renderiza as frases fixas no bundle: o texto inteiro (para /api/tts e /api/tts/static)
+    e cada frase como o pipeline as corta (para as respostas faladas frase a frase)
+    """
+    units = {}
+    for phrase_id, languages in phrases.items():
+        units[phrase_id] = {}
+        for lang, text in languages.items():
+            sentences, rest = split_sentences(text.strip() + "\n")
+            units[phrase_id][lang] = [text] + [s for s in sentences + [rest] if s.strip() and s.strip() != text.strip()]
+    return await audio_bundle.prerender(units, _synthesize_upstream, TTS_VOICE, TTS_MODEL, TTS_FORMAT)
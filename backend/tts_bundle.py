@@ -0,0 +1,227 @@
+"""
+EaseMind TTS Bundle - Áudio pré-renderizado das frases fixas da Luna
+Fallback, apêndice de crise e mensagens de segurança (SOS) são textos fixos: são
+sintetizados uma vez (no deploy ou no startup) para um diretório com manifest.json
+e servidos direto do disco, sem passar pelo TTS — continuam tocando com o provedor fora.
+Ao contrário do cache LRU, o bundle nunca é removido por falta de espaço.
+"""
+
+import os
+import json
+import asyncio
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+from pathlib import Path
+from typing import Awaitable, BinaryIO, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+TTS_BUNDLE_DIR = Path(os.getenv("TTS_BUNDLE_DIR", str(Path(__file__).parent / "tts_bundle")))
+TTS_BUNDLE_ENABLED = os.getenv("TTS_BUNDLE_ENABLED", "true").lower() in ("1", "true", "yes")
+# Sintetiza no startup o que faltar no bundle (desligar quando o bundle vem pronto do deploy)
+TTS_BUNDLE_PRERENDER = os.getenv("TTS_BUNDLE_PRERENDER", "true").lower() in ("1", "true", "yes")
+# Arquivos mais novos que isso podem ser de outro worker renderizando o bundle ao mesmo tempo
+TTS_BUNDLE_ORPHAN_GRACE_SECONDS = float(os.getenv("TTS_BUNDLE_ORPHAN_GRACE_SECONDS", "600"))
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+
+def bundle_key(text: str, voice: str, model: str, audio_format: str) -> str:
+    """O áudio depende só do texto e da voz, não do idioma da requisição"""
+    payload = json.dumps([text.strip(), voice, model, audio_format], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _write_atomic(path: Path, data: bytes):
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-", suffix=path.suffix)
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            handle.write(data)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+
+
+class AudioBundle:
+    """Manifest (frase → idioma → arquivo) e índice por chave de conteúdo sobre o diretório do bundle"""
+
+    def __init__(self, directory: Path = TTS_BUNDLE_DIR, enabled: bool = TTS_BUNDLE_ENABLED):
+        self.directory = directory
+        self.enabled = enabled
+        self._manifest: Dict = {"version": MANIFEST_VERSION, "phrases": {}, "files": {}}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "rendered": 0, "render_failures": 0}
+
+    def load(self) -> "AudioBundle":
+        """Lê o manifest, descartando entradas cujo arquivo sumiu"""
+        if not self.enabled:
+            return self
+        path = self.directory / MANIFEST_NAME
+        try:
+            manifest = json.loads(path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            logger.info(f"TTS bundle empty: no manifest in {self.directory}")
+            return self
+        except (OSError, ValueError) as e:
+            logger.error(f"TTS bundle manifest unreadable, ignoring it: {e}")
+            return self
+        files = {
+            key: entry for key, entry in manifest.get("files", {}).items()
+            if (self.directory / entry["file"]).is_file()
+        }
+        manifest["files"] = files
+        with self._lock:
+            self._manifest = manifest
+        logger.info(f"TTS bundle ready: {len(files)} files, generated {manifest.get('generated_at', '?')}")
+        return self
+
+    def _open(self, key: str) -> Optional[BinaryIO]:
+        with self._lock:
+            entry = self._manifest["files"].get(key)
+        if entry is None:
+            return None
+        try:
+            handle = open(self.directory / entry["file"], "rb")
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            self._stats["hits"] += 1
+        return handle
+
+    def open_text(self, text: str, voice: str, model: str, audio_format: str) -> Optional[BinaryIO]:
+        """Abre o áudio pré-renderizado deste texto exato (ou None)"""
+        if not self.enabled:
+            return None
+        return self._open(bundle_key(text, voice, model, audio_format))
+
+    def open_phrase(self, phrase_id: str, lang: str) -> Optional[BinaryIO]:
+        """
+        Abre uma frase do manifest no idioma pedido
+
+        Frases com um único idioma (ex.: fallback em pt-BR) são servidas nesse idioma,
+        igual ao texto que o chat devolve.
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            languages = self._manifest["phrases"].get(phrase_id, {})
+        key = languages.get(lang) or (next(iter(languages.values())) if len(languages) == 1 else None)
+        return self._open(key) if key else None
+
+    async def prerender(self, phrases: Dict[str, Dict[str, List[str]]],
+                        synthesize: Callable[[str], Awaitable[bytes]],
+                        voice: str, model: str, audio_format: str) -> Dict:
+        """
+        Sintetiza o que falta no bundle e regrava o manifest
+
+        Args:
+            phrases: frase → idioma → textos (o texto inteiro e, opcionalmente, suas frases
+                     na segmentação do pipeline de fala, para acertos frase a frase)
+            synthesize: texto → áudio (chamada ao TTS)
+        Returns:
+            {rendered, reused, failed}
+        """
+        if not self.enabled:
+            return {"rendered": 0, "reused": 0, "failed": 0}
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            previous = dict(self._manifest["files"])
+            previous_phrases = {phrase_id: dict(languages) for phrase_id, languages in self._manifest["phrases"].items()}
+        files: Dict[str, Dict] = {}
+        phrase_index: Dict[str, Dict[str, str]] = {}
+        summary = {"rendered": 0, "reused": 0, "failed": 0}
+
+        for phrase_id, languages in phrases.items():
+            for lang, texts in languages.items():
+                for position, text in enumerate(texts):
+                    key = bundle_key(text, voice, model, audio_format)
+                    if position == 0:
+                        phrase_index.setdefault(phrase_id, {})[lang] = key
+                    if key in files:
+                        continue
+                    if key in previous:
+                        files[key] = previous[key]
+                        summary["reused"] += 1
+                        continue
+                    try:
+                        audio = await synthesize(text.strip())
+                    except Exception as e:
+                        # Mantém o que já existe; a próxima execução tenta de novo
+                        logger.warning(f"TTS bundle: could not render {phrase_id}/{lang}: {e}")
+                        summary["failed"] += 1
+                        continue
+                    filename = f"{key}.{audio_format}"
+                    await asyncio.to_thread(_write_atomic, self.directory / filename, audio)
+                    files[key] = {"file": filename, "phrase": phrase_id, "lang": lang,
+                                  "text": text.strip(), "bytes": len(audio)}
+                    summary["rendered"] += 1
+
+        # Texto alterado que não renderizou: mantém o áudio anterior (melhor que ficar sem SOS)
+        for phrase_id, languages in phrase_index.items():
+            for lang, key in list(languages.items()):
+                if key in files:
+                    continue
+                old_key = previous_phrases.get(phrase_id, {}).get(lang)
+                if old_key in previous:
+                    languages[lang] = old_key
+                    files[old_key] = previous[old_key]
+                else:
+                    del languages[lang]
+        manifest = {
+            "version": MANIFEST_VERSION,
+            "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "voice": voice,
+            "model": model,
+            "format": audio_format,
+            "phrases": phrase_index,
+            "files": files
+        }
+        await asyncio.to_thread(
+            _write_atomic, self.directory / MANIFEST_NAME,
+            json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8")
+        )
+        with self._lock:
+            self._manifest = manifest
+            self._stats["rendered"] += summary["rendered"]
+            self._stats["render_failures"] += summary["failed"]
+        await asyncio.to_thread(self._remove_orphans, set(entry["file"] for entry in files.values()))
+        logger.info(f"TTS bundle prerendered: {summary}")
+        return summary
+
+    def _remove_orphans(self, keep: set):
+        """
+        Remove áudios de textos que saíram do bundle (e temporários de escritas interrompidas)
+
+        Com vários workers, cada um roda o prerender no boot: temporários (.tmp-) e arquivos
+        recentes podem ser escritas em andamento de outro worker, então só saem após a carência.
+        """
+        cutoff = time.time() - TTS_BUNDLE_ORPHAN_GRACE_SECONDS
+        for path in self.directory.iterdir():
+            if path.name == MANIFEST_NAME or path.name in keep:
+                continue
+            try:
+                if not path.is_file() or path.stat().st_mtime > cutoff:
+                    continue
+            except FileNotFoundError:
+                continue
+            path.unlink(missing_ok=True)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                **self._stats,
+                "files": len(self._manifest["files"]),
+                "bytes": sum(entry.get("bytes", 0) for entry in self._manifest["files"].values()),
+                "phrases": {phrase_id: sorted(languages) for phrase_id, languages in self._manifest["phrases"].items()},
+                "generated_at": self._manifest.get("generated_at")
+            }
+
+
+audio_bundle = AudioBundle()
@@ -0,0 +1,190 @@
+"""
+EaseMind TTS Cache - Cache em disco do áudio sintetizado, endereçado por conteúdo
+A chave é o hash de (texto, voz, modelo, formato, idioma); frases repetidas da Luna
+(respiração, fallback, apêndice de crise) voltam do disco sem nova síntese.
+Escritas atômicas (arquivo temporário + rename), limite de tamanho com remoção LRU
+e arquivos servidos em blocos, sem carregar o áudio inteiro em memória.
+"""
+
+import os
+import json
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+TTS_CACHE_DIR = Path(os.getenv("TTS_CACHE_DIR", str(Path(tempfile.gettempdir()) / "easemind-tts-cache")))
+TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+TTS_CACHE_ENABLED = os.getenv("TTS_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+TTS_CACHE_CHUNK_SIZE = 64 * 1024
+
+
+def cache_key(text: str, voice: str, model: str, audio_format: str, lang: str) -> str:
+    payload = json.dumps([text, voice, model, audio_format, lang], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def iter_file(handle: BinaryIO, chunk_size: int = TTS_CACHE_CHUNK_SIZE) -> Iterator[bytes]:
+    """Lê o arquivo já aberto em blocos (o Starlette itera geradores síncronos em threadpool)"""
+    try:
+        while True:
+            chunk = handle.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        handle.close()
+
+
+class CacheWriter:
+    """Escrita incremental em arquivo temporário; só vira entrada do cache no commit()"""
+
+    def __init__(self, cache: "TtsCache", key: str, audio_format: str):
+        self.cache = cache
+        self.key = key
+        self.audio_format = audio_format
+        self.size = 0
+        directory = cache.path_for(key, audio_format).parent
+        directory.mkdir(parents=True, exist_ok=True)
+        fd, self._tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=f".{audio_format}")
+        self._file = os.fdopen(fd, "wb")
+
+    def write(self, chunk: bytes):
+        self._file.write(chunk)
+        self.size += len(chunk)
+
+    def commit(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        path = self.cache.path_for(self.key, self.audio_format)
+        os.replace(self._tmp_path, path)
+        self.cache._admit(path, self.size)
+
+    def abort(self):
+        self._file.close()
+        try:
+            os.unlink(self._tmp_path)
+        except FileNotFoundError:
+            pass
+
+
+class TtsCache:
+    """Índice LRU em memória (arquivo → tamanho) sobre os arquivos do diretório do cache"""
+
+    def __init__(self, directory: Path = TTS_CACHE_DIR, max_bytes: int = TTS_CACHE_MAX_BYTES,
+                 enabled: bool = TTS_CACHE_ENABLED):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._entries: "OrderedDict[Path, int]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0, "bytes_served": 0}
+
+    def path_for(self, key: str, audio_format: str) -> Path:
+        return self.directory / key[:2] / f"{key}.{audio_format}"
+
+    def load(self) -> "TtsCache":
+        """Reconstrói o índice a partir do disco (ordem LRU pelo mtime) e remove temporários órfãos"""
+        if not self.enabled:
+            return self
+        self.directory.mkdir(parents=True, exist_ok=True)
+        found = []
+        for path in self.directory.glob("*/*"):
+            if path.name.startswith(".tmp-"):
+                path.unlink(missing_ok=True)
+                continue
+            stat = path.stat()
+            found.append((stat.st_mtime, path, stat.st_size))
+        found.sort()
+        with self._lock:
+            self._entries = OrderedDict((path, size) for _, path, size in found)
+            self._bytes = sum(size for _, _, size in found)
+        self._evict()
+        logger.info(f"TTS cache ready: {len(self._entries)} files, {self._bytes} bytes in {self.directory}")
+        return self
+
+    def open(self, key: str, audio_format: str) -> Optional[BinaryIO]:
+        """
+        Abre o áudio em cache (ou None em miss)
+
+        O arquivo é aberto aqui: uma remoção concorrente pelo LRU não afeta quem já está lendo.
+        """
+        if not self.enabled:
+            return None
+        path = self.path_for(key, audio_format)
+        with self._lock:
+            size = self._entries.get(path)
+            if size is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(path)
+            self._stats["hits"] += 1
+            self._stats["bytes_served"] += size
+        try:
+            handle = open(path, "rb")
+            os.utime(path)  # Preserva a ordem LRU entre reinícios
+            return handle
+        except FileNotFoundError:
+            with self._lock:
+                self._forget(path)
+            return None
+
+    def writer(self, key: str, audio_format: str) -> Optional[CacheWriter]:
+        return CacheWriter(self, key, audio_format) if self.enabled else None
+
+    def put(self, key: str, audio_format: str, data: bytes):
+        writer = self.writer(key, audio_format)
+        if writer is None:
+            return
+        try:
+            writer.write(data)
+            writer.commit()
+        except Exception:
+            writer.abort()
+            raise
+
+    def _forget(self, path: Path):
+        size = self._entries.pop(path, None)
+        if size is not None:
+            self._bytes -= size
+
+    def _admit(self, path: Path, size: int):
+        with self._lock:
+            self._forget(path)
+            self._entries[path] = size
+            self._bytes += size
+            self._stats["writes"] += 1
+        self._evict()
+
+    def _evict(self):
+        """Remove os menos usados até caber no limite"""
+        while True:
+            with self._lock:
+                if self._bytes <= self.max_bytes or not self._entries:
+                    return
+                path, size = self._entries.popitem(last=False)
+                self._bytes -= size
+                self._stats["evictions"] += 1
+            path.unlink(missing_ok=True)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                "enabled": self.enabled,
+                **self._stats,
+                "hit_ratio": round(self._stats["hits"] / lookups, 3) if lookups else 0,
+                "files": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes
+            }
+
+
+tts_cache = TtsCache()
@@ -0,0 +1,100 @@
+"""
+Fixtures compartilhadas dos testes do backend
+
+Os módulos do backend são importados como no servidor (diretório backend/ no path)
+e o MongoDB é substituído por um banco em memória (mongomock-motor).
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+
+@pytest.fixture
+def mongo(monkeypatch):
+    """Banco easemind em memória no lugar do cliente Motor do orchestrator"""
+    pytest.importorskip("emergentintegrations")
+    from mongomock_motor import AsyncMongoMockClient
+    import orchestrator
+
+    database = AsyncMongoMockClient().easemind
+    monkeypatch.setattr(orchestrator, "get_database", lambda: database)
+    return database
+
+
+@pytest.fixture
+def api(mongo):
+    """Cliente HTTP da API (sem o lifespan: nada de TTS, índices ou LLM reais no startup)"""
+    from fastapi.testclient import TestClient
+    import server
+
+    return TestClient(server.app)
+
+
+# ffprobe/ffmpeg falsos: exigem um arquivo comum (buscável) em -i, registram o que leram
+# e tratam 1 byte como 1 segundo de áudio; a "normalização" devolve metade dos bytes.
+# WebM (assinatura EBML) vem sem duração no cabeçalho, como o gravado pelo MediaRecorder
+FAKE_FFPROBE = """#!{python}
+import os, sys
+path = sys.argv[sys.argv.index("-i") + 1]
+open(os.environ["FAKE_AV_LOG"], "a").write(f"ffprobe {{path}}\\n")
+if not os.path.isfile(path):
+    sys.exit(1)
+data = open(path, "rb").read()
+print("N/A" if data.startswith(b"\\x1aE\\xdf\\xa3") else float(len(data)))
+"""
+
+FAKE_FFMPEG = """#!{python}
+import os, sys
+path = sys.argv[sys.argv.index("-i") + 1]
+open(os.environ["FAKE_AV_LOG"], "a").write(f"ffmpeg {{path}}\\n")
+data = open(path, "rb").read() if os.path.isfile(path) else None
+if data is None or b"fail" in data:
+    sys.stderr.write("Invalid data found when processing input")
+    sys.exit(1)
+output = sys.argv[-1]
+if output == "-":
+    seconds = len(data)
+    sys.stderr.write(f"size=N/A time=00:{{seconds // 60:02d}}:{{seconds % 60:05.2f}} bitrate=N/A\\n")
+elif output == "pipe:1":
+    sys.stdout.buffer.write(b"o" * (len(data) // 2))
+else:
+    open(output, "wb").write(b"o" * (len(data) // 2))
+"""
+
+
+class FakeAudioTools:
+    def __init__(self, root: Path):
+        self.bin = root / "bin"
+        self.tmp = root / "tmp"
+        self.log = root / "av.log"
+
+    def calls(self):
+        """[(ferramenta, arquivo lido)] na ordem das chamadas"""
+        if not self.log.exists():
+            return []
+        return [tuple(line.split(" ", 1)) for line in self.log.read_text().splitlines()]
+
+
+@pytest.fixture
+def fake_av(tmp_path, monkeypatch):
+    """ffprobe e ffmpeg falsos no PATH, com o diretório temporário do áudio em tmp_path"""
+    import audio_upload
+
+    tools = FakeAudioTools(tmp_path)
+    tools.bin.mkdir()
+    tools.tmp.mkdir()
+    for name, source in (("ffprobe", FAKE_FFPROBE), ("ffmpeg", FAKE_FFMPEG)):
+        script = tools.bin / name
+        script.write_text(source.format(python=sys.executable))
+        script.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{tools.bin}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv("FAKE_AV_LOG", str(tools.log))
+    monkeypatch.setattr(audio_upload, "FFPROBE_AVAILABLE", True)
+    monkeypatch.setattr(audio_upload, "AUDIO_TMP_DIR", str(tools.tmp))
+    return tools
@@ -0,0 +1,61 @@
+"""Normalização do áudio antes do STT"""
+
+import asyncio
+
+from audio_processing import AudioNormalizer
+from audio_upload import AudioUpload, audio_workspace, enforce_duration
+
+
+async def normalize(normalizer: AudioNormalizer, upload: AudioUpload, **options):
+    async with audio_workspace() as workspace:
+        return await normalizer.normalize(upload, workspace, **options)
+
+
+def test_normalize_reads_from_a_seekable_file(fake_av):
+    upload = AudioUpload("voice.m4a", "audio/mp4", b"a" * 100)
+
+    normalized = asyncio.run(normalize(AudioNormalizer(enabled=True), upload))
+
+    assert normalized.filename == "voice.ogg"
+    assert normalized.size == 50
+    assert list(fake_av.tmp.iterdir()) == []
+
+
+def test_failed_normalization_falls_back_and_is_counted_by_format(fake_av):
+    normalizer = AudioNormalizer(enabled=True)
+    upload = AudioUpload("voice.m4a", "audio/mp4", b"fail" * 25)
+
+    assert asyncio.run(normalize(normalizer, upload)) is upload
+
+    stats = normalizer.stats()
+    assert stats["failed"] == 1
+    assert stats["failed_formats"] == {"m4a": 1}
+
+
+def test_measured_duration_comes_from_the_normalized_ogg(fake_av):
+    upload = AudioUpload("voice.m4a", "audio/mp4", b"a" * 100)
+    upload.duration = 100.0
+
+    normalized = asyncio.run(normalize(AudioNormalizer(enabled=True), upload, measure=True))
+
+    assert normalized.duration == 50.0
+
+
+def test_request_writes_the_upload_to_disk_once(fake_av):
+    """Sonda, normalização, nova medição e análise de silêncio leem as mesmas cópias"""
+    normalizer = AudioNormalizer(enabled=True)
+    upload = AudioUpload("voice.m4a", "audio/mp4", b"a" * 100)
+
+    async def transcribe_flow():
+        async with audio_workspace() as workspace:
+            await upload.spool(workspace)
+            await enforce_duration(upload)
+            audio = await normalizer.normalize(upload, workspace, measure=True)
+            await normalizer.analyze_silences(audio)
+            return audio
+
+    audio = asyncio.run(transcribe_flow())
+
+    read = [path for _, path in fake_av.calls()]
+    assert read == [str(upload.path), str(upload.path), str(audio.path), str(audio.path)]
+    assert list(fake_av.tmp.iterdir()) == []
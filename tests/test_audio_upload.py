@@ -0,0 +1,99 @@
+"""Verificação de duração do áudio enviado antes do STT"""
+
+import asyncio
+import shutil
+import subprocess
+
+import pytest
+from fastapi import HTTPException
+
+import audio_upload
+from audio_upload import AudioUpload, audio_workspace, enforce_duration, probe_duration
+
+EBML_MAGIC = b"\x1aE\xdf\xa3"
+
+
+async def spooled(upload: AudioUpload, check):
+    async with audio_workspace() as workspace:
+        await upload.spool(workspace)
+        return await check(upload)
+
+
+def test_probe_reads_the_spooled_file_and_workspace_is_removed(fake_av):
+    upload = AudioUpload("voice.m4a", "audio/mp4", b"x" * 42)
+
+    async def probe(upload):
+        return await probe_duration(upload.path)
+
+    assert asyncio.run(spooled(upload, probe)) == 42.0
+    assert upload.path.suffix == ".m4a"
+    assert list(fake_av.tmp.iterdir()) == []
+
+
+def test_audio_over_the_limit_is_rejected(fake_av):
+    upload = AudioUpload("voice.m4a", "audio/mp4", b"x" * 20)
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(spooled(upload, lambda upload: enforce_duration(upload, max_seconds=10)))
+
+    assert error.value.status_code == 413
+    assert upload.duration == 20.0
+
+
+def test_unreadable_duration_is_rejected_when_required(monkeypatch):
+    async def unreadable(path):
+        return None
+
+    monkeypatch.setattr(audio_upload, "probe_duration", unreadable)
+    monkeypatch.setattr(audio_upload, "FFPROBE_AVAILABLE", True)
+    upload = AudioUpload("voice.m4a", "audio/mp4", b"\x00" * 10)
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(enforce_duration(upload, required=True))
+    assert error.value.status_code == 400
+
+    asyncio.run(enforce_duration(upload, required=False))
+    assert upload.duration is None
+
+
+def test_missing_ffprobe_skips_the_duration_limit(monkeypatch):
+    monkeypatch.setattr(audio_upload, "FFPROBE_AVAILABLE", False)
+    upload = AudioUpload("voice.webm", "audio/webm", b"\x00" * 10)
+
+    asyncio.run(enforce_duration(upload, required=True))
+
+    assert upload.duration is None
+
+
+def test_webm_without_duration_header_is_measured_not_rejected(fake_av):
+    # Blob do MediaRecorder enviado pelo app web (com nome .m4a)
+    upload = AudioUpload("audio.m4a", "audio/m4a", EBML_MAGIC + b"x" * 26)
+
+    asyncio.run(spooled(upload, enforce_duration))
+
+    assert upload.duration == 30.0
+    assert [tool for tool, _ in fake_av.calls()] == ["ffprobe", "ffmpeg"]
+
+
+def test_webm_without_duration_header_still_gets_the_limit(fake_av):
+    upload = AudioUpload("audio.m4a", "audio/m4a", EBML_MAGIC + b"x" * 26)
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(spooled(upload, lambda upload: enforce_duration(upload, max_seconds=10)))
+
+    assert error.value.status_code == 413
+
+
+@pytest.mark.skipif(not (shutil.which("ffmpeg") and shutil.which("ffprobe")), reason="ffmpeg not installed")
+def test_real_webm_from_a_pipe_is_measured(monkeypatch):
+    # WebM escrito num pipe não tem duração no cabeçalho, como o do MediaRecorder
+    webm = subprocess.run(
+        ["ffmpeg", "-v", "error", "-f", "lavfi", "-i", "sine=duration=3", "-c:a", "libopus", "-f", "webm", "pipe:1"],
+        check=True, capture_output=True
+    ).stdout
+    monkeypatch.setattr(audio_upload, "FFPROBE_AVAILABLE", True)
+    upload = AudioUpload("audio.m4a", "audio/m4a", webm)
+
+    asyncio.run(spooled(upload, enforce_duration))
+
+    assert upload.duration == pytest.approx(3.0, abs=0.1)
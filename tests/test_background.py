@@ -0,0 +1,24 @@
+"""Fila de pós-processamento em processo"""
+
+import asyncio
+
+from background import JobQueue
+
+
+def test_submit_after_drain_runs_inline_without_restarting_workers():
+    async def scenario():
+        queue = JobQueue("test", concurrency=2)
+        done = []
+
+        async def job(value):
+            done.append(value)
+
+        await queue.submit("early", job, 1)
+        await queue.drain(timeout=1)
+        await queue.submit("late", job, 2)
+        return queue, done
+
+    queue, done = asyncio.run(scenario())
+
+    assert done == [1, 2]
+    assert queue.stats()["running"] is False
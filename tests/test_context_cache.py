@@ -0,0 +1,44 @@
+"""UserContextCache: gerações limitadas sem reabrir leituras antigas"""
+
+from collections import OrderedDict
+
+import pytest
+
+pytest.importorskip("emergentintegrations")
+
+from orchestrator import UserContextCache  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def small_cache(monkeypatch):
+    monkeypatch.setattr(UserContextCache, "_entries", OrderedDict())
+    monkeypatch.setattr(UserContextCache, "_generations", OrderedDict())
+    monkeypatch.setattr(UserContextCache, "_generation_clock", 0)
+    monkeypatch.setattr(UserContextCache, "_generation_floor", 0)
+    monkeypatch.setattr(UserContextCache, "MAX_ENTRIES", 2)
+
+
+def test_generations_are_bounded():
+    for i in range(10):
+        UserContextCache.invalidate(f"user-{i}")
+
+    assert UserContextCache.stats()["generations"] == 2
+
+
+def test_read_started_before_a_pruned_invalidation_is_not_cached():
+    generation = UserContextCache.generation("reader")
+    UserContextCache.invalidate("reader")  # Escrita durante a leitura
+    for i in range(3):
+        UserContextCache.invalidate(f"other-{i}")  # Geração de "reader" sai do LRU
+
+    UserContextCache.set("reader", {"stale": True}, generation)
+
+    assert UserContextCache.get("reader") is None
+
+
+def test_read_without_writes_is_cached():
+    generation = UserContextCache.generation("reader")
+
+    UserContextCache.set("reader", {"fresh": True}, generation)
+
+    assert UserContextCache.get("reader") == {"fresh": True}
@@ -0,0 +1,22 @@
+"""MemoryManager.save_conversation: retentativas da fila não duplicam o turno"""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("emergentintegrations")
+
+from bson import ObjectId  # noqa: E402
+
+from orchestrator import MemoryManager  # noqa: E402
+
+
+def test_retried_save_with_same_id_writes_one_row(mongo):
+    conversation_id = ObjectId()
+
+    async def save_twice():
+        for _ in range(2):
+            await MemoryManager.save_conversation("history-user", "oi", "olá", 0, conversation_id=conversation_id)
+        return await mongo.conversations.count_documents({"user_id": "history-user"})
+
+    assert asyncio.run(save_twice()) == 1
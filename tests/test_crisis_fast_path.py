@@ -0,0 +1,54 @@
+"""Caminho rápido de crise: resposta de segurança pré-renderizada no idioma certo"""
+
+import pytest
+
+pytest.importorskip("emergentintegrations")
+
+from server import ChatRequest  # noqa: E402
+
+CRISIS_MESSAGE = "não aguento mais, quero morrer"
+
+
+def test_chat_request_without_lang_resolves_to_pt_br():
+    assert ChatRequest(message=CRISIS_MESSAGE).lang == "pt-BR"
+    assert ChatRequest(message=CRISIS_MESSAGE, lang=None).lang == "pt-BR"
+    assert ChatRequest(message=CRISIS_MESSAGE, lang="es-AR").lang == "es"
+
+
+def test_crisis_without_lang_gets_cvv_188(api):
+    # Mesmo payload do app: sem lang
+    response = api.post("/api/chat", json={"message": CRISIS_MESSAGE, "user_id": "crisis-user", "history": []})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["is_crisis"] is True
+    assert "188" in body["response"] and "CVV" in body["response"]
+    assert "988" not in body["response"]
+    assert body["followup_id"] == body["correlation_id"]
+
+
+@pytest.mark.parametrize("lang, hotline, other", [("en", "988", "188"), ("es", "024", "988")])
+def test_crisis_response_follows_requested_language(api, lang, hotline, other):
+    response = api.post("/api/chat", json={"message": "I want to die, quiero morir", "lang": lang, "user_id": "crisis-user"})
+
+    assert hotline in response.json()["response"]
+    assert other not in response.json()["response"]
+
+
+def test_crisis_stream_without_lang_gets_cvv_188(api):
+    response = api.post("/api/chat/stream", json={"message": CRISIS_MESSAGE, "user_id": "crisis-user"})
+
+    assert response.status_code == 200
+    assert "188" in response.text
+    assert "988" not in response.text
+
+
+def test_followup_is_only_returned_to_its_user(api):
+    followup_id = api.post("/api/chat", json={"message": CRISIS_MESSAGE, "user_id": "crisis-user"}).json()["followup_id"]
+
+    own = api.get(f"/api/chat/followup/{followup_id}", params={"user_id": "crisis-user"})
+    other = api.get(f"/api/chat/followup/{followup_id}", params={"user_id": "someone-else"})
+
+    assert own.status_code == 200 and own.json()["followup_id"] == followup_id
+    assert other.status_code == 404
+    assert api.get(f"/api/chat/followup/{followup_id}").status_code == 422
@@ -0,0 +1,73 @@
+"""Resposta falada de crise: idioma da mensagem de segurança e provedor de TTS fora do ar"""
+
+import io
+import time
+
+import pytest
+
+pytest.importorskip("emergentintegrations")
+
+import server  # noqa: E402
+import speech_pipeline  # noqa: E402
+from resilience import upstreams  # noqa: E402
+
+CRISIS_MESSAGE = "não aguento mais, quero morrer"
+
+
+@pytest.fixture
+def tts_down(monkeypatch):
+    breaker = upstreams["tts"].breaker
+    monkeypatch.setattr(breaker, "state", "open")
+    monkeypatch.setattr(breaker, "_opened_at", time.monotonic())
+    return breaker
+
+
+@pytest.fixture
+def bundled_texts(monkeypatch):
+    """Bundle que tem áudio para qualquer frase; registra o que foi pedido"""
+    texts = []
+
+    def open_text(text, voice, model, audio_format):
+        texts.append(text)
+        return io.BytesIO(b"mp3")
+
+    monkeypatch.setattr(speech_pipeline.audio_bundle, "open_text", open_text)
+    return texts
+
+
+def test_crisis_speech_plays_bundled_audio_with_tts_breaker_open(api, tts_down, bundled_texts):
+    response = api.post("/api/chat/speech", json={"message": CRISIS_MESSAGE, "user_id": "crisis-user"})
+
+    assert response.status_code == 200
+    assert response.headers["X-Is-Crisis"] == "true"
+    assert response.headers["X-Followup-ID"] == response.headers["X-Correlation-ID"]
+    assert response.content and set(response.content.split(b"mp3")) == {b""}
+    spoken = " ".join(bundled_texts)
+    assert "188" in spoken and "988" not in spoken
+
+
+def test_regular_speech_still_rejected_with_tts_breaker_open(api, tts_down):
+    response = api.post("/api/chat/speech", json={"message": "oi, tudo bem?", "user_id": "regular-user"})
+
+    assert response.status_code == 503
+    assert "Retry-After" in response.headers
+
+
+@pytest.mark.parametrize("query, lang", [("", "pt-BR"), ("?lang=es", "es"), ("?lang=en-US", "en")])
+def test_sos_voice_follows_language(api, query, lang):
+    response = api.get(f"/api/audio/sos{query}")
+
+    assert response.json()["audio"]["voice"] == f"/api/tts/static/crisis?lang={lang}"
+
+
+def test_static_crisis_audio_defaults_to_pt_br(api, monkeypatch):
+    requested = []
+
+    def open_phrase(phrase_id, lang):
+        requested.append((phrase_id, lang))
+        return io.BytesIO(b"mp3")
+
+    monkeypatch.setattr(server.audio_bundle, "open_phrase", open_phrase)
+
+    assert api.get("/api/tts/static/crisis").content == b"mp3"
+    assert requested == [("crisis", "pt-BR")]
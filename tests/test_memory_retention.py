@@ -0,0 +1,87 @@
+"""MemoryManager.enforce_retention: limite por usuário, proteção das recentes e user_state"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("emergentintegrations")
+
+from orchestrator import MemoryManager  # noqa: E402
+
+USER = "retention-user"
+
+
+@pytest.fixture(autouse=True)
+def small_retention(monkeypatch):
+    monkeypatch.setattr(MemoryManager, "MEMORY_RETENTION", 5)
+    monkeypatch.setattr(MemoryManager, "MEMORY_PROTECT_NEWEST", 3)
+    monkeypatch.setattr(MemoryManager, "MEMORY_EVICTION_POLICY", "importance")
+
+
+def seed(mongo, importances):
+    """Memórias com created_at espaçado de 1 minuto, da mais antiga para a mais recente"""
+    start = datetime.utcnow() - timedelta(days=1)
+    docs = []
+    for i, importance in enumerate(importances):
+        doc = {"user_id": USER, "summary": f"m{i}", "created_at": start + timedelta(minutes=i)}
+        if importance is not None:
+            doc["importance"] = importance
+        docs.append(doc)
+    asyncio.run(mongo.ai_memories.insert_many(docs))
+
+
+def summaries(mongo):
+    docs = asyncio.run(mongo.ai_memories.find({"user_id": USER}).sort("created_at", 1).to_list(None))
+    return [d["summary"] for d in docs]
+
+
+def test_new_low_importance_memory_is_never_evicted(mongo):
+    seed(mongo, [5, 5, 5, 5, 5])
+
+    asyncio.run(MemoryManager.save_memory(USER, {"summary": "new", "importance": 1}))
+
+    assert summaries(mongo) == ["m1", "m2", "m3", "m4", "new"]
+
+
+def test_lowest_importance_outside_protected_window_goes_first(mongo):
+    seed(mongo, [5, 1, 4, 5, 5])
+
+    asyncio.run(MemoryManager.save_memory(USER, {"summary": "new", "importance": 1}))
+
+    assert summaries(mongo) == ["m0", "m2", "m3", "m4", "new"]
+
+
+def test_missing_importance_counts_as_default(mongo):
+    seed(mongo, [3, None, 3, 3, 3])
+
+    asyncio.run(MemoryManager.save_memory(USER, {"summary": "new", "importance": 3}))
+
+    assert "m1" not in summaries(mongo)
+    assert len(summaries(mongo)) == 5
+
+
+def test_recency_policy_evicts_oldest(mongo, monkeypatch):
+    monkeypatch.setattr(MemoryManager, "MEMORY_EVICTION_POLICY", "recency")
+    seed(mongo, [1, 5, 5, 5, 5])
+    seed_extra = [{"user_id": USER, "summary": "m5", "importance": 1, "created_at": datetime.utcnow()}]
+    asyncio.run(mongo.ai_memories.insert_many(seed_extra))
+
+    assert asyncio.run(MemoryManager.enforce_retention(USER)) == 1
+    assert summaries(mongo) == ["m1", "m2", "m3", "m4", "m5"]
+
+
+def test_evicted_memories_leave_user_state(mongo, monkeypatch):
+    monkeypatch.setattr(MemoryManager, "MEMORY_PROTECT_NEWEST", 0)
+    seed(mongo, [1, 5, 5, 5, 5, 5])
+    evicted = asyncio.run(mongo.ai_memories.find_one({"summary": "m0"}))
+    asyncio.run(mongo.user_state.insert_one({"user_id": USER, "memories": [
+        {"summary": "m0", "importance": 1, "created_at": evicted["created_at"]},
+        {"summary": "m5", "importance": 5, "created_at": evicted["created_at"] + timedelta(minutes=5)}
+    ]}))
+
+    assert asyncio.run(MemoryManager.enforce_retention(USER)) == 1
+
+    state = asyncio.run(mongo.user_state.find_one({"user_id": USER}))
+    assert [m["summary"] for m in state["memories"]] == ["m5"]
+    assert "m0" not in summaries(mongo)
@@ -0,0 +1,62 @@
+"""Templates de prompt por idioma e montagem com orçamento de tokens"""
+
+import threading
+import time
+
+import pytest
+
+import prompting
+from prompting import assemble_messages
+
+LONG_HISTORY = [{"role": "user", "content": "palavra " * 400}] * 4
+
+
+@pytest.mark.parametrize("lang, expected", [
+    ("en", "earlier messages from this conversation were omitted"),
+    ("es", "mensajes anteriores de la conversación se omitieron"),
+    ("pt-BR", "mensagens anteriores da conversa foram omitidas"),
+    (None, "mensagens anteriores da conversa foram omitidas"),
+])
+def test_dropped_history_note_follows_language(lang, expected):
+    messages, stats = assemble_messages([], LONG_HISTORY, "oi", budget=300, lang=lang)
+
+    assert stats["history_dropped"] == 4
+    assert messages[0]["role"] == "system"
+    assert expected in messages[0]["content"]
+    assert messages[0]["content"].startswith("[4 ")
+
+
+def test_token_count_does_not_wait_for_a_hanging_tokenizer_download(monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(prompting, "_encoding", None)
+    monkeypatch.setattr(prompting, "_encoding_loaded", threading.Event())
+    monkeypatch.setattr(prompting, "_encoding_loader", None)
+    monkeypatch.setattr(prompting, "_load_encoding", lambda: release.wait(5))
+
+    started = time.monotonic()
+    assert prompting.load_tokenizer(timeout=0.05) is False
+    assert prompting.count_tokens("x" * 40) == 11
+    assert time.monotonic() - started < 1
+    release.set()
+
+
+@pytest.mark.parametrize("lang, hotline, other", [
+    ("en", "988", "188"),
+    ("es", "024", "188"),
+    ("pt-BR", "188", "988"),
+])
+def test_crisis_appendix_and_fallback_follow_language(lang, hotline, other):
+    templates = prompting.prompt_templates
+    appendix = templates.crisis_appendix(lang)
+
+    assert appendix.startswith("\n\n🆘")
+    assert hotline in appendix and other not in appendix
+    assert templates.fallback_response(lang) != templates.fallback_response("pt-BR" if lang != "pt-BR" else "en")
+
+
+def test_static_phrases_cover_every_language():
+    phrases = prompting.prompt_templates.static_phrases()
+
+    for phrase in ("crisis", "crisis_appendix", "fallback"):
+        assert set(phrases[phrase]) == set(prompting.SUPPORTED_LANGUAGES)
+        assert all(phrases[phrase].values())
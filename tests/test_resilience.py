@@ -0,0 +1,68 @@
+"""Prazos de stream e circuit breaker do UpstreamGuard"""
+
+import asyncio
+
+import pytest
+
+from resilience import DeadlineExceededError, UpstreamGuard
+
+
+def slow_consumer_stream(chunks: int):
+    async def factory():
+        async def produce():
+            for _ in range(chunks):
+                yield b"x"
+        return produce()
+    return factory
+
+
+async def consume(guard: UpstreamGuard, factory, pause: float = 0.0) -> int:
+    received = 0
+    async for _ in guard.stream(factory, idle_timeout=1):
+        received += 1
+        await asyncio.sleep(pause)
+    return received
+
+
+def test_stream_without_total_deadline_outlasts_slow_client():
+    guard = UpstreamGuard("tts_stream", deadline=None, first_chunk_deadline=1)
+
+    received = asyncio.run(consume(guard, slow_consumer_stream(5), pause=0.02))
+
+    assert received == 5
+    assert guard.stats()["failures"] == 0
+
+
+def test_total_deadline_cut_does_not_count_against_breaker():
+    guard = UpstreamGuard("tts_stream", deadline=0.01, first_chunk_deadline=1)
+    guard.breaker.failure_threshold = 1
+
+    with pytest.raises(DeadlineExceededError):
+        asyncio.run(consume(guard, slow_consumer_stream(10), pause=0.02))
+
+    stats = guard.stats()
+    assert stats["deadline_cuts"] == 1
+    assert stats["failures"] == 0
+    assert stats["breaker"]["state"] == "closed"
+
+
+def test_idle_timeout_still_counts_as_upstream_failure():
+    async def factory():
+        async def stall():
+            yield b"x"
+            await asyncio.sleep(5)
+            yield b"y"
+        return stall()
+
+    guard = UpstreamGuard("tts_stream", deadline=None, first_chunk_deadline=1)
+    guard.breaker.failure_threshold = 1
+
+    async def run():
+        async for _ in guard.stream(factory, idle_timeout=0.05):
+            pass
+
+    with pytest.raises(DeadlineExceededError):
+        asyncio.run(run())
+
+    assert guard.stats()["timeouts"] == 1
+    assert guard.stats()["breaker"]["state"] == "open"
@@ -0,0 +1,112 @@
+"""Léxico de risco: normalização, radicais, fronteira de palavra e recarga"""
+
+import json
+import os
+
+import pytest
+
+from risk_matcher import RiskLexicon, RiskMatcher, fold_text, risk_lexicon
+
+
+def severities(text):
+    return {hit.severity for hit in risk_lexicon.scan(text)}
+
+
+@pytest.mark.parametrize("text", [
+    "eu me suicidaria",
+    "suicídios",
+    "SUICÍDIO",
+    "penso em suicidio",
+    "pensé en suicidarme",
+    "I have suicidal thoughts",
+    "eu vou me matar",
+    "às vezes penso em me matar",
+    "eu me mataria",
+    "Quero   MORRER",
+    "no quiero vivir, quiero morir",
+])
+def test_critical_terms_match_inflections_and_accents(text):
+    assert "critical" in severities(text)
+
+
+@pytest.mark.parametrize("text, severity", [
+    ("me sinto sem esperanças", "high"),
+    ("estamos desesperados", "high"),
+    ("ela está desesperada", "high"),
+    ("pensei em autoagressões", "high"),
+    ("eu desistiria de tudo", "high"),
+    ("I feel hopelessness", "high"),
+    ("self-harming again", "high"),
+    ("pensé en autolesionarme", "high"),
+    ("estamos sin esperanzas", "high"),
+    ("me sinto sozinhos", "moderate"),
+    ("todas sozinhas", "moderate"),
+    ("ficamos muito ansiosas", "moderate"),
+    ("dias péssimos", "moderate"),
+    ("noites horríveis", "moderate"),
+    ("nos sentimos abandonadas", "moderate"),
+    ("I keep panicking", "moderate"),
+    ("estamos muy ansiosos", "moderate"),
+    ("cosas horribles", "moderate"),
+])
+def test_high_and_moderate_terms_match_plurals_and_inflections(text, severity):
+    # Recall que o casamento por substring tinha antes da fronteira de palavra
+    assert severity in severities(text)
+
+
+@pytest.mark.parametrize("text", [
+    "vou me matricular amanhã",
+    "campanha antisuicida da escola",
+    "hoje foi um bom dia",
+])
+def test_no_match_inside_other_words(text):
+    assert "critical" not in severities(text)
+
+
+def test_exact_phrases_require_word_boundary_on_both_sides():
+    matcher = RiskMatcher({"moderate": {"pt": ["sozinho"]}})
+
+    assert matcher.scan("estou sozinho.")
+    assert not matcher.scan("sozinhos")
+
+
+def test_prefix_phrases_match_any_ending_but_need_word_start():
+    matcher = RiskMatcher({"critical": {"pt": ["suicid*"]}})
+
+    assert [h.phrase for h in matcher.scan("pensamentos suicidas")] == ["suicid*"]
+    assert matcher.scan("suicid")
+    assert not matcher.scan("parasuicidio")
+
+
+def test_duplicate_phrases_keep_highest_severity():
+    matcher = RiskMatcher({"moderate": {"pt": ["desespero"]}, "high": {"es": ["Desespero"]}})
+
+    assert [h.severity for h in matcher.scan("que desespero")] == ["high"]
+
+
+def test_fold_text_strips_accents_and_collapses_spaces():
+    assert fold_text("  Não   AGUENTO\tmais ") == "nao aguento mais"
+
+
+def write_lexicon(path, version, critical):
+    """Reescreve o arquivo e avança o mtime (a resolução do relógio pode não distinguir as escritas)"""
+    previous = path.stat().st_mtime_ns if path.exists() else 0
+    path.write_text(json.dumps({"version": version, "severities": {"critical": {"pt": critical}}}), encoding="utf-8")
+    os.utime(path, ns=(previous + 1_000_000, max(previous + 1_000_000, path.stat().st_mtime_ns)))
+
+
+def test_reload_swaps_lexicon_and_keeps_current_on_invalid_file(tmp_path):
+    path = tmp_path / "lexicon.json"
+    write_lexicon(path, "v1", ["quero sumir"])
+    lexicon = RiskLexicon(path).load()
+    assert lexicon.scan("quero sumir")
+
+    write_lexicon(path, "v2", ["some*"])
+    assert lexicon.reload_if_changed()
+    assert lexicon.version == "v2"
+    assert lexicon.scan("sumiço") == [] and lexicon.scan("someday")
+
+    write_lexicon(path, "v3", ["mal*formada"])
+    assert not lexicon.reload_if_changed()
+    assert lexicon.version == "v2"
+    assert "only allowed at the end" in lexicon.stats()["last_error"]
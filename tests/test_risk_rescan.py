@@ -0,0 +1,78 @@
+"""RiskRescanManager: re-varredura idempotente, sem duplicar eventos gravados ao vivo"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("emergentintegrations")
+
+from orchestrator import RiskEventManager, RiskRescanManager  # noqa: E402
+
+
+def seed(mongo):
+    start = datetime.utcnow() - timedelta(days=2)
+    conversations = [
+        # Sinalizada ao vivo (evento já existe, sem conversation_id)
+        {"user_message": "quero morrer", "risk_level": 4},
+        # Inflexão que o léxico antigo não pegava
+        {"user_message": "eu me suicidaria", "risk_level": 0},
+        # Ao vivo foi nível 3; a re-varredura encontra nível 4
+        {"user_message": "não consigo mais, prefiro morrer", "risk_level": 3},
+        {"user_message": "hoje foi um bom dia", "risk_level": 0},
+    ]
+    docs = [
+        {"user_id": f"user-{i}", "luna_response": "...", "created_at": start + timedelta(minutes=i), **c}
+        for i, c in enumerate(conversations)
+    ]
+
+    async def insert():
+        await mongo.conversations.insert_many(docs)
+        await RiskEventManager.save_risk_event("user-0", 4, ["quero morrer"], "quero morrer")
+
+    asyncio.run(insert())
+
+
+def events(mongo):
+    return asyncio.run(mongo.risk_events.find({}).sort("created_at", 1).to_list(None))
+
+
+def test_rescan_skips_turns_already_flagged_live(mongo):
+    seed(mongo)
+
+    summary = asyncio.run(RiskRescanManager.run(job="test", workers=1))
+
+    assert summary["scanned"] == 4
+    assert summary["already_flagged"] == 1
+    assert summary["flagged"] == 2
+    by_user = {e["user_id"]: e for e in events(mongo)}
+    assert sorted(by_user) == ["user-0", "user-1", "user-2"]
+    assert by_user["user-0"]["details"]["source"] == "chat"
+    assert by_user["user-1"]["level"] == 4 and by_user["user-1"]["details"]["source"] == "rescan"
+    assert by_user["user-2"]["level"] == 4
+
+
+def test_rescan_is_idempotent(mongo):
+    seed(mongo)
+
+    asyncio.run(RiskRescanManager.run(job="test", workers=1))
+    first = len(events(mongo))
+    summary = asyncio.run(RiskRescanManager.run(job="test", restart=True, workers=1))
+
+    assert len(events(mongo)) == first == 3
+    assert summary["upserted"] == 0
+
+
+def test_rescan_resumes_after_checkpoint(mongo):
+    seed(mongo)
+    asyncio.run(RiskRescanManager.run(job="test", workers=1))
+    asyncio.run(mongo.conversations.insert_one({
+        "user_id": "user-9", "user_message": "quero acabar com minha vida", "risk_level": 0,
+        "luna_response": "...", "created_at": datetime.utcnow()
+    }))
+
+    resumed = asyncio.run(RiskRescanManager.run(job="test", workers=1))
+
+    assert resumed["scanned_this_run"] == 1
+    assert resumed["scanned"] == 5
+    assert [e["user_id"] for e in events(mongo)][-1] == "user-9"
@@ -0,0 +1,74 @@
+"""SummaryBatcher: limite de turnos pendentes e limpeza dos locks por usuário"""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("emergentintegrations")
+
+from orchestrator import MemoryManager, SummaryBatcher  # noqa: E402
+
+USER = "batch-user"
+
+
+@pytest.fixture(autouse=True)
+def fresh_batcher(monkeypatch):
+    monkeypatch.setattr(SummaryBatcher, "_turns", {})
+    monkeypatch.setattr(SummaryBatcher, "_locks", {})
+    monkeypatch.setattr(SummaryBatcher, "_lock_users", {})
+    monkeypatch.setattr(SummaryBatcher, "_stats", dict(SummaryBatcher._stats, turns_dropped=0))
+    monkeypatch.setattr(SummaryBatcher, "MAX_PENDING_TURNS", 3)
+    saved = []
+
+    async def save_memory(user_id, summary):
+        saved.append(summary)
+
+    monkeypatch.setattr(MemoryManager, "save_memory", save_memory)
+    return saved
+
+
+def add(*messages):
+    for message in messages:
+        SummaryBatcher.add_turn(USER, message, "ok")
+
+
+def messages():
+    return [turn["user_message"] for turn in SummaryBatcher._turns.get(USER, [])]
+
+
+def test_pending_turns_are_capped_dropping_the_oldest():
+    add("t1", "t2", "t3", "t4", "t5")
+
+    assert messages() == ["t3", "t4", "t5"]
+    assert SummaryBatcher.stats()["turns_dropped"] == 2
+
+
+def test_concurrent_flushes_release_the_user_lock(monkeypatch):
+    async def summarize(turns):
+        await asyncio.sleep(0.01)
+        return {"summary": " ".join(turn["user_message"] for turn in turns)}
+
+    monkeypatch.setattr(MemoryManager, "generate_batch_summary", summarize)
+    add("t1", "t2")
+
+    async def flush_twice():
+        return await asyncio.gather(SummaryBatcher.flush(USER), SummaryBatcher.flush(USER))
+
+    first, second = asyncio.run(flush_twice())
+
+    assert first["summary"] == "t1 t2" and second is None
+    assert SummaryBatcher._locks == {} and SummaryBatcher._lock_users == {}
+
+
+def test_turns_arriving_during_a_flush_are_kept(monkeypatch):
+    async def summarize(turns):
+        # Chegam turnos durante a chamada e os mais antigos saem pelo limite
+        add("t4", "t5")
+        return {"summary": "x"}
+
+    monkeypatch.setattr(MemoryManager, "generate_batch_summary", summarize)
+    add("t1", "t2", "t3")
+
+    asyncio.run(SummaryBatcher.flush(USER))
+
+    assert messages() == ["t4", "t5"]
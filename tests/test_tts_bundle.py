@@ -0,0 +1,37 @@
+"""Pré-renderização do bundle de áudio fixo"""
+
+import asyncio
+import os
+import time
+
+from tts_bundle import AudioBundle
+
+PHRASES = {"crisis": {"pt-BR": ["Estou aqui com você."]}}
+
+
+async def fake_synthesize(text):
+    return f"audio:{text}".encode("utf-8")
+
+
+def prerender(bundle):
+    return asyncio.run(bundle.prerender(PHRASES, fake_synthesize, voice="nova", model="tts-1", audio_format="mp3"))
+
+
+def test_prerender_keeps_other_workers_in_progress_files(tmp_path):
+    in_progress = tmp_path / ".tmp-abc123.mp3"
+    in_progress.write_bytes(b"partial")
+    fresh = tmp_path / "rendered-by-another-worker.mp3"
+    fresh.write_bytes(b"audio")
+    stale = tmp_path / "old-phrase.mp3"
+    stale.write_bytes(b"audio")
+    stale_tmp = tmp_path / ".tmp-crashed.mp3"
+    stale_tmp.write_bytes(b"partial")
+    old = time.time() - 3600
+    for path in (stale, stale_tmp):
+        os.utime(path, (old, old))
+
+    summary = prerender(AudioBundle(directory=tmp_path, enabled=True))
+
+    assert summary["rendered"] == 1
+    assert in_progress.exists() and fresh.exists()
+    assert not stale.exists() and not stale_tmp.exists()
@@ -0,0 +1,46 @@
+"""Repasse do áudio do TTS em streaming com cópia para o cache"""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("emergentintegrations")
+
+import server  # noqa: E402
+from tts_cache import TtsCache  # noqa: E402
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = TtsCache(directory=tmp_path, max_bytes=1024 * 1024, enabled=True)
+    monkeypatch.setattr(server, "tts_cache", cache)
+    return cache
+
+
+async def upstream_chunks(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+def test_completed_stream_is_cached(cache):
+    async def relay():
+        stream = server.relay_tts_stream("test", upstream_chunks(b"b", b"c"), b"a", {}, "key-1")
+        return [chunk async for chunk in stream]
+
+    assert asyncio.run(relay()) == [b"a", b"b", b"c"]
+
+    cached = cache.open("key-1", server.TTS_FORMAT)
+    with cached:
+        assert cached.read() == b"abc"
+
+
+def test_abandoned_stream_is_not_cached(cache):
+    async def relay():
+        stream = server.relay_tts_stream("test", upstream_chunks(b"b", b"c"), b"a", {}, "key-2")
+        first = await stream.__anext__()
+        await stream.aclose()  # Cliente desconectou
+        return first
+
+    assert asyncio.run(relay()) == b"a"
+    assert cache.open("key-2", server.TTS_FORMAT) is None
+    assert not any(cache.directory.rglob("*.tmp*"))
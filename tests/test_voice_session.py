@@ -0,0 +1,12 @@
+"""Sessão de voz por WebSocket"""
+
+import pytest
+
+pytest.importorskip("emergentintegrations")
+
+
+def test_voice_session_is_served_under_api_prefix(api):
+    # nginx e o unified-server só encaminham /api/* ao backend
+    with api.websocket_connect("/api/ws/voice") as websocket:
+        assert websocket.receive_json()["type"] == "ready"
+        websocket.send_json({"type": "end"})
@@ -14,7 +14,7 @@ const PORT = process.env.PORT || 8080;
 // Create proxy server
 const proxy = httpProxy.createProxyServer({
   changeOrigin: true,
-  ws: true, // WebSocket support for Expo HMR
+  ws: true, // WebSocket support for Expo HMR and /api/ws/voice
 });
 
 // Handle proxy errors
@@ -57,12 +57,17 @@ const server = http.createServer((req, res) => {
   }
 });
 
-// Handle WebSocket upgrade for Expo HMR
+// Handle WebSocket upgrade for backend voice sessions and Expo HMR
 server.on('upgrade', (req, socket, head) => {
   const { url } = req;
   
+  // WebSocket for the backend (/api/ws/voice)
+  if (url.startsWith('/api/')) {
+    console.log(`[WS] Upgrading connection for backend: ${url}`);
+    proxy.ws(req, socket, head, { target: 'ws://127.0.0.1:8001' });
+  }
   // WebSocket for /app or Expo-related
-  if (url === '/app' || url.startsWith('/app/') || url.includes('_expo')) {
+  else if (url === '/app' || url.startsWith('/app/') || url.includes('_expo')) {
     console.log(`[WS] Upgrading connection for frontend: ${url}`);
     proxy.ws(req, socket, head, { target: 'ws://127.0.0.1:3000' });
   } else {